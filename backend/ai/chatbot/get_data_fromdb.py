@@ -14,6 +14,41 @@ def _convert_row_floats(row):
                 pass
     return row
 
+# Averages over whole local days read the daily rollups (one row per user and
+# day) instead of scanning sensor_data; see services/rollups.py. They are only
+# used when a completed `rollups rebuild` covers the first day of the range
+# (sensor_rollup_state); otherwise the query returns NULLs and the raw scan runs.
+ROLLUP_RANGE_AVERAGE_QUERY = """
+    SELECT
+        SUM(temperature_sum) / SUM(count) AS avg_temperature,
+        SUM(humidity_sum) / SUM(count) AS avg_humidity,
+        SUM(co_level_sum)::numeric / SUM(count) AS avg_co_level,
+        SUM(count) AS data_points
+    FROM sensor_rollup_1d
+    WHERE bucket_start >= (%s::date)::timestamp AT TIME ZONE 'Asia/Ho_Chi_Minh'
+    AND   bucket_start <= (%s::date)::timestamp AT TIME ZONE 'Asia/Ho_Chi_Minh'
+    AND   EXISTS (
+        SELECT 1 FROM sensor_rollup_state
+        WHERE id = 1
+        AND (complete_since IS NULL
+             OR complete_since <= (%s::date)::timestamp AT TIME ZONE 'Asia/Ho_Chi_Minh')
+    );
+"""
+
+def _rollup_range_average(cursor, start_date_str, end_date_str):
+    """Average from the daily rollups, or None if they are not complete for the range."""
+    try:
+        cursor.execute(ROLLUP_RANGE_AVERAGE_QUERY, (start_date_str, end_date_str, start_date_str))
+        result = _convert_row_floats(cursor.fetchone())
+    except psycopg2.Error as e:
+        # e.g. rollup tables not migrated yet: fall back to the raw scan
+        print(f"[DB TOOL] Rollups unavailable, scanning sensor_data: {e}")
+        cursor.connection.rollback()
+        return None
+    if not result or result.get('avg_temperature') is None:
+        return None
+    return result
+
 def get_latest_sensor_data():
     """
     Fetches the latest reading in raw GMT+0 (UTC).
@@ -65,8 +100,10 @@ def get_daily_average(date_str):
             WHERE (recorded_at AT TIME ZONE 'Asia/Ho_Chi_Minh')::date = %s;
         """
         
-        cursor.execute(query, (date_str,))
-        result = _convert_row_floats(cursor.fetchone())
+        result = _rollup_range_average(cursor, date_str, date_str)
+        if result is None:
+            cursor.execute(query, (date_str,))
+            result = _convert_row_floats(cursor.fetchone())
         # Check if result is None or empty (if no data found for that date)
         if not result or result.get('avg_temperature') is None:
              return {"error": f"No data found for date {date_str}"}
@@ -102,8 +139,10 @@ def get_date_range_average(start_date_str, end_date_str):
             AND   (recorded_at AT TIME ZONE 'Asia/Ho_Chi_Minh')::date <= %s;
         """
         
-        cursor.execute(query, (start_date_str, end_date_str))
-        result = _convert_row_floats(cursor.fetchone())
+        result = _rollup_range_average(cursor, start_date_str, end_date_str)
+        if result is None:
+            cursor.execute(query, (start_date_str, end_date_str))
+            result = _convert_row_floats(cursor.fetchone())
         
         if not result or result.get('avg_temperature') is None:
              return {"error": f"No data found for range {start_date_str} to {end_date_str}"}
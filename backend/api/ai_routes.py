@@ -6,6 +6,7 @@ Provides endpoints for AI-based analysis and predictions.
 
 from flask import jsonify, request
 from api import ai_bp
+from config import Config
 from services.ai_prediction_service import AIPredictionService
 from api.middleware import require_auth
 from ai.chatbot.chatbot import ask_iot_ai 
@@ -48,6 +49,75 @@ def predict():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@ai_bp.route('/predict/batch', methods=['POST'])
+@require_auth
+def predict_batch():
+    """
+    Generate predictions for many samples in one vectorized pass.
+    
+    Request Body (JSON), either row or columnar form:
+        {
+            "samples": [
+                {"temperature_C": 30.1, "humidity_%": 60.0, "CO_ppm": 12, "action": "normal"},
+                ...
+            ]
+        }
+        {
+            "columns": {
+                "temperature_C": [30.1, ...],
+                "humidity_%": [60.0, ...],
+                "CO_ppm": [12, ...],
+                "action": ["normal", ...]
+            }
+        }
+    
+    Returns:
+        JSON response with one result per sample, in input order.
+    """
+    try:
+        data = request.get_json(silent=True)
+        
+        if not data:
+            return jsonify({'error': 'Request body must be JSON'}), 400
+        
+        required_fields = ['temperature_C', 'humidity_%', 'CO_ppm', 'action']
+        
+        if 'columns' in data:
+            samples = data['columns']
+            if not isinstance(samples, dict):
+                return jsonify({'error': "'columns' must be an object of arrays"}), 400
+            missing_fields = [field for field in required_fields if field not in samples]
+            if not all(isinstance(samples.get(field, []), list) for field in required_fields):
+                return jsonify({'error': "Every column in 'columns' must be an array"}), 400
+            count = len(samples.get('action', []))
+        elif 'samples' in data:
+            samples = data['samples']
+            if not isinstance(samples, list) or not all(isinstance(s, dict) for s in samples):
+                return jsonify({'error': "'samples' must be an array of objects"}), 400
+            missing_fields = sorted({field for s in samples for field in required_fields if field not in s})
+            count = len(samples)
+        else:
+            return jsonify({'error': "Request body must contain 'samples' or 'columns'"}), 400
+        
+        if missing_fields:
+            return jsonify({'error': f'Missing required fields: {", ".join(missing_fields)}'}), 400
+        
+        if count > Config.AI_PREDICT_BATCH_MAX:
+            return jsonify({'error': f'Batch too large. Max {Config.AI_PREDICT_BATCH_MAX} samples per request'}), 400
+        
+        results = AIPredictionService.predict_batch(samples)
+        
+        return jsonify({
+            'status': 'success',
+            'count': len(results),
+            'results': results
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @ai_bp.route('/chatbot', methods=['POST'])
 def chatendpoint():
     """
@@ -0,0 +1,238 @@
+"""
+Local verification of Supabase access tokens.
+
+Tokens are checked in-process (signature, exp, aud, iss) against the
+project's JWKS, cached and refreshed in a background thread, or against the
+legacy HS256 JWT secret. This removes the call to /auth/v1/user from every
+authenticated request.
+"""
+
+import json
+import os
+import threading
+import time
+import urllib.request
+import jwt
+from config import Config
+
+
+class TokenUnverifiable(Exception):
+    """No local key can verify this token (callers may fall back to Supabase Auth)."""
+
+
+class JWTVerifier:
+    """
+    Verifies JWTs with a cached signing key set.
+
+    A token whose `kid` is not in the cache triggers one synchronous JWKS
+    refresh (at most every `min_refresh_gap` seconds), so rotated keys are
+    picked up without waiting for the background refresh.
+    """
+
+    # 'none' and anything else are never accepted
+    ALGORITHMS = ('RS256', 'ES256', 'EdDSA', 'HS256')
+    # Distinct unverifiable key ids logged (kid comes from the token, so the set is bounded)
+    MAX_WARNED_KIDS = 100
+
+    def __init__(self, jwks_url=None, secret=None, audience='authenticated', issuer=None,
+                 refresh_interval=600, leeway=30, min_refresh_gap=30):
+        """
+        Args:
+            jwks_url: URL of the project's JSON Web Key Set (asymmetric keys)
+            secret: Shared HS256 secret (legacy Supabase JWT secret)
+            audience: Required `aud` claim
+            issuer: Required `iss` claim (None skips the check)
+            refresh_interval: Seconds between background JWKS refreshes
+            leeway: Clock skew tolerated on exp/iat/nbf, in seconds
+            min_refresh_gap: Min seconds between refreshes triggered by unknown key ids
+        """
+        self.jwks_url = jwks_url
+        self.secret = secret
+        self.audience = audience
+        self.issuer = issuer
+        self.refresh_interval = refresh_interval
+        self.leeway = leeway
+        self.min_refresh_gap = min_refresh_gap
+
+        self._keys = {}  # kid -> jwt.PyJWK
+        self._refresh_lock = threading.Lock()
+        self._last_refresh_attempt = float('-inf')
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pid = None  # Process running the refresh thread (threads do not survive a fork)
+        self._start_lock = threading.Lock()
+        self._warned_kids = set()  # Unverifiable kids already logged
+
+        # Counters (exposed through stats())
+        self.verified = 0
+        self.rejected = 0
+        self.unverifiable = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    @property
+    def configured(self):
+        """True if there is any key source to verify against."""
+        return bool(self.jwks_url or self.secret)
+
+    def _fetch_jwks(self):
+        req = urllib.request.Request(self.jwks_url, method='GET')
+        with urllib.request.urlopen(req, timeout=5) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+    def refresh_keys(self):
+        """
+        Reload the JWKS. Keeps the previous keys if the fetch fails.
+
+        Returns:
+            bool: True if the key set was refreshed
+        """
+        if not self.jwks_url:
+            return False
+        with self._refresh_lock:
+            self._last_refresh_attempt = time.monotonic()
+            try:
+                jwks = self._fetch_jwks()
+                keys = {}
+                for data in jwks.get('keys', []):
+                    try:
+                        keys[data.get('kid')] = jwt.PyJWK(data)
+                    except jwt.PyJWTError as e:
+                        print(f"⚠️  Skipping unsupported JWKS key {data.get('kid')}: {e}")
+                self._keys = keys
+                self.refreshes += 1
+                return True
+            except Exception as e:
+                self.refresh_errors += 1
+                print(f"⚠️  Could not refresh JWKS from {self.jwks_url}: {e}")
+                return False
+
+    def _signing_key(self, header):
+        alg = header.get('alg')
+        if alg not in self.ALGORITHMS:
+            raise jwt.InvalidAlgorithmError(f"Algorithm not allowed: {alg}")
+
+        if alg == 'HS256':
+            if not self.secret:
+                raise self._unverifiable('HS256', 'HS256 token but no JWT secret configured')
+            return self.secret
+
+        kid = header.get('kid')
+        key = self._keys.get(kid)
+        if key is None and time.monotonic() - self._last_refresh_attempt >= self.min_refresh_gap:
+            self.refresh_keys()
+            key = self._keys.get(kid)
+        if key is None:
+            raise self._unverifiable(kid, f"No signing key for kid {kid!r}")
+        if key.algorithm_name != alg:
+            # Never let the token pick a different algorithm than its key
+            raise jwt.InvalidAlgorithmError(f"Key {kid!r} is {key.algorithm_name}, token says {alg}")
+        return key.key
+
+    def _unverifiable(self, kid, message):
+        """
+        Count a token no local key can verify and build its exception. Logs
+        once per kid instead of on every request (a rotated or misconfigured
+        JWKS would otherwise log once per API call).
+        """
+        self.unverifiable += 1
+        if kid not in self._warned_kids and len(self._warned_kids) < self.MAX_WARNED_KIDS:
+            self._warned_kids.add(kid)
+            print(f"⚠️  {message} (logged once; such tokens need remote verification)")
+        return TokenUnverifiable(message)
+
+    def verify(self, token):
+        """
+        Verify signature, exp, aud and iss.
+
+        Returns:
+            dict: The token's claims
+
+        Raises:
+            TokenUnverifiable: No local key for this token
+            jwt.InvalidTokenError: The token is invalid
+        """
+        try:
+            header = jwt.get_unverified_header(token)
+            claims = jwt.decode(
+                token,
+                self._signing_key(header),
+                algorithms=[header.get('alg')],
+                audience=self.audience,
+                issuer=self.issuer,
+                leeway=self.leeway,
+                options={'require': ['exp', 'sub'], 'verify_iss': self.issuer is not None},
+            )
+        except jwt.InvalidTokenError:
+            self.rejected += 1
+            raise
+        self.verified += 1
+        return claims
+
+    @staticmethod
+    def user_from_claims(claims):
+        """Build a user dict shaped like Supabase's /auth/v1/user response."""
+        return {
+            'id': claims['sub'],
+            'aud': claims.get('aud'),
+            'role': claims.get('role'),
+            'email': claims.get('email'),
+            'phone': claims.get('phone'),
+            'app_metadata': claims.get('app_metadata', {}),
+            'user_metadata': claims.get('user_metadata', {}),
+            'session_id': claims.get('session_id'),
+        }
+
+    def _run(self):
+        while not self._stopping.wait(self.refresh_interval):
+            self.refresh_keys()
+
+    def start(self):
+        """
+        Fetch the JWKS and keep refreshing it in a background thread of this
+        process. Cheap to call on every request; a forked worker starts its
+        own thread on first use.
+        """
+        if not self.jwks_url or self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._stopping.clear()
+            threading.Thread(target=self.refresh_keys, name='jwks-initial', daemon=True).start()
+            self._thread = threading.Thread(target=self._run, name='jwks-refresh', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def stop(self):
+        self._stopping.set()
+        self._pid = None
+
+    def stats(self):
+        """Key count and verification counters."""
+        return {
+            'keys': len(self._keys),
+            'verified': self.verified,
+            'rejected': self.rejected,
+            'unverifiable': self.unverifiable,
+            'refreshes': self.refreshes,
+            'refresh_errors': self.refresh_errors,
+        }
+
+
+# Global JWT verifier instance
+jwt_verifier = None
+
+def get_jwt_verifier():
+    """Get or create the global JWT verifier."""
+    global jwt_verifier
+    if jwt_verifier is None:
+        jwt_verifier = JWTVerifier(
+            jwks_url=Config.SUPABASE_JWKS_URL,
+            secret=Config.SUPABASE_JWT_SECRET,
+            audience=Config.SUPABASE_JWT_AUDIENCE,
+            issuer=Config.SUPABASE_JWT_ISSUER,
+            refresh_interval=Config.AUTH_JWKS_REFRESH_INTERVAL,
+            leeway=Config.AUTH_JWT_LEEWAY
+        )
+    return jwt_verifier
@@ -1,28 +1,52 @@
+from datetime import datetime, timedelta, timezone
 from functools import wraps
-from flask import request, jsonify, g
-import urllib.request
-import urllib.error
-import json
+from flask import request, jsonify, g, make_response, Response
+import jwt
 from config import Config
+from api.jwt_verifier import JWTVerifier, TokenUnverifiable, get_jwt_verifier
+from api.supabase_auth import get_remote_verifier
+from services.downsampling import parse_timestamp
+from services.response_cache import get_response_cache
 
 
 def verify_token_with_supabase(token: str):
     """
     Verify a JWT token by calling Supabase Auth API directly.
     Bypasses the Python SDK which has compatibility issues.
+    Results are cached per token (up to its exp) and concurrent checks of the
+    same token share one request over a pooled keep-alive connection.
     """
-    url = f"{Config.SUPABASE_URL}/auth/v1/user"
-    
-    req = urllib.request.Request(url, method='GET')
-    req.add_header('Authorization', f'Bearer {token}')
-    req.add_header('apikey', Config.SUPABASE_KEY)
-    
-    try:
-        with urllib.request.urlopen(req, timeout=10) as response:
-            data = json.loads(response.read().decode('utf-8'))
-            return data  # Returns user object if valid
-    except Exception:
+    verifier = get_remote_verifier()
+    if verifier is None:
         return None
+    return verifier.verify(token)
+
+
+def verify_token(token: str):
+    """
+    Verify a JWT token and return the user it belongs to.
+
+    With AUTH_VERIFY_MODE=local the token is verified in-process against the
+    cached JWKS / JWT secret. Supabase Auth is only called when no local key
+    can verify the token (and AUTH_REMOTE_FALLBACK is on), or in remote mode.
+
+    Returns:
+        dict | None: User object ('id' is the user's UUID) or None if invalid
+    """
+    verifier = get_jwt_verifier()
+    if Config.AUTH_VERIFY_MODE == 'local' and verifier.configured:
+        verifier.start()  # Background JWKS refresh, once per serving process
+        try:
+            return JWTVerifier.user_from_claims(verifier.verify(token))
+        except jwt.InvalidTokenError:
+            return None
+        except TokenUnverifiable:
+            # Logged once per kid by the verifier, not on every request
+            if not Config.AUTH_REMOTE_FALLBACK:
+                return None
+    elif Config.AUTH_VERIFY_MODE == 'local' and not Config.AUTH_REMOTE_FALLBACK:
+        return None
+    return verify_token_with_supabase(token)
 
 
 def require_auth(f):
@@ -38,8 +62,8 @@ def require_auth(f):
             # Extract token from "Bearer <token>"
             token = auth_header.split(' ')[1]
             
-            # Verify token using direct HTTP request
-            user = verify_token_with_supabase(token)
+            # Verify token locally (falls back to Supabase Auth if configured)
+            user = verify_token(token)
             
             if not user:
                 return jsonify({'error': 'Invalid token'}), 401
@@ -54,3 +78,71 @@ def require_auth(f):
             
         return f(*args, **kwargs)
     return decorated_function
+
+
+# Upper bound on how long a settled range is cached (server and browser)
+SETTLED_MAX_AGE = 86400
+
+
+def _settled_max_age(end):
+    """
+    Freshness lifetime of a range that ends far enough in the past that no
+    new reading normally falls in it, or None if the range is live.
+
+    A late batch (write queue retrying through a database outage) can still
+    land in a recently settled range, so the lifetime is a tenth of the time
+    since `end` (the HTTP heuristic for Last-Modified), capped at a day.
+    """
+    if not end:
+        return None
+    try:
+        end = parse_timestamp(end)
+    except ValueError:
+        return None
+    age = (datetime.now(timezone.utc) - end).total_seconds()
+    if age <= Config.HISTORY_CACHE_SETTLE_SECONDS:
+        return None
+    return max(1, min(SETTLED_MAX_AGE, int(age / 10)))
+
+
+def cache_history_response(f):
+    """
+    Decorator (after require_auth) adding a strong ETag / If-None-Match to a
+    GET endpoint and serving repeated requests from the response cache.
+    The cache key is the user plus every query parameter (range, page or
+    cursor, limit, format).
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not Config.HISTORY_CACHE_ENABLED:
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                response.add_etag()
+                return response.make_conditional(request)
+            return response
+        
+        user_id = g.user.get('id')
+        key = (str(user_id), request.path, tuple(sorted(request.args.items(multi=True))))
+        max_age = _settled_max_age(request.args.get('end'))
+        settled = max_age is not None
+        cache = get_response_cache()
+        
+        entry = cache.get(key, user_id)
+        if entry is not None:
+            response = Response(entry.body, mimetype=entry.mimetype)
+            response.headers['X-Cache'] = 'HIT'
+        else:
+            # Read before querying: readings committed meanwhile make the entry stale
+            version, late = cache.versions.get(user_id), cache.versions.late(user_id)
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200 or response.is_streamed:
+                return response
+            entry = cache.put(key, user_id, response.get_data(), response.mimetype, settled,
+                              version, late, max_age)
+            response.headers['X-Cache'] = 'MISS'
+        
+        response.set_etag(entry.etag)
+        # Settled ranges rarely change; live ones must be revalidated (cheap 304s)
+        response.headers['Cache-Control'] = f'private, max-age={max_age}' if settled else 'private, no-cache'
+        return response.make_conditional(request)
+    return decorated_function
@@ -5,9 +5,21 @@ Provides endpoints for sensor data retrieval and device control.
 
 from flask import jsonify, request, Response, stream_with_context
 from api import sensor_bp
-from models import get_db, SensorData, DeviceState
+from models import get_db, DeviceState
+from models.sensor_reader import select_readings, before_cursor, fetch_rows, count_rows
 from mqtt.client import get_mqtt_handler
-from api.middleware import require_auth
+from mqtt.ownership_cache import get_ownership_cache
+from services.ai_prediction_service import AIPredictionService
+from services.stream_hub import get_stream_hub, parse_max_hz
+from services.stream_transport import get_stream_transport
+from services.downsampling import parse_timestamp, bucket_aggregates, lttb_series
+from services.columnar import COLUMNAR_FORMATS, ARROW_MIMETYPE, BINARY_MIMETYPE, fetch_columns, to_columnar, to_arrow, pack_binary
+from services.history_export import EXPORT_FORMATS, export_rows, ndjson_chunks, csv_chunks, encode_chunks
+from services.archive import get_archive, merge_readings, record_key
+from api.middleware import require_auth, cache_history_response
+from config import Config
+from datetime import datetime, timezone
+from itertools import islice
 import json
 import time
 
@@ -18,60 +30,80 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'service': 'ECS Backend API',
-        'version': '1.0.0'
+        'version': '1.0.0',
+        'ingest': get_mqtt_handler().get_ingest_stats(),
+        'ai': AIPredictionService.status()
     }), 200
 
 
+def get_user_device_ids(user_id):
+    """
+    Active device IDs registered to a user (requires an app context).
+    Shared by the threaded /stream route and the async stream server.
+    """
+    db = get_db()
+    try:
+        user_devices = db.query(DeviceState.device_id).filter(
+            DeviceState.user_id == user_id,
+            DeviceState.is_active == True
+        ).all()
+        return {d.device_id for d in user_devices}
+    finally:
+        db.close()
+
+
 @sensor_bp.route('/stream', methods=['GET'])
 @require_auth
 def stream_readings():
     """
     Server-Sent Events (SSE) endpoint for real-time sensor updates.
-    Yields data immediately when available from MQTT handler.
+    Subscribes to the stream hub topics of the user's devices and yields
+    every reading published for them (bounded queue, drop-oldest).
+    Sending Last-Event-ID (header or ?last_event_id=) first replays the
+    buffered events the client missed. ?max_hz= limits the update rate per
+    device, coalescing to the newest reading (hazard changes are immediate).
     
     Authentication required - only streams data from user's registered devices.
     """
     from flask import g
     
     # Get user's registered device IDs (query once at connection start)
-    user_id = g.user.get('id')
-    db = get_db()
+    my_device_ids = get_user_device_ids(g.user.get('id'))
+    keepalive = Config.STREAM_KEEPALIVE_INTERVAL
+    # Reconnecting clients resume from the last event they received
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    # Optional rate limit: newest reading per device per 1/max_hz seconds
     try:
-        user_devices = db.query(DeviceState.device_id).filter(
-            DeviceState.user_id == user_id,
-            DeviceState.is_active == True
-        ).all()
-        my_device_ids = {d.device_id for d in user_devices}
-    finally:
-        db.close()
+        max_hz = parse_max_hz(request.args.get('max_hz'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    mqtt_handler = get_mqtt_handler()
+    # Receive messages published by the ingest process (once per worker process)
+    get_stream_transport().start()
     
     def generate():
-        last_data = None
-        while True:
-            # Wait for new data with a timeout (so we can send keep-alives)
-            event_occurred = mqtt_handler.new_data_event.wait(timeout=5.0)
-            
-            if event_occurred and mqtt_handler.latest_reading:
-                current_data = mqtt_handler.latest_reading
-                # Clear event after reading so we can wait for next one
-                mqtt_handler.new_data_event.clear()
+        # Only woken for readings of the user's own devices
+        subscription = get_stream_hub().subscribe(my_device_ids, last_event_id=last_event_id, max_hz=max_hz)
+        last_write = time.monotonic()
+        try:
+            while True:
+                # Wait for new data with a timeout (so we can send keep-alives)
+                messages = subscription.get(timeout=keepalive)
                 
-                # Filter: only send data from user's registered devices
-                data_device_id = current_data.get('device_id')
-                if data_device_id not in my_device_ids:
-                    continue  # Skip data from other users' devices
+                if not messages:
+                    if time.monotonic() - last_write >= keepalive:
+                        # Send a keep-alive comment to prevent connection timeout
+                        yield ": keep-alive\n\n"
+                        last_write = time.monotonic()
+                    continue
                 
-                # Only yield if data has changed
-                # data: {"temp": 25.5, "humidity": 60} \n\n
-                if current_data != last_data:
-                    data = json.dumps(current_data)
-                    yield f"data: {data}\n\n"
-                    last_data = current_data
-            else:
-                # Send a keep-alive comment to prevent connection timeout
-                yield ": keep-alive\n\n"
+                # Frames are pre-encoded once at ingest and shared by all subscribers
+                for message in messages:
+                    yield message.frame
+                last_write = time.monotonic()
+        finally:
+            # Client disconnected (generator closed) - stop receiving readings
+            subscription.close()
                 
     response = Response(stream_with_context(generate()), mimetype='text/event-stream')
     response.headers['Cache-Control'] = 'no-cache'
@@ -80,8 +112,57 @@ def stream_readings():
     return response
 
 
+def encode_history_cursor(record):
+    """Keyset cursor for a row: '<recorded_at UTC ISO>,<id>'."""
+    recorded_at = record.recorded_at.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    return f"{recorded_at},{record.id}"
+
+
+def decode_history_cursor(value):
+    """
+    Parse an `after` cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    recorded_at, _, record_id = value.strip().rpartition(',')
+    # A '+' in an unencoded query string arrives as a space
+    recorded_at = datetime.fromisoformat(recorded_at.replace(' ', '+'))
+    if recorded_at.tzinfo is None:
+        recorded_at = recorded_at.replace(tzinfo=timezone.utc)
+    return recorded_at, int(record_id)
+
+
+def estimate_count(db, stmt):
+    """
+    Planner row estimate for a statement (Postgres EXPLAIN, no table scan).
+    Falls back to an exact COUNT on other databases.
+    """
+    dialect = db.get_bind().dialect
+    if dialect.name != 'postgresql':
+        return count_rows(db, stmt)
+    compiled = stmt.order_by(None).compile(dialect=dialect)
+    plan = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def merge_archived(records, archive, user_id, start, end, count, before=None):
+    """
+    Newest `count` of live SensorRows and archived readings combined. The
+    archive is not opened when the live rows fill the page and are all
+    newer than the newest archived month.
+    """
+    if 0 < count <= len(records) and archive.older_than(user_id, records[count - 1].recorded_at):
+        return records[:count]
+    archived = archive.read_rows(user_id, start, end, before=before)
+    return list(islice(merge_readings(records, archived, key=record_key), count))
+
+
 @sensor_bp.route('/history', methods=['GET'])
 @require_auth
+@cache_history_response
 def get_history():
     """
     Retrieve historical sensor data for the authenticated user.
@@ -89,9 +170,16 @@ def get_history():
     Query Parameters:
         page (int): Page number for pagination
         per_page (int): Items per page (default: 20)
+        after (str): Cursor mode - '<recorded_at>,<id>' from the previous
+                     page's next_cursor (empty for the first page)
+        count (str): Total count for page/cursor mode: exact | estimate | none
+                     (default: exact in page mode, none in cursor mode)
         limit (int): Max records (if no page provided)
         start (iso_str): Start date
         end (iso_str): End date
+        format (str): Limit mode only - json (default) | columnar | arrow | binary
+    
+    Readings moved to the cold-tier archive are merged in transparently.
     """
     from flask import g
     
@@ -100,45 +188,126 @@ def get_history():
         page = request.args.get('page', type=int)
         per_page = request.args.get('per_page', 20, type=int)
         limit = request.args.get('limit', 100, type=int)
+        after = request.args.get('after')
+        count_mode = request.args.get('count', 'none' if after is not None else 'exact')
+        if count_mode not in ('exact', 'estimate', 'none'):
+            return jsonify({'error': 'count must be one of exact, estimate, none'}), 400
+        
+        if not page and after is None and limit <= 0:
+            return jsonify({'error': 'limit must be a positive integer'}), 400
         
         start = request.args.get('start')
         end = request.args.get('end')
         
+        response_format = request.args.get('format', 'json')
+        if response_format != 'json':
+            if response_format not in COLUMNAR_FORMATS:
+                return jsonify({'error': f'format must be one of json, {", ".join(COLUMNAR_FORMATS)}'}), 400
+            if page or after is not None:
+                return jsonify({'error': f'format={response_format} is only supported in limit mode'}), 400
+        
         db = get_db()
-        query = db.query(SensorData)
         
         # Filter by authenticated user's data only
         user_id = g.user.get('id')
-        query = query.filter(SensorData.user_id == user_id)
         
-        # Apply Date Filtering
-        if start:
-            query = query.filter(SensorData.recorded_at >= start)
-        if end:
-            query = query.filter(SensorData.recorded_at <= end)
-            
-        # Order by newest first
-        query = query.order_by(SensorData.recorded_at.desc())
+        # Cold-tier archive, only when the range reaches an archived month
+        archive = get_archive()
+        if archive is not None and not archive.overlaps(user_id, start, end):
+            archive = None
+        
+        if response_format != 'json':
+            # COLUMNAR LIMIT MODE (For Charts): Core tuples -> parallel arrays
+            columns = fetch_columns(db, user_id, start, end, limit, archive=archive)
+            if response_format == 'arrow':
+                try:
+                    return Response(to_arrow(columns), mimetype=ARROW_MIMETYPE)
+                except ImportError:
+                    return jsonify({'error': 'format=arrow requires pyarrow on the server'}), 501
+            if response_format == 'binary':
+                return Response(pack_binary(columns), mimetype=BINARY_MIMETYPE)
+            return jsonify({
+                'success': True,
+                'format': 'columnar',
+                'count': len(columns['id']),
+                'user_id': str(user_id),
+                'data': to_columnar(columns)
+            }), 200
+        
+        # Newest first, date-filtered (Core rows, no ORM instances)
+        query = select_readings(user_id, start, end)
         
         response_data = {}
         
-        if page:
+        if after is not None:
+            # CURSOR MODE (keyset pagination, cost independent of depth)
+            if per_page <= 0:
+                return jsonify({'error': 'per_page must be a positive integer'}), 400
+            filtered = query
+            cursor = None
+            if after:
+                try:
+                    cursor = decode_history_cursor(after)
+                except ValueError:
+                    return jsonify({'error': 'Invalid cursor, expected <recorded_at>,<id>'}), 400
+                query = before_cursor(query, *cursor)
+            
+            # One extra row tells whether another page exists
+            records = fetch_rows(db, query.limit(per_page + 1))
+            if archive is not None:
+                records = merge_archived(records, archive, user_id, start, end, per_page + 1, before=cursor)
+            has_more = len(records) > per_page
+            records = records[:per_page]
+            total = None
+            if count_mode != 'none':
+                total = count_rows(db, filtered) if count_mode == 'exact' else estimate_count(db, filtered)
+                if archive is not None:
+                    total += archive.count(user_id, start, end)
+            response_data = {
+                'success': True,
+                'data': [record.to_dict() for record in records],
+                'pagination': {
+                    'per_page': per_page,
+                    'next_cursor': encode_history_cursor(records[-1]) if has_more else None,
+                    'total': total,
+                    'total_is_estimate': count_mode == 'estimate'
+                }
+            }
+        elif page:
             # PAGINATION MODE (For Tables)
-            pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-            data = [record.to_dict() for record in pagination.items]
+            if per_page <= 0:
+                per_page = 20
+            offset = (max(page, 1) - 1) * per_page
+            if archive is not None:
+                # OFFSET over both tiers: newest offset + per_page of each, merged
+                records = fetch_rows(db, query.limit(offset + per_page))
+                records = merge_archived(records, archive, user_id, start, end, offset + per_page)[offset:]
+            else:
+                records = fetch_rows(db, query.offset(offset).limit(per_page))
+            data = [record.to_dict() for record in records]
+            total = None
+            if count_mode == 'exact':
+                total = count_rows(db, query)
+            elif count_mode == 'estimate':
+                total = estimate_count(db, query)
+            if total is not None and archive is not None:
+                total += archive.count(user_id, start, end)
             response_data = {
                 'success': True,
                 'data': data,
                 'pagination': {
                     'page': page,
                     'per_page': per_page,
-                    'total': pagination.total,
-                    'pages': pagination.pages
+                    'total': total,
+                    'pages': -(-total // per_page) if total is not None and per_page else None,
+                    'total_is_estimate': count_mode == 'estimate'
                 }
             }
         else:
             # LIMIT MODE (For Charts)
-            sensor_data = query.limit(limit).all()
+            sensor_data = fetch_rows(db, query.limit(limit))
+            if archive is not None:
+                sensor_data = merge_archived(sensor_data, archive, user_id, start, end, limit)
             data = [record.to_dict() for record in sensor_data]
             response_data = {
                 'success': True,
@@ -155,6 +324,113 @@ def get_history():
             db.close()
 
 
+@sensor_bp.route('/history/series', methods=['GET'])
+@require_auth
+def get_history_series():
+    """
+    Downsampled history for charts: about `points` values per metric,
+    however many readings the range holds.
+    
+    Query Parameters:
+        start (iso_str): Range start (required)
+        end (iso_str): Range end (default: now)
+        points (int): Target points per metric (default: 500, max: 5000)
+        method (str): buckets - min/avg/max per time bucket (default)
+                      lttb - Largest-Triangle-Three-Buckets over raw readings
+    """
+    from flask import g
+    
+    db = None
+    try:
+        points = request.args.get('points', 500, type=int)
+        method = request.args.get('method', 'buckets')
+        if method not in ('buckets', 'lttb'):
+            return jsonify({'error': 'method must be one of buckets, lttb'}), 400
+        if not 3 <= points <= 5000:
+            return jsonify({'error': 'points must be between 3 and 5000'}), 400
+        
+        if not request.args.get('start'):
+            return jsonify({'error': 'Missing required parameter: start'}), 400
+        try:
+            start = parse_timestamp(request.args['start'])
+            end = parse_timestamp(request.args['end']) if request.args.get('end') else datetime.now(timezone.utc)
+        except ValueError:
+            return jsonify({'error': 'start and end must be ISO timestamps'}), 400
+        if end <= start:
+            return jsonify({'error': 'end must be after start'}), 400
+        
+        db = get_db()
+        user_id = g.user.get('id')
+        
+        response_data = {
+            'success': True,
+            'method': method,
+            'start': start.isoformat(),
+            'end': end.isoformat()
+        }
+        archive = get_archive()
+        if method == 'buckets':
+            width, source, buckets = bucket_aggregates(db, user_id, start, end, points, archive=archive)
+            response_data.update({'bucket_seconds': width, 'source': source, 'count': len(buckets), 'data': buckets})
+        else:
+            readings, series = lttb_series(db, user_id, start, end, points, archive=archive)
+            response_data.update({'readings': readings, 'data': series})
+        
+        return jsonify(response_data), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if db:
+            db.close()
+
+
+@sensor_bp.route('/history/export', methods=['GET'])
+@require_auth
+def export_history():
+    """
+    Stream the authenticated user's full history (oldest first) for offline
+    analysis, in constant memory. Gzip-compressed when the client sends
+    Accept-Encoding: gzip.
+    
+    Query Parameters:
+        format (str): ndjson (default) | csv
+        start (iso_str): Start date
+        end (iso_str): End date
+    """
+    from flask import g
+    
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'format must be one of {", ".join(EXPORT_FORMATS)}'}), 400
+    try:
+        start = parse_timestamp(request.args['start']) if request.args.get('start') else None
+        end = parse_timestamp(request.args['end']) if request.args.get('end') else None
+    except ValueError:
+        return jsonify({'error': 'start and end must be ISO timestamps'}), 400
+    
+    user_id = g.user.get('id')
+    compress = request.accept_encodings['gzip'] > 0  # Parsed header: gzip;q=0 is a refusal
+    
+    def generate():
+        db = get_db()
+        try:
+            rows = export_rows(db, user_id, start, end, archive=get_archive())
+            chunks = ndjson_chunks(rows) if export_format == 'ndjson' else csv_chunks(rows)
+            yield from encode_chunks(chunks, compress=compress)
+        finally:
+            db.close()
+    
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=sensor_history.{extension}'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.headers['Vary'] = 'Accept-Encoding'
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
 @sensor_bp.route('/control', methods=['POST'])
 @require_auth
 def control_device():
@@ -281,6 +557,8 @@ def register_device():
         if existing:
             # If it's already registered to THIS user, just return success
             if str(existing.user_id) == str(user_id):
+                 if existing.is_active:
+                     get_ownership_cache().set(device_id, existing.user_id)
                  return jsonify({
                     'success': True,
                     'message': 'Device already registered to you',
@@ -303,6 +581,9 @@ def register_device():
         db.add(new_device)
         db.commit()
         
+        # Readings from this device are tagged immediately, no TTL wait
+        get_ownership_cache().set(device_id, user_id)
+        
         return jsonify({
             'success': True,
             'message': 'Device registered successfully',
@@ -0,0 +1,304 @@
+"""
+Async Server-Sent Events server for GET /stream.
+
+A plain ASGI app that serves the same stream as the Flask /stream route, but
+keeps every connection as a coroutine on one event loop instead of pinning a
+worker thread per open dashboard. It subscribes to this process's
+StreamHub, which is fed by the MQTT handler directly (STREAM_TRANSPORT=local)
+or by the Postgres listener (STREAM_TRANSPORT=postgres).
+"""
+
+import asyncio
+import json
+import threading
+import weakref
+from urllib.parse import parse_qs
+from api.middleware import verify_token
+from config import Config
+from services.stream_hub import Subscription, get_stream_hub, parse_max_hz
+
+
+class LoopWaker:
+    """
+    Coalesces wake-ups from publisher threads into one loop callback.
+
+    A reading fanned out to N async subscribers would otherwise cost N
+    call_soon_threadsafe() calls (N self-pipe writes); here the first one
+    schedules a single callback that sets every pending event.
+    """
+
+    _wakers = weakref.WeakKeyDictionary()  # event loop -> LoopWaker
+
+    def __init__(self, loop):
+        self.loop = loop
+        self._pending = []
+        self._scheduled = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_running_loop(cls):
+        loop = asyncio.get_running_loop()
+        waker = cls._wakers.get(loop)
+        if waker is None:
+            waker = cls._wakers[loop] = cls(loop)
+        return waker
+
+    def wake(self, event):
+        """Set an asyncio.Event from any thread."""
+        with self._lock:
+            self._pending.append(event)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        try:
+            self.loop.call_soon_threadsafe(self._flush)
+        except RuntimeError:
+            # Loop closed: nobody is waiting any more
+            self._wakers.pop(self.loop, None)
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._scheduled = False
+        for event in pending:
+            event.set()
+
+
+class AsyncSubscription(Subscription):
+    """
+    Subscription that wakes an asyncio event loop instead of a thread.
+
+    deliver() still runs on the publisher's thread (MQTT / AI dispatcher);
+    the wake-up is handed to the loop through its LoopWaker, and only when
+    the consumer is not already awake.
+    """
+
+    def __init__(self, hub, device_ids, max_queue, throttle=None):
+        super().__init__(hub, device_ids, max_queue, throttle)
+        self._waker = LoopWaker.for_running_loop()
+        self._ready = asyncio.Event()
+        self.closed = False
+
+    def _wake(self):
+        if not self._ready.is_set():
+            self._waker.wake(self._ready)
+
+    async def wait(self, timeout):
+        """
+        Wait up to `timeout` seconds for messages without blocking the loop.
+
+        Returns:
+            list[StreamMessage]: Queued messages, oldest first (empty on timeout)
+        """
+        if not self._ready.is_set():
+            # A timer handle is much cheaper than wait_for()'s extra task per wait
+            timer = self._waker.loop.call_later(self._wait_timeout(timeout), self._ready.set)
+            try:
+                await self._ready.wait()
+            finally:
+                timer.cancel()
+        self._ready.clear()
+        return self.drain()
+
+    def close(self):
+        """Unsubscribe and wake the consumer so it can exit."""
+        self.closed = True
+        super().close()
+        self._ready.set()
+
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-allow-headers', b'Authorization, Accept, Last-Event-ID'),
+    (b'access-control-allow-methods', b'GET, OPTIONS'),
+]
+
+STREAM_HEADERS = [
+    (b'content-type', b'text/event-stream; charset=utf-8'),
+    (b'cache-control', b'no-cache'),
+    (b'x-accel-buffering', b'no'),
+] + CORS_HEADERS
+
+
+class StreamApp:
+    """
+    ASGI application serving GET /stream (everything else is 404).
+
+    Token verification and the device lookup are blocking calls, so they run
+    in the default thread pool; after that a connection costs one coroutine,
+    one watcher task and its subscription queue.
+    """
+
+    def __init__(self, flask_app, hub=None, keepalive=None):
+        """
+        Args:
+            flask_app: Flask app (for the database session used by the device lookup)
+            hub: StreamHub to subscribe to (defaults to the global hub)
+            keepalive: Seconds between keep-alive comments on idle connections
+        """
+        self.flask_app = flask_app
+        self.hub = hub or get_stream_hub()
+        self.keepalive = keepalive or Config.STREAM_KEEPALIVE_INTERVAL
+        self.open_connections = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        if scope['path'].rstrip('/') != '/stream':
+            await self._send_json(send, 404, {'error': 'Not found'})
+        elif scope['method'] == 'OPTIONS':
+            await send({'type': 'http.response.start', 'status': 204, 'headers': CORS_HEADERS})
+            await send({'type': 'http.response.body', 'body': b''})
+        elif scope['method'] != 'GET':
+            await self._send_json(send, 405, {'error': 'Method not allowed'})
+        else:
+            await self._stream(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def _send_json(send, status, body):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json')] + CORS_HEADERS,
+        })
+        await send({'type': 'http.response.body', 'body': json.dumps(body).encode('utf-8')})
+
+    async def _authenticate(self, scope):
+        """
+        Same rules as api.middleware.require_auth.
+
+        Returns:
+            (user, None) on success, (None, error message) otherwise
+        """
+        headers = dict(scope.get('headers') or [])
+        auth_header = headers.get(b'authorization')
+        if not auth_header:
+            return None, 'Missing Authorization header'
+
+        parts = auth_header.decode('latin-1').split(' ')
+        if len(parts) < 2:
+            return None, 'Invalid Authorization header format'
+
+        loop = asyncio.get_running_loop()
+        user = await loop.run_in_executor(None, verify_token, parts[1])
+        if not user:
+            return None, 'Invalid token'
+        return user, None
+
+    @staticmethod
+    def _last_event_id(scope, query):
+        """Last-Event-ID header, or ?last_event_id= for clients that cannot set it."""
+        headers = dict(scope.get('headers') or [])
+        if b'last-event-id' in headers:
+            return headers[b'last-event-id'].decode('latin-1')
+        return query.get('last_event_id', [None])[0]
+
+    def _user_device_ids(self, user_id):
+        from api.sensor_routes import get_user_device_ids
+        with self.flask_app.app_context():
+            return get_user_device_ids(user_id)
+
+    async def _stream(self, scope, receive, send):
+        user, error = await self._authenticate(scope)
+        if error:
+            await self._send_json(send, 401, {'error': error})
+            return
+
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        try:
+            max_hz = parse_max_hz(query.get('max_hz', [None])[0])
+        except ValueError as e:
+            await self._send_json(send, 400, {'error': str(e)})
+            return
+
+        loop = asyncio.get_running_loop()
+        device_ids = await loop.run_in_executor(None, self._user_device_ids, user.get('id'))
+
+        subscription = self.hub.subscribe(
+            device_ids,
+            subscription_class=AsyncSubscription,
+            last_event_id=self._last_event_id(scope, query),
+            max_hz=max_hz
+        )
+        watcher = asyncio.ensure_future(self._watch_disconnect(receive, subscription))
+        self.open_connections += 1
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': STREAM_HEADERS})
+            last_write = loop.time()
+            while not subscription.closed:
+                messages = await subscription.wait(self.keepalive)
+                if subscription.closed:
+                    break
+                if messages:
+                    # One write per wake-up; frames are pre-encoded once at ingest
+                    body = b''.join(m.frame for m in messages)
+                elif loop.time() - last_write >= self.keepalive:
+                    body = b': keep-alive\n\n'
+                else:
+                    # Woken to schedule a rate-limit window, nothing to send yet
+                    continue
+                await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+                last_write = loop.time()
+        except OSError:
+            # Client went away mid-write
+            pass
+        finally:
+            self.open_connections -= 1
+            watcher.cancel()
+            if not subscription.closed:
+                subscription.close()
+
+    @staticmethod
+    async def _watch_disconnect(receive, subscription):
+        """Close the subscription as soon as the client disconnects."""
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                subscription.close()
+                return
+
+    def stats(self):
+        """Open async stream connections."""
+        return {'open_connections': self.open_connections}
+
+
+def start_stream_server(flask_app, host=None, port=None):
+    """
+    Serve the async stream in a background thread of this process, so it
+    shares this process's stream hub. uvicorn only installs signal
+    handlers on the main thread, so Ctrl+C still reaches the Flask server.
+
+    Returns:
+        StreamApp: The running ASGI app (None if uvicorn is not installed)
+    """
+    try:
+        import uvicorn
+    except ImportError:
+        print("⚠️  uvicorn is not installed, async stream server disabled")
+        return None
+
+    stream_app = StreamApp(flask_app)
+    server = uvicorn.Server(uvicorn.Config(
+        stream_app,
+        host=host or Config.STREAM_ASYNC_HOST,
+        port=port or Config.STREAM_ASYNC_PORT,
+        log_level='warning',
+        lifespan='on',
+    ))
+    thread = threading.Thread(target=server.run, name='stream-asgi', daemon=True)
+    thread.start()
+    print(f"✓ Async stream server running on http://{host or Config.STREAM_ASYNC_HOST}:{port or Config.STREAM_ASYNC_PORT}/stream")
+    return stream_app
@@ -0,0 +1,226 @@
+"""
+Remote token verification against Supabase Auth (/auth/v1/user).
+
+Used when tokens cannot be verified locally (see api.jwt_verifier). A burst
+of requests carrying the same token costs at most one call: results are
+cached per token hash (never past the token's exp), concurrent lookups of
+the same token share one in-flight request, and requests reuse pooled
+keep-alive HTTPS connections instead of a new TLS handshake each time.
+"""
+
+import hashlib
+import http.client
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+import jwt
+from config import Config
+
+
+class HTTPConnectionPool:
+    """Small LIFO pool of keep-alive connections to one host."""
+
+    def __init__(self, base_url, size=4, timeout=10, connection_factory=None):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port
+        self.timeout = timeout
+        self._factory = connection_factory or (
+            http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        )
+        self._idle = queue.LifoQueue(maxsize=size)
+        self.created = 0
+
+    def _connection(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            self.created += 1
+            return self._factory(self.host, self.port, timeout=self.timeout)
+
+    def _release(self, conn):
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def request(self, method, path, headers):
+        """
+        Send a request on a pooled connection.
+
+        A connection the server already closed fails on first use; that
+        request is retried once on a fresh connection.
+
+        Returns:
+            (status, body bytes)
+        """
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, path, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                if attempt:
+                    raise
+                continue
+            if response.will_close:
+                conn.close()
+            else:
+                self._release(conn)
+            return response.status, body
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class _InFlight:
+    __slots__ = ('done', 'result')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class RemoteTokenVerifier:
+    """
+    Cached, single-flight verification through Supabase Auth.
+
+    Only successful lookups are cached; each entry lives for `ttl` seconds
+    or until the token's exp, whichever comes first.
+    """
+
+    def __init__(self, supabase_url, api_key, ttl=60, max_entries=10000, pool_size=4, timeout=10,
+                 connection_factory=None):
+        """
+        Args:
+            supabase_url: Project URL (https://<ref>.supabase.co)
+            api_key: Project API key sent as `apikey`
+            ttl: Max seconds a verified token is trusted without asking again
+            max_entries: Max cached tokens (least recently used evicted first)
+            pool_size: Max idle keep-alive connections kept open
+            timeout: Socket timeout in seconds
+        """
+        self.path = urlsplit(supabase_url).path.rstrip('/') + '/auth/v1/user'
+        self.api_key = api_key
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.pool = HTTPConnectionPool(supabase_url, size=pool_size, timeout=timeout,
+                                       connection_factory=connection_factory)
+
+        self._cache = OrderedDict()  # sha256(token) -> (user, expires_at)
+        self._in_flight = {}  # sha256(token) -> _InFlight
+        self._lock = threading.Lock()
+
+        # Counters (exposed through stats())
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.remote_calls = 0
+
+    @staticmethod
+    def _token_key(token):
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def _expires_at(self, token, now):
+        """Cache deadline: now + ttl, capped at the token's own exp."""
+        expires_at = now + self.ttl
+        try:
+            # Unverified read: exp can only shorten the cache lifetime
+            exp = jwt.decode(token, options={'verify_signature': False}).get('exp')
+        except jwt.PyJWTError:
+            exp = None
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, now + (exp - time.time()))
+        return expires_at
+
+    def _fetch_user(self, token):
+        """Call /auth/v1/user. Returns the user dict or None."""
+        self.remote_calls += 1
+        status, body = self.pool.request('GET', self.path, {
+            'Authorization': f'Bearer {token}',
+            'apikey': self.api_key or '',
+        })
+        if status != 200:
+            return None
+        return json.loads(body.decode('utf-8'))
+
+    def verify(self, token):
+        """
+        Returns:
+            dict | None: User object if Supabase accepts the token
+        """
+        key = self._token_key(token)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                if cached[1] > now:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    return cached[0]
+                del self._cache[key]
+
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _InFlight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            return call.result
+
+        try:
+            call.result = self._fetch_user(token)
+        except Exception as e:
+            print(f"✗ Supabase Auth verification failed: {e}")
+            call.result = None
+        finally:
+            expires_at = self._expires_at(token, now) if call.result else now
+            with self._lock:
+                if expires_at > now:
+                    self._cache[key] = (call.result, expires_at)
+                    while len(self._cache) > self.max_entries:
+                        self._cache.popitem(last=False)
+                del self._in_flight[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        """Cache and connection counters."""
+        return {
+            'cached_tokens': len(self._cache),
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'remote_calls': self.remote_calls,
+            'connections_opened': self.pool.created,
+        }
+
+
+# Global remote verifier instance
+remote_verifier = None
+
+def get_remote_verifier():
+    """Get or create the global remote verifier (None if SUPABASE_URL is not set)."""
+    global remote_verifier
+    if remote_verifier is None and Config.SUPABASE_URL:
+        remote_verifier = RemoteTokenVerifier(
+            Config.SUPABASE_URL,
+            Config.SUPABASE_KEY,
+            ttl=Config.AUTH_REMOTE_CACHE_TTL,
+            max_entries=Config.AUTH_REMOTE_CACHE_MAX_ENTRIES,
+            pool_size=Config.AUTH_REMOTE_POOL_SIZE
+        )
+    return remote_verifier
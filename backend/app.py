@@ -28,6 +28,20 @@ def create_app():
     from models.database import db
     Migrate(app, db)
     
+    # Maintenance commands (flask --app app rollups rebuild)
+    from commands import register_commands
+    register_commands(app)
+    
+    # Background threads (JWKS refresh, stream transport) are started per
+    # serving process on first use, never here: they would not survive a
+    # pre-fork server and CLI commands do not need them.
+    
+    # Load AI models now (before workers fork, so they share the pages) instead
+    # of on the first reading. Skipped for CLI commands (flask db upgrade, ...).
+    if Config.AI_EAGER_LOAD and os.environ.get('FLASK_RUN_FROM_CLI') != 'true':
+        from services.ai_prediction_service import AIPredictionService
+        AIPredictionService.warmup()
+    
     return app
 
 
@@ -50,11 +64,20 @@ def main():
     mqtt_handler = get_mqtt_handler()
     
     if not Config.DEBUG or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        # Publish (and receive) stream messages through STREAM_TRANSPORT
+        from services.stream_transport import get_stream_transport
+        get_stream_transport().start()
+        
         print("\n[3/3] Initializing MQTT client...")
+        # Give MQTT handler access to Flask app context (needed to warm caches)
+        mqtt_handler.app = app
         mqtt_handler.connect()
         mqtt_handler.start_loop()
-        # Give MQTT handler access to Flask app context
-        mqtt_handler.app = app
+        
+        # Async /stream server on its own port (shares the in-process stream hub)
+        if Config.STREAM_ASYNC_ENABLED:
+            from api.stream_asgi import start_stream_server
+            start_stream_server(app)
     else:
         print("\n[3/3] Skipping MQTT init in reloader parent process")
     
@@ -79,6 +102,8 @@ def main():
         # Only stop if it was started
         if not Config.DEBUG or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
             mqtt_handler.stop_loop()
+        from services.stream_transport import get_stream_transport
+        get_stream_transport().stop()
         close_db()
         print("✓ Server stopped")
 
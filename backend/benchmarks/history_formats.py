@@ -0,0 +1,75 @@
+"""
+Benchmark: /history limit-mode response formats.
+
+Loads N readings into SQLite and times the full request (query +
+serialization) for json (ORM objects + to_dict), columnar, arrow and binary,
+reporting payload sizes.
+
+Run from the backend directory:
+    python -m benchmarks.history_formats --rows 10000
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Importing the api package loads the chatbot config, which requires these
+os.environ.setdefault('GEMINI_API', 'benchmark')
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from flask import Flask  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+import api.middleware  # noqa: E402
+from api import sensor_bp  # noqa: E402
+from models import SensorData  # noqa: E402
+from models.database import db  # noqa: E402
+
+USER_ID = uuid.uuid4()
+FORMATS = ('json', 'columnar', 'arrow', 'binary')
+
+
+def build_client(rows):
+    api.middleware.verify_token = lambda token: {'id': USER_ID}
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    app.register_blueprint(sensor_bp)
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    with app.app_context():
+        db.create_all()
+        db.session.execute(insert(SensorData), [{
+            'user_id': USER_ID, 'temperature': 20 + (i % 100) / 10, 'humidity': 50 + (i % 30) / 3,
+            'co_level': i % 90, 'recorded_at': base + timedelta(seconds=i)
+        } for i in range(rows)])
+        db.session.commit()
+    return app.test_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    client = build_client(args.rows)
+    headers = {'Authorization': 'Bearer bench'}
+    for fmt in FORMATS:
+        query = {'limit': args.rows, 'format': fmt}
+        response = client.get('/history', query_string=query, headers=headers)
+        if response.status_code != 200:
+            print(f"{fmt:<9} skipped ({response.status_code}: {response.get_data(as_text=True)[:60]})")
+            continue
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            client.get('/history', query_string=query, headers=headers)
+        elapsed = (time.perf_counter() - started) / args.repeat
+        print(f"{fmt:<9} rows={args.rows:<7} payload={len(response.data) / 1024:9.1f} KiB  "
+              f"request={elapsed * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
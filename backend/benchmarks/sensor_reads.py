@@ -0,0 +1,88 @@
+"""
+Benchmark: SensorData read paths, ORM instances vs the Core read layer.
+
+Reads the same N readings (newest first, one user) and serializes them to
+dicts, reporting rows/sec for:
+
+    orm:    db.query(SensorData) + SensorData.to_dict (the old /history path)
+    rows:   models.sensor_reader.fetch_rows + SensorRow.to_dict
+    tuples: plain Core tuples from select_readings (exports, columnar, series)
+
+Runs on in-memory SQLite by default; pass --database-url to measure against
+Postgres (the table must exist, N readings are inserted for a random user and
+deleted afterwards).
+
+Run from the backend directory:
+    python -m benchmarks.sensor_reads --rows 50000
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+from sqlalchemy import delete, insert  # noqa: E402
+from models import SensorData  # noqa: E402
+from models.database import db  # noqa: E402
+from models.sensor_reader import fetch_rows, select_readings  # noqa: E402
+
+
+def read_orm(session, user_id):
+    records = session.query(SensorData).filter(SensorData.user_id == user_id).order_by(
+        SensorData.recorded_at.desc(), SensorData.id.desc()
+    ).all()
+    data = [record.to_dict() for record in records]
+    session.expunge_all()
+    return len(data)
+
+
+def read_rows(session, user_id):
+    return len([row.to_dict() for row in fetch_rows(session, select_readings(user_id))])
+
+
+def read_tuples(session, user_id):
+    return len(session.execute(select_readings(user_id)).all())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--database-url', default='sqlite://')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = args.database_url
+    db.init_app(app)
+    user_id = uuid.uuid4()
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    with app.app_context():
+        if args.database_url.startswith('sqlite'):
+            db.create_all()
+        db.session.execute(insert(SensorData), [{
+            'user_id': user_id, 'temperature': 20 + (i % 100) / 10, 'humidity': 50 + (i % 30) / 3,
+            'co_level': i % 90, 'recorded_at': base + timedelta(seconds=i)
+        } for i in range(args.rows)])
+        db.session.commit()
+        try:
+            for name, reader in (('orm', read_orm), ('rows', read_rows), ('tuples', read_tuples)):
+                best = float('inf')
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    assert reader(db.session, user_id) == args.rows
+                    best = min(best, time.perf_counter() - started)
+                    db.session.rollback()
+                print(f"{name:<7} rows={args.rows:<8} {args.rows / best:12,.0f} rows/s  ({best * 1000:.1f} ms)")
+        finally:
+            db.session.execute(delete(SensorData).where(SensorData.user_id == user_id))
+            db.session.commit()
+
+
+if __name__ == '__main__':
+    main()
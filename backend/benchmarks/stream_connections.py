@@ -0,0 +1,168 @@
+"""
+Benchmark: idle SSE connections, threaded Flask generator vs async (ASGI) server.
+
+Holds N simulated /stream connections open on the same StreamHub and reports
+how many could be opened, the memory each one costs, and how long one
+published reading takes to reach all of them.
+
+    threaded: one thread per connection looping on Subscription.get(), which
+              is what the Flask /stream generator does under a threaded server
+    async:    one coroutine per connection running api.stream_asgi.StreamApp
+              on a single event loop (no sockets; ASGI send/receive are stubs)
+
+Run from the backend directory (Linux, reads /proc/self/status):
+    python -m benchmarks.stream_connections --connections 5000
+"""
+
+import argparse
+import asyncio
+import gc
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Importing the api package loads the chatbot config, which requires these
+os.environ.setdefault('GEMINI_API', 'benchmark')
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+import api.stream_asgi  # noqa: E402
+from api.stream_asgi import StreamApp  # noqa: E402
+from services.stream_hub import StreamHub  # noqa: E402
+
+KEEPALIVE = 5.0
+DEVICE = 'bench-device'
+
+
+def memory_kb():
+    """(resident, virtual) memory of this process in KiB."""
+    values = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(('VmRSS:', 'VmSize:')):
+                key, value = line.split(':')
+                values[key] = int(value.split()[0])
+    return values['VmRSS'], values['VmSize']
+
+
+def bench_threaded(n):
+    hub = StreamHub(max_queue=100)
+    stopping = threading.Event()
+    received = threading.Semaphore(0)
+    threads = []
+
+    def connection():
+        # Mirrors api.sensor_routes.stream_readings.generate()
+        subscription = hub.subscribe({DEVICE})
+        try:
+            while not stopping.is_set():
+                messages = subscription.get(timeout=KEEPALIVE)
+                for message in messages:
+                    _ = message.frame
+                    received.release()
+        finally:
+            subscription.close()
+
+    gc.collect()
+    rss_before, vm_before = memory_kb()
+    error = None
+    for _ in range(n):
+        thread = threading.Thread(target=connection, daemon=True)
+        try:
+            thread.start()
+        except RuntimeError as e:  # can't start new thread
+            error = str(e)
+            break
+        threads.append(thread)
+    while hub.subscriber_count() < len(threads):
+        time.sleep(0.01)
+    rss_after, vm_after = memory_kb()
+
+    started = time.perf_counter()
+    hub.publish(DEVICE, {'co_level': 1})
+    for _ in threads:
+        received.acquire()
+    fanout = time.perf_counter() - started
+
+    stopping.set()
+    hub.publish(DEVICE, {'co_level': 0})
+    for thread in threads:
+        thread.join()
+    return len(threads), rss_after - rss_before, vm_after - vm_before, fanout, error
+
+
+def bench_async(n):
+    hub = StreamHub(max_queue=100)
+    app = StreamApp(flask_app=None, hub=hub, keepalive=KEEPALIVE)
+    app._user_device_ids = lambda user_id: {DEVICE}
+    ready = threading.Event()
+    done = threading.Event()
+    api.stream_asgi.verify_token = lambda token: {'id': 'bench-user'}
+
+    async def main():
+        disconnect = asyncio.Event()
+        received = [0]
+        all_received = asyncio.Event()
+
+        async def receive():
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message.get('body', b'').startswith(b'data:'):
+                received[0] += 1
+                if received[0] == n:
+                    all_received.set()
+
+        scope = {'type': 'http', 'path': '/stream', 'method': 'GET',
+                 'headers': [(b'authorization', b'Bearer bench')]}
+        tasks = [asyncio.ensure_future(app(scope, receive, send)) for _ in range(n)]
+        while hub.subscriber_count() < n:
+            await asyncio.sleep(0.01)
+
+        ready.set()
+        await all_received.wait()
+        done.set()
+
+        disconnect.set()
+        await asyncio.gather(*tasks)
+
+    gc.collect()
+    rss_before, vm_before = memory_kb()
+    thread = threading.Thread(target=asyncio.run, args=(main(),), daemon=True)
+    thread.start()
+    ready.wait()
+    rss_after, vm_after = memory_kb()
+
+    # Publish from a foreign thread, like the MQTT handler does
+    started = time.perf_counter()
+    hub.publish(DEVICE, {'co_level': 1})
+    done.wait()
+    fanout = time.perf_counter() - started
+    thread.join()
+    return n, rss_after - rss_before, vm_after - vm_before, fanout, None
+
+
+def report(name, opened, rss_kb, vm_kb, fanout, error):
+    per_conn = lambda kb: f"{kb / opened:8.1f} KiB" if opened else 'n/a'
+    print(f"{name:<9} connections={opened:<6} rss/conn={per_conn(rss_kb)}  "
+          f"virtual/conn={per_conn(vm_kb)}  fan-out={fanout * 1000:8.1f} ms"
+          + (f"  (stopped: {error})" if error else ''))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--connections', type=int, default=2000)
+    parser.add_argument('--mode', choices=['threaded', 'async', 'both'], default='both')
+    args = parser.parse_args()
+
+    # Async first: thread stacks are not always returned to the OS afterwards
+    if args.mode in ('async', 'both'):
+        report('async', *bench_async(args.connections))
+    if args.mode in ('threaded', 'both'):
+        report('threaded', *bench_threaded(args.connections))
+
+
+if __name__ == '__main__':
+    main()
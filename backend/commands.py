@@ -0,0 +1,99 @@
+"""
+Flask CLI maintenance commands.
+
+    flask --app app rollups rebuild [--since 2025-01-01] [--force]
+    flask --app app partitions maintain [--retention-days 365] [--dry-run]
+    flask --app app archive run [--older-than-days 180]
+"""
+
+from datetime import datetime, timedelta, timezone
+import click
+from flask.cli import AppGroup
+from config import Config
+from models import get_db
+from services.archive import archive_readings, get_archive
+from services.downsampling import parse_timestamp
+from services.partitions import INTERVALS, interval_start, run_maintenance
+from services.rollups import rebuild_rollups
+
+rollups_cli = AppGroup('rollups', help='Sensor rollup tables.')
+partitions_cli = AppGroup('partitions', help='sensor_data range partitions.')
+archive_cli = AppGroup('archive', help='Cold-tier Parquet archive of old readings.')
+
+
+@rollups_cli.command('rebuild')
+@click.option('--since', default=None, help='Only rebuild from this ISO date/time (default: everything).')
+@click.option('--batch-size', default=5000, show_default=True, help='Raw readings per upsert batch.')
+@click.option('--force', is_flag=True, help='Rebuild even below the retention boundary (drops rollups of expired readings).')
+def rebuild_command(since, batch_size, force):
+    """Backfill or rebuild the minute/hour/day rollups from sensor_data and the archive."""
+    since = parse_timestamp(since) if since else None
+    archive = get_archive()
+    try:
+        total = rebuild_rollups(get_db(), since=since, batch_size=batch_size, archive=archive,
+                                floor=None if force else _retention_floor(archive))
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"✓ Rolled up {total} readings" + (f" since {since.isoformat()}" if since else ''))
+
+
+def _retention_floor(archive):
+    """
+    Start of the oldest sensor_data partition retention keeps, or None when
+    nothing older was dropped without being archived first.
+    """
+    days = Config.SENSOR_RETENTION_DAYS
+    if days <= 0 or (archive is not None and Config.ARCHIVE_AFTER_DAYS < days):
+        return None
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    return interval_start(cutoff, Config.SENSOR_PARTITION_INTERVAL)
+
+
+@partitions_cli.command('maintain')
+@click.option('--interval', type=click.Choice(INTERVALS), default=None,
+              help='Size of new partitions (default: SENSOR_PARTITION_INTERVAL).')
+@click.option('--premake', type=int, default=None,
+              help='Intervals to create ahead of now (default: SENSOR_PARTITION_PREMAKE).')
+@click.option('--retention-days', type=int, default=None,
+              help='Expire partitions older than this, 0 keeps all (default: SENSOR_RETENTION_DAYS).')
+@click.option('--detach-only', is_flag=True, help='Detach expired partitions but keep the tables.')
+@click.option('--dry-run', is_flag=True, help='Only print what would change.')
+def maintain_command(interval, premake, retention_days, detach_only, dry_run):
+    """Create upcoming sensor_data partitions and expire old ones."""
+    created, expired = run_maintenance(
+        get_db(),
+        interval=interval or Config.SENSOR_PARTITION_INTERVAL,
+        premake=Config.SENSOR_PARTITION_PREMAKE if premake is None else premake,
+        retention_days=Config.SENSOR_RETENTION_DAYS if retention_days is None else retention_days,
+        drop=Config.SENSOR_RETENTION_DROP and not detach_only,
+        dry_run=dry_run
+    )
+    prefix = '(dry run) ' if dry_run else ''
+    for name in created:
+        click.echo(f"{prefix}✓ Created partition {name}")
+    for name in expired:
+        action = 'Detached' if detach_only or not Config.SENSOR_RETENTION_DROP else 'Dropped'
+        click.echo(f"{prefix}✓ {action} partition {name}")
+    if not created and not expired:
+        click.echo("✓ Partitions up to date")
+
+
+@archive_cli.command('run')
+@click.option('--older-than-days', type=int, default=None,
+              help='Archive whole months older than this (default: ARCHIVE_AFTER_DAYS).')
+@click.option('--batch-size', default=5000, show_default=True, help='Readings fetched per round trip.')
+def archive_command(older_than_days, batch_size):
+    """Move old readings from sensor_data to per-user/per-month Parquet files."""
+    archive = get_archive()
+    if archive is None:
+        raise click.ClickException('ARCHIVE_DIR is not set')
+    days = Config.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    cutoff, total = archive_readings(get_db(), archive, days, batch_size=batch_size)
+    click.echo(f"✓ Archived {total} readings recorded before {cutoff.isoformat()} to {archive.root}")
+
+
+def register_commands(app):
+    """Attach the CLI command groups to the Flask app."""
+    app.cli.add_command(rollups_cli)
+    app.cli.add_command(partitions_cli)
+    app.cli.add_command(archive_cli)
@@ -27,6 +27,22 @@ class Config:
     SUPABASE_URL = os.getenv('SUPABASE_URL')
     SUPABASE_KEY = os.getenv('SUPABASE_KEY')
     
+    # Auth: verify JWTs locally ('local') or by calling Supabase Auth on every request ('remote')
+    AUTH_VERIFY_MODE = os.getenv('AUTH_VERIFY_MODE', 'local')
+    AUTH_REMOTE_FALLBACK = os.getenv('AUTH_REMOTE_FALLBACK', 'True') == 'True'  # Use remote when no local key fits
+    SUPABASE_JWT_SECRET = os.getenv('SUPABASE_JWT_SECRET')  # HS256 projects (legacy JWT secret)
+    SUPABASE_JWKS_URL = os.getenv(
+        'SUPABASE_JWKS_URL', f"{SUPABASE_URL}/auth/v1/.well-known/jwks.json" if SUPABASE_URL else None
+    )
+    SUPABASE_JWT_AUDIENCE = os.getenv('SUPABASE_JWT_AUDIENCE', 'authenticated')
+    SUPABASE_JWT_ISSUER = os.getenv('SUPABASE_JWT_ISSUER', f"{SUPABASE_URL}/auth/v1" if SUPABASE_URL else None)
+    AUTH_JWKS_REFRESH_INTERVAL = float(os.getenv('AUTH_JWKS_REFRESH_INTERVAL', 600))
+    AUTH_JWT_LEEWAY = float(os.getenv('AUTH_JWT_LEEWAY', 30))
+    # Remote verification (Supabase Auth): per-token cache and keep-alive connection pool
+    AUTH_REMOTE_CACHE_TTL = float(os.getenv('AUTH_REMOTE_CACHE_TTL', 60))
+    AUTH_REMOTE_CACHE_MAX_ENTRIES = int(os.getenv('AUTH_REMOTE_CACHE_MAX_ENTRIES', 10000))
+    AUTH_REMOTE_POOL_SIZE = int(os.getenv('AUTH_REMOTE_POOL_SIZE', 4))
+    
     # MQTT Configuration
     MQTT_BROKER = os.getenv('MQTT_BROKER', 'broker.hivemq.com')
     MQTT_PORT = int(os.getenv('MQTT_PORT', 1883))
@@ -38,6 +54,75 @@ class Config:
     MQTT_TOPIC_UPLOAD = os.getenv('MQTT_TOPIC_UPLOAD', 'ecs/upload')
     MQTT_TOPIC_CONTROL = os.getenv('MQTT_TOPIC_CONTROL', 'ecs/control')
     
+    # Streaming (SSE): max queued messages per subscriber before dropping the oldest
+    STREAM_SUBSCRIBER_QUEUE_SIZE = int(os.getenv('STREAM_SUBSCRIBER_QUEUE_SIZE', 100))
+    STREAM_KEEPALIVE_INTERVAL = float(os.getenv('STREAM_KEEPALIVE_INTERVAL', 5.0))
+    # Recent messages kept per device so reconnecting clients can resume with Last-Event-ID (0 disables)
+    STREAM_REPLAY_BUFFER_SIZE = int(os.getenv('STREAM_REPLAY_BUFFER_SIZE', 50))
+    # Fan-out from the MQTT ingest process to web workers: 'local' (single process) or 'postgres' (LISTEN/NOTIFY)
+    STREAM_TRANSPORT = os.getenv('STREAM_TRANSPORT', 'local')
+    STREAM_PG_CHANNEL = os.getenv('STREAM_PG_CHANNEL', 'ecs_stream')
+    # Async SSE server (ASGI sidecar sharing the in-process stream hub, one event loop for all connections)
+    STREAM_ASYNC_ENABLED = os.getenv('STREAM_ASYNC_ENABLED', 'False') == 'True'
+    STREAM_ASYNC_HOST = os.getenv('STREAM_ASYNC_HOST', '0.0.0.0')
+    STREAM_ASYNC_PORT = int(os.getenv('STREAM_ASYNC_PORT', 5001))
+    
+    # Ingest (write-behind queue for sensor_data inserts)
+    INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 200))
+    INGEST_FLUSH_INTERVAL = float(os.getenv('INGEST_FLUSH_INTERVAL', 1.0))
+    INGEST_QUEUE_MAX_SIZE = int(os.getenv('INGEST_QUEUE_MAX_SIZE', 10000))
+    INGEST_MAX_BATCH_ATTEMPTS = int(os.getenv('INGEST_MAX_BATCH_ATTEMPTS', 3))
+    INGEST_DEAD_LETTER_SIZE = int(os.getenv('INGEST_DEAD_LETTER_SIZE', 100))
+    INGEST_MAX_DEVICES = int(os.getenv('INGEST_MAX_DEVICES', 20000))
+    INGEST_DEVICE_IDLE_TIMEOUT = float(os.getenv('INGEST_DEVICE_IDLE_TIMEOUT', 3600))
+    OWNERSHIP_CACHE_TTL = float(os.getenv('OWNERSHIP_CACHE_TTL', 300))
+    OWNERSHIP_CACHE_NEGATIVE_TTL = float(os.getenv('OWNERSHIP_CACHE_NEGATIVE_TTL', 30))
+    OWNERSHIP_CACHE_MAX_SIZE = int(os.getenv('OWNERSHIP_CACHE_MAX_SIZE', 20000))
+    
+    # /history response cache: settled ranges (end older than HISTORY_CACHE_SETTLE_SECONDS) are cached for
+    # a tenth of their age (max a day) or until late readings land in them; ranges touching now until the
+    # user's data changes or HISTORY_CACHE_LIVE_TTL passes
+    HISTORY_CACHE_ENABLED = os.getenv('HISTORY_CACHE_ENABLED', 'True') == 'True'
+    HISTORY_CACHE_MAX_ENTRIES = int(os.getenv('HISTORY_CACHE_MAX_ENTRIES', 512))
+    HISTORY_CACHE_MAX_BYTES = int(os.getenv('HISTORY_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    HISTORY_CACHE_LIVE_TTL = float(os.getenv('HISTORY_CACHE_LIVE_TTL', 5.0))
+    HISTORY_CACHE_SETTLE_SECONDS = float(os.getenv('HISTORY_CACHE_SETTLE_SECONDS', 60))
+    
+    # /history/series?method=lttb: raw readings decimated in memory; longer ranges are pre-bucketed in SQL
+    HISTORY_LTTB_MAX_ROWS = int(os.getenv('HISTORY_LTTB_MAX_ROWS', 200000))
+    
+    # sensor_data range partitions (Postgres): size of new partitions (day|week|month), how many
+    # intervals ahead to create, and retention (0 keeps everything; otherwise expired partitions
+    # are detached and, unless SENSOR_RETENTION_DROP is False, dropped)
+    SENSOR_PARTITION_INTERVAL = os.getenv('SENSOR_PARTITION_INTERVAL', 'month')
+    SENSOR_PARTITION_PREMAKE = int(os.getenv('SENSOR_PARTITION_PREMAKE', 3))
+    SENSOR_RETENTION_DAYS = int(os.getenv('SENSOR_RETENTION_DAYS', 0))
+    SENSOR_RETENTION_DROP = os.getenv('SENSOR_RETENTION_DROP', 'True') == 'True'
+    
+    # Cold-tier archive: readings of whole months older than ARCHIVE_AFTER_DAYS are moved to
+    # per-user/per-month Parquet files under ARCHIVE_DIR (empty disables; requires pyarrow)
+    ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', '')
+    ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', 180))
+    ARCHIVE_COMPRESSION = os.getenv('ARCHIVE_COMPRESSION', 'zstd')
+    ARCHIVE_ROW_GROUP_SIZE = int(os.getenv('ARCHIVE_ROW_GROUP_SIZE', 65536))
+    
+    # AI inference (micro-batched off the MQTT thread)
+    AI_BATCH_MAX_SIZE = int(os.getenv('AI_BATCH_MAX_SIZE', 64))
+    AI_BATCH_MAX_WAIT = float(os.getenv('AI_BATCH_MAX_WAIT', 0.05))
+    AI_WORKERS = int(os.getenv('AI_WORKERS', 1))
+    AI_QUEUE_MAX_SIZE = int(os.getenv('AI_QUEUE_MAX_SIZE', 5000))
+    AI_PREDICT_BATCH_MAX = int(os.getenv('AI_PREDICT_BATCH_MAX', 10000))
+    AI_ENGINE = os.getenv('AI_ENGINE', 'numpy')  # 'numpy' (exported weight bundle) or 'sklearn' (pickles)
+    AI_EAGER_LOAD = os.getenv('AI_EAGER_LOAD', 'True') == 'True'  # Load models in create_app, not on first reading
+    AI_MMAP_WEIGHTS = os.getenv('AI_MMAP_WEIGHTS', 'True') == 'True'  # Share read-only weight pages across workers
+    
+    # AI prediction memoization (opt-in): inputs are quantized to these bucket widths
+    AI_CACHE_ENABLED = os.getenv('AI_CACHE_ENABLED', 'False') == 'True'
+    AI_CACHE_MAX_ENTRIES = int(os.getenv('AI_CACHE_MAX_ENTRIES', 4096))
+    AI_CACHE_RES_TEMPERATURE = float(os.getenv('AI_CACHE_RES_TEMPERATURE', 0.1))
+    AI_CACHE_RES_HUMIDITY = float(os.getenv('AI_CACHE_RES_HUMIDITY', 0.5))
+    AI_CACHE_RES_CO = float(os.getenv('AI_CACHE_RES_CO', 1.0))
+    
     @staticmethod
     def validate():
         """Validate that required configuration is present."""
@@ -0,0 +1,40 @@
+"""Add (user_id, recorded_at DESC, id DESC) index on sensor_data
+
+Revision ID: 3b7e91c4d2a5
+Revises: 028affd6086a
+Create Date: 2026-10-17 09:12:41.208331
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7e91c4d2a5'
+down_revision = '028affd6086a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Serves /history for one user newest-first (keyset pagination on recorded_at, id)
+    # CONCURRENTLY cannot run inside a transaction, and avoids locking writes on a large table
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_sensor_data_user_id_recorded_at',
+            'sensor_data',
+            ['user_id', sa.text('recorded_at DESC'), sa.text('id DESC')],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_sensor_data_user_id_recorded_at',
+            table_name='sensor_data',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,46 @@
+"""Add sensor_rollup_1m / 1h / 1d tables
+
+Revision ID: 5c2d8e1f9a37
+Revises: 3b7e91c4d2a5
+Create Date: 2026-10-17 11:05:12.544720
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '5c2d8e1f9a37'
+down_revision = '3b7e91c4d2a5'
+branch_labels = None
+depends_on = None
+
+ROLLUP_TABLES = ('sensor_rollup_1m', 'sensor_rollup_1h', 'sensor_rollup_1d')
+
+
+def upgrade():
+    # Filled by the ingest writer from now on; backfill existing data with
+    #   flask --app app rollups rebuild
+    for table in ROLLUP_TABLES:
+        op.create_table(
+            table,
+            sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+            sa.Column('bucket_start', sa.DateTime(timezone=True), nullable=False),
+            sa.Column('count', sa.BigInteger(), nullable=False),
+            sa.Column('temperature_sum', sa.Numeric(16, 2), nullable=False),
+            sa.Column('temperature_min', sa.DECIMAL(5, 2), nullable=False),
+            sa.Column('temperature_max', sa.DECIMAL(5, 2), nullable=False),
+            sa.Column('humidity_sum', sa.Numeric(16, 2), nullable=False),
+            sa.Column('humidity_min', sa.DECIMAL(5, 2), nullable=False),
+            sa.Column('humidity_max', sa.DECIMAL(5, 2), nullable=False),
+            sa.Column('co_level_sum', sa.BigInteger(), nullable=False),
+            sa.Column('co_level_min', sa.Integer(), nullable=False),
+            sa.Column('co_level_max', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('user_id', 'bucket_start'),
+        )
+
+
+def downgrade():
+    for table in reversed(ROLLUP_TABLES):
+        op.drop_table(table)
@@ -0,0 +1,149 @@
+"""Partition sensor_data by month on recorded_at
+
+Revision ID: 7a4e2b9c1d58
+Revises: 5c2d8e1f9a37
+Create Date: 2026-10-17 14:22:07.915604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a4e2b9c1d58'
+down_revision = '5c2d8e1f9a37'
+branch_labels = None
+depends_on = None
+
+# Monthly partitions created ahead of now; later ones come from
+#   flask --app app partitions maintain
+PREMAKE_MONTHS = 3
+
+
+def upgrade():
+    # NOTE: copies every row into the new partitions; sensor_data is locked
+    # for the duration, so run it in a maintenance window.
+
+    # 1. Move the current table (and its index/constraint names) out of the way
+    op.execute("ALTER TABLE sensor_data RENAME TO sensor_data_legacy")
+    op.execute("ALTER TABLE sensor_data_legacy RENAME CONSTRAINT sensor_data_pkey TO sensor_data_legacy_pkey")
+    op.execute("ALTER INDEX IF EXISTS ix_sensor_data_recorded_at RENAME TO ix_sensor_data_legacy_recorded_at")
+    op.execute(
+        "ALTER INDEX IF EXISTS ix_sensor_data_user_id_recorded_at "
+        "RENAME TO ix_sensor_data_legacy_user_id_recorded_at"
+    )
+
+    # 2. Partitioned parent. The primary key must contain the partition key;
+    #    id stays unique because every partition draws from the same sequence.
+    op.execute("""
+        CREATE TABLE sensor_data (
+            id BIGINT NOT NULL DEFAULT nextval('sensor_data_id_seq'),
+            user_id UUID,
+            temperature NUMERIC(5, 2) NOT NULL,
+            humidity NUMERIC(5, 2) NOT NULL,
+            co_level INTEGER NOT NULL,
+            recorded_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, recorded_at)
+        ) PARTITION BY RANGE (recorded_at)
+    """)
+    op.execute("ALTER SEQUENCE sensor_data_id_seq OWNED BY sensor_data.id")
+    op.create_index('ix_sensor_data_recorded_at', 'sensor_data', ['recorded_at'], unique=False)
+    op.create_index(
+        'ix_sensor_data_user_id_recorded_at',
+        'sensor_data',
+        ['user_id', sa.text('recorded_at DESC'), sa.text('id DESC')],
+        unique=False,
+    )
+
+    # 3. One partition per month from the oldest reading to PREMAKE_MONTHS
+    #    ahead, plus a default partition so an insert can never fail
+    op.execute(f"""
+        DO $$
+        DECLARE
+            first_month TIMESTAMPTZ;
+            month TIMESTAMPTZ;
+        BEGIN
+            SELECT date_trunc('month', COALESCE(MIN(recorded_at), now()) AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'
+            INTO first_month FROM sensor_data_legacy;
+
+            month := first_month;
+            WHILE month < (date_trunc('month', now() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC')
+                          + interval '{PREMAKE_MONTHS + 1} months' LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF sensor_data FOR VALUES FROM (%L) TO (%L)',
+                    'sensor_data_p' || to_char(month AT TIME ZONE 'UTC', 'YYYYMMDD'),
+                    month,
+                    month + interval '1 month'
+                );
+                month := month + interval '1 month';
+            END LOOP;
+        END $$;
+    """)
+    op.execute("CREATE TABLE sensor_data_default PARTITION OF sensor_data DEFAULT")
+
+    # 4. Copy the data and drop the old table
+    op.execute("""
+        INSERT INTO sensor_data (id, user_id, temperature, humidity, co_level, recorded_at)
+        SELECT id, user_id, temperature, humidity, co_level, recorded_at FROM sensor_data_legacy
+    """)
+    op.execute("DROP TABLE sensor_data_legacy")
+
+    # 5. Same foreign key to auth.users as before (Supabase projects only)
+    op.execute("""
+        DO $$
+        BEGIN
+            IF to_regclass('auth.users') IS NOT NULL THEN
+                ALTER TABLE sensor_data
+                ADD CONSTRAINT fk_sensor_data_user_id
+                FOREIGN KEY (user_id) REFERENCES auth.users(id) ON DELETE CASCADE;
+            END IF;
+        END $$;
+    """)
+    op.execute("ANALYZE sensor_data")
+
+
+def downgrade():
+    op.execute("ALTER TABLE sensor_data RENAME TO sensor_data_partitioned")
+    op.execute("ALTER TABLE sensor_data_partitioned RENAME CONSTRAINT sensor_data_pkey TO sensor_data_partitioned_pkey")
+    op.execute("ALTER INDEX ix_sensor_data_recorded_at RENAME TO ix_sensor_data_partitioned_recorded_at")
+    op.execute(
+        "ALTER INDEX ix_sensor_data_user_id_recorded_at "
+        "RENAME TO ix_sensor_data_partitioned_user_id_recorded_at"
+    )
+
+    op.execute("""
+        CREATE TABLE sensor_data (
+            id BIGINT NOT NULL DEFAULT nextval('sensor_data_id_seq'),
+            user_id UUID,
+            temperature NUMERIC(5, 2) NOT NULL,
+            humidity NUMERIC(5, 2) NOT NULL,
+            co_level INTEGER NOT NULL,
+            recorded_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            CONSTRAINT sensor_data_pkey PRIMARY KEY (id)
+        )
+    """)
+    op.execute("ALTER SEQUENCE sensor_data_id_seq OWNED BY sensor_data.id")
+    op.execute("""
+        INSERT INTO sensor_data (id, user_id, temperature, humidity, co_level, recorded_at)
+        SELECT id, user_id, temperature, humidity, co_level, recorded_at FROM sensor_data_partitioned
+    """)
+    # Drops every partition with it
+    op.execute("DROP TABLE sensor_data_partitioned")
+
+    op.create_index('ix_sensor_data_recorded_at', 'sensor_data', ['recorded_at'], unique=False)
+    op.create_index(
+        'ix_sensor_data_user_id_recorded_at',
+        'sensor_data',
+        ['user_id', sa.text('recorded_at DESC'), sa.text('id DESC')],
+        unique=False,
+    )
+    op.execute("""
+        DO $$
+        BEGIN
+            IF to_regclass('auth.users') IS NOT NULL THEN
+                ALTER TABLE sensor_data
+                ADD CONSTRAINT fk_sensor_data_user_id
+                FOREIGN KEY (user_id) REFERENCES auth.users(id) ON DELETE CASCADE;
+            END IF;
+        END $$;
+    """)
@@ -0,0 +1,32 @@
+"""Add sensor_rollup_state (rollup backfill watermark)
+
+Revision ID: b8e4f0c2a6d3
+Revises: 7a4e2b9c1d58
+Create Date: 2026-10-18 09:41:33.208114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e4f0c2a6d3'
+down_revision = '7a4e2b9c1d58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Stays empty until `flask --app app rollups rebuild` has run; until then
+    # averages and series read sensor_data instead of the rollups
+    op.create_table(
+        'sensor_rollup_state',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('complete_since', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('rebuilt_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade():
+    op.drop_table('sensor_rollup_state')
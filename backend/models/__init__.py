@@ -1,3 +1,5 @@
 from .database import init_db, close_db, get_db, Base
 from .sensor_data import SensorData
 from .device_state import DeviceState
+from .sensor_rollup import SensorRollup1m, SensorRollup1h, SensorRollup1d, SensorRollupState
+from .sensor_reader import SensorRow, select_readings, fetch_rows
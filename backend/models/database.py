@@ -17,6 +17,7 @@ def init_db(app):
     # Import models to register them with SQLAlchemy
     from models.sensor_data import SensorData
     from models.device_state import DeviceState
+    from models.sensor_rollup import SensorRollup1m, SensorRollup1h, SensorRollup1d, SensorRollupState
     
     with app.app_context():
         # Create tables for development (migrations will handle this in production)
@@ -2,7 +2,7 @@
 SensorData model for storing environmental sensor readings.
 """
 
-from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, func, DECIMAL, BigInteger
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, func, DECIMAL, BigInteger, Index
 from sqlalchemy.dialects.postgresql import UUID
 from models.database import Base
 
@@ -12,7 +12,10 @@ class SensorData(Base):
     
     __tablename__ = 'sensor_data'
     
-    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    # On Postgres the table is range-partitioned by recorded_at (migration
+    # 7a4e2b9c1d58, services/partitions.py) and its primary key is
+    # (id, recorded_at); id alone is still unique, so the mapper keeps it.
+    id = Column(BigInteger().with_variant(Integer, 'sqlite'), primary_key=True, autoincrement=True)
     user_id = Column(UUID(as_uuid=True), nullable=True)
     
     temperature = Column(DECIMAL(5, 2), nullable=False)
@@ -20,6 +23,11 @@ class SensorData(Base):
     co_level = Column(Integer, nullable=False)
     recorded_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
 
+    __table_args__ = (
+        # Per-user history, newest first; id breaks ties for keyset pagination
+        Index('ix_sensor_data_user_id_recorded_at', 'user_id', recorded_at.desc(), id.desc()),
+    )
+
     def to_dict(self):
         """Convert model instance to dictionary."""
         return {
@@ -0,0 +1,90 @@
+"""
+Read-only query layer for sensor_data over SQLAlchemy Core.
+
+Hot read paths (/history, exports, charts, analytics) select columns
+instead of SensorData instances: no identity map, no per-row ORM state,
+and metrics are cast to float in SQL so the driver never builds Decimal
+objects. Rows come back as tuples or lightweight SensorRow records.
+"""
+
+from sqlalchemy import Float, cast, func, select, tuple_
+from models.sensor_data import SensorData
+
+# Column order matches SensorRow.__slots__
+READ_COLUMNS = (
+    SensorData.id,
+    SensorData.user_id,
+    SensorData.recorded_at,
+    cast(SensorData.temperature, Float).label('temperature'),
+    cast(SensorData.humidity, Float).label('humidity'),
+    SensorData.co_level,
+)
+
+# Without user_id, for callers that already know the owner
+SERIES_COLUMNS = tuple(column for column in READ_COLUMNS if column is not SensorData.user_id)
+
+
+class SensorRow:
+    """Read-only sensor reading; same to_dict() as SensorData."""
+
+    __slots__ = ('id', 'user_id', 'recorded_at', 'temperature', 'humidity', 'co_level')
+
+    def __init__(self, id, user_id, recorded_at, temperature, humidity, co_level):
+        self.id = id
+        self.user_id = user_id
+        self.recorded_at = recorded_at
+        self.temperature = temperature
+        self.humidity = humidity
+        self.co_level = co_level
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': str(self.user_id) if self.user_id else None,
+            'recorded_at': self.recorded_at.isoformat() if self.recorded_at else None,
+            'temperature': self.temperature,
+            'humidity': self.humidity,
+            'co_level': self.co_level
+        }
+
+    def __repr__(self):
+        return f"<SensorRow(id={self.id}, temp={self.temperature}, hum={self.humidity}, co={self.co_level})>"
+
+
+def select_readings(user_id, start=None, end=None, columns=READ_COLUMNS, newest_first=True):
+    """
+    SELECT of one user's readings, ordered by (recorded_at, id) - the
+    order of ix_sensor_data_user_id_recorded_at.
+
+    Args:
+        user_id: Owner of the readings
+        start, end: Optional inclusive bounds on recorded_at
+        columns: Columns to select (default: READ_COLUMNS)
+        newest_first: Descending order (default) or oldest first
+
+    Returns:
+        sqlalchemy.Select
+    """
+    stmt = select(*columns).where(SensorData.user_id == user_id)
+    if start:
+        stmt = stmt.where(SensorData.recorded_at >= start)
+    if end:
+        stmt = stmt.where(SensorData.recorded_at <= end)
+    if newest_first:
+        return stmt.order_by(SensorData.recorded_at.desc(), SensorData.id.desc())
+    return stmt.order_by(SensorData.recorded_at, SensorData.id)
+
+
+def before_cursor(stmt, recorded_at, record_id):
+    """Keyset filter: rows strictly older than (recorded_at, id)."""
+    return stmt.where(tuple_(SensorData.recorded_at, SensorData.id) < tuple_(recorded_at, record_id))
+
+
+def fetch_rows(db, stmt):
+    """Execute a READ_COLUMNS statement into SensorRow records."""
+    return [SensorRow(*row) for row in db.execute(stmt)]
+
+
+def count_rows(db, stmt):
+    """Exact COUNT(*) of a statement's rows."""
+    return db.execute(select(func.count()).select_from(stmt.order_by(None).subquery())).scalar()
@@ -0,0 +1,80 @@
+"""
+Rollup models: per-user sensor aggregates at 1-minute, 1-hour and 1-day
+granularity, maintained incrementally by the ingest writer.
+"""
+
+from sqlalchemy import Column, Integer, DateTime, Numeric, DECIMAL, BigInteger
+from sqlalchemy.dialects.postgresql import UUID
+from models.database import Base
+
+
+class SensorRollupMixin:
+    """
+    count/sum/min/max of every metric for one user and one time bucket.
+    Averages are sum / count, so rollups of any granularity can be summed.
+    """
+
+    # Readings without an owner are rolled up under the nil UUID
+    user_id = Column(UUID(as_uuid=True), primary_key=True)
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+
+    count = Column(BigInteger, nullable=False)
+    temperature_sum = Column(Numeric(16, 2), nullable=False)
+    temperature_min = Column(DECIMAL(5, 2), nullable=False)
+    temperature_max = Column(DECIMAL(5, 2), nullable=False)
+    humidity_sum = Column(Numeric(16, 2), nullable=False)
+    humidity_min = Column(DECIMAL(5, 2), nullable=False)
+    humidity_max = Column(DECIMAL(5, 2), nullable=False)
+    co_level_sum = Column(BigInteger, nullable=False)
+    co_level_min = Column(Integer, nullable=False)
+    co_level_max = Column(Integer, nullable=False)
+
+    def to_dict(self):
+        """Convert model instance to dictionary (with averages)."""
+        return {
+            'user_id': str(self.user_id),
+            'bucket_start': self.bucket_start.isoformat(),
+            'count': self.count,
+            'temperature': {'min': float(self.temperature_min), 'avg': float(self.temperature_sum) / self.count,
+                            'max': float(self.temperature_max)},
+            'humidity': {'min': float(self.humidity_min), 'avg': float(self.humidity_sum) / self.count,
+                         'max': float(self.humidity_max)},
+            'co_level': {'min': self.co_level_min, 'avg': self.co_level_sum / self.count,
+                         'max': self.co_level_max},
+        }
+
+    def __repr__(self):
+        return f"<{type(self).__name__}(user={self.user_id}, bucket={self.bucket_start}, count={self.count})>"
+
+
+class SensorRollup1m(SensorRollupMixin, Base):
+    """1-minute buckets (UTC)."""
+
+    __tablename__ = 'sensor_rollup_1m'
+
+
+class SensorRollup1h(SensorRollupMixin, Base):
+    """1-hour buckets (UTC)."""
+
+    __tablename__ = 'sensor_rollup_1h'
+
+
+class SensorRollup1d(SensorRollupMixin, Base):
+    """1-day buckets (calendar days in Asia/Ho_Chi_Minh, like the chatbot's daily averages)."""
+
+    __tablename__ = 'sensor_rollup_1d'
+
+
+class SensorRollupState(Base):
+    """
+    Single row (id 1) recording how far back the rollups are complete. Only
+    a backfill (`rollups rebuild`) sets it: before one has run, rollups hold
+    just what the ingest writer added since the tables were created.
+    """
+
+    __tablename__ = 'sensor_rollup_state'
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    # None: every reading is rolled up
+    complete_since = Column(DateTime(timezone=True), nullable=True)
+    rebuilt_at = Column(DateTime(timezone=True), nullable=False)
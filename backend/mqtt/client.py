@@ -4,13 +4,17 @@ Subscribes to sensor data uploads and publishes control commands.
 """
 
 import json
-import threading
 import random
-from datetime import datetime
+import time
+from datetime import datetime, timezone
 import paho.mqtt.client as mqtt
 from config import Config
-from models import get_db, SensorData, DeviceState
-from services.ai_prediction_service import AIPredictionService
+from mqtt.ingest_queue import SensorWriteQueue
+from mqtt.ingest_state import DeviceStateTable
+from mqtt.ownership_cache import get_ownership_cache
+from services.prediction_dispatcher import PredictionDispatcher
+from services.stream_hub import get_stream_hub
+from services.stream_transport import get_stream_transport
 
 
 class MQTTHandler:
@@ -23,12 +27,37 @@ class MQTTHandler:
         self.client.on_message = self.on_message
         self.client.on_disconnect = self.on_disconnect
         
-        # State for Throttling & Streaming
-        self.last_save_time = datetime.min # Force immediate first save
-        self.latest_reading = None # Store latest parsed data for valid streams
-        self.new_data_event = threading.Event() # Event to signal SSE threads
+        # Streaming: readings are published to per-device topics on the hub,
+        # through the transport that fans them out to every web process
+        self.stream_hub = get_stream_hub()
+        self.stream_transport = get_stream_transport()
         self.app = None # Flask app instance for app context
-        self.actuators = {'fan': False, 'purifier': False} # Track actuator state
+        
+        # AI inference runs in micro-batches on worker threads, results are streamed when ready
+        self.prediction_dispatcher = PredictionDispatcher(
+            max_batch=Config.AI_BATCH_MAX_SIZE,
+            max_wait=Config.AI_BATCH_MAX_WAIT,
+            workers=Config.AI_WORKERS,
+            max_pending=Config.AI_QUEUE_MAX_SIZE
+        )
+        
+        # Per-device throttling/actuator state (bounded LRU keyed by device_id)
+        self.device_states = DeviceStateTable(
+            max_devices=Config.INGEST_MAX_DEVICES,
+            idle_timeout=Config.INGEST_DEVICE_IDLE_TIMEOUT
+        )
+        
+        # Write-behind queue: DB inserts happen in bulk on a writer thread, not here
+        self.ownership_cache = get_ownership_cache()
+        self.write_queue = SensorWriteQueue(
+            app_provider=lambda: self.app,
+            ownership_cache=self.ownership_cache,
+            batch_size=Config.INGEST_BATCH_SIZE,
+            flush_interval=Config.INGEST_FLUSH_INTERVAL,
+            max_size=Config.INGEST_QUEUE_MAX_SIZE,
+            max_batch_attempts=Config.INGEST_MAX_BATCH_ATTEMPTS,
+            dead_letter_size=Config.INGEST_DEAD_LETTER_SIZE
+        )
         
         # Set username and password if provided
         if Config.MQTT_USERNAME and Config.MQTT_PASSWORD:
@@ -75,9 +104,13 @@ class MQTTHandler:
         
         Strategy:
         1. STREAM: Always broadcast to SSE listeners (for real-time dashboard).
-        2. STORE: Save to DB only if:
+           The AI prediction is computed in the background and streamed
+           as a separate 'prediction' message once it is ready.
+        2. STORE: Queue for a bulk DB write only if:
            - CO level is hazardous (> 50 ppm) [High Frequency Logging]
            - OR it has been > 60 seconds since last save [Normal Logging]
+           Intervals are tracked per device_id.
+           The write-behind queue flushes to the DB on its own thread.
         """
 
         try:
@@ -98,110 +131,84 @@ class MQTTHandler:
             is_hazardous = co_level > CO_THRESHOLD
             
             current_time = datetime.now() # Timestamp for this reading
+            now = time.monotonic() # Clock for throttling intervals
             
-            # Prepare data for AI prediction
-            current_action = 'normal'
-            if self.actuators['fan']:
-                current_action = 'high_temp_turn_on_AC'
-            elif self.actuators['purifier']:
-                current_action = 'high_CO_turn_on_Air_Purifier'
+            device_id = data.get('device_id')
+            device = self.device_states.touch(device_id, now)
             
+            # Prepare data for AI prediction
             ai_input = {
                 'temperature_C': temperature,
                 'humidity_%': humidity,
                 'CO_ppm': co_level,
-                'action': current_action
+                'action': device.current_action()
             }
             
-            # Get AI Prediction
-            ai_result = AIPredictionService.prediction(ai_input)
-            
-            # Notify listeners (SSE) - Store latest data for streaming
-            self.latest_reading = {
+            # Notify listeners (SSE) - only subscribers of this device are woken
+            timestamp = current_time.isoformat()
+            reading = {
                 'temperature': temperature,
                 'humidity': humidity,
                 'co_level': co_level,
                 'is_hazardous': is_hazardous,
-                'timestamp': current_time.isoformat(),
-                'ai_prediction': ai_result, # Include AI result in stream
-                'device_id': data.get('device_id')  # Pass device_id to frontend
+                'timestamp': timestamp,
+                'ai_prediction': None, # Streamed separately once inference finishes
+                'device_id': device_id  # Pass device_id to frontend
             }
-            self.new_data_event.set() # Wake up waiting threads
-            # Note: Don't clear immediately - let waiting threads consume it first
+            device.last_reading = reading
+            device.is_hazardous = is_hazardous
+            self.stream_transport.publish(device_id, reading)
+            
+            # Queue AI Prediction (batched with other devices on a worker thread)
+            self.prediction_dispatcher.submit(
+                ai_input,
+                lambda result: self.handle_prediction_result(device_id, timestamp, result)
+            )
             
             # --- 2. THROTTLING LOGIC ---
             should_save = False
-            time_diff = (current_time - self.last_save_time).total_seconds()
+            time_diff = device.seconds_since_save(now)
             
             # CASE A: Anomaly - Save every 1 second
             if is_hazardous:
                 if time_diff >= 1.0: 
                     should_save = True
-                    print(f"⚠️  HAZARD DETECTED (CO={co_level}) - Saving (Interval: {time_diff:.1f}s)")
+                    print(f"⚠️  HAZARD DETECTED on {device_id} (CO={co_level}) - Saving (Interval: {time_diff:.1f}s)")
             
             # CASE B: Normal - Save every 60 seconds
             else:
                 if time_diff >= 60.0:
                     should_save = True
-                    print(f"✓ Normal Status - Heartbeat Save (Interval: {time_diff:.1f}s)")
+                    print(f"✓ Normal Status on {device_id} - Heartbeat Save (Interval: {time_diff:.1f}s)")
                 
-            # --- 3. DATABASE SAVE ---
-            # --- 3. DATABASE SAVE ---
+            # --- 3. DATABASE SAVE (write-behind) ---
             if should_save:
-                if self.app:
-                    with self.app.app_context():
-                        try:
-                            db = get_db()
-                            
-                            # Extract device_id from payload (ESP32 MAC address)
-                            device_id = data.get('device_id')
-                            user_id = None
-                            
-                            if device_id:
-                                # Look up user_id from DeviceState table
-                                device_state = db.query(DeviceState).filter(
-                                    DeviceState.device_id == device_id,
-                                    DeviceState.is_active == True
-                                ).first()
-                                
-                                if device_state:
-                                    user_id = device_state.user_id
-                                    print(f"✓ Device {device_id} linked to user {user_id}")
-                                else:
-                                    print(f"⚠️  Device {device_id} not registered, saving without user_id")
-                            else:
-                                print("⚠️  No device_id in payload, saving without user_id")
-                            
-                            sensor_reading = SensorData(
-                                temperature=temperature,
-                                humidity=humidity,
-                                co_level=co_level,
-                                user_id=user_id
-                            )
-                            db.add(sensor_reading)
-                            db.commit()
-                            
-                            self.last_save_time = current_time
-                            print(f"✓ Saved to DB: Temp={temperature}, Hum={humidity}, CO={co_level}, user_id={user_id}")
-                            
-                        except Exception as e:
-                            print(f"✗ Error saving to database: {e}")
-                            if 'db' in locals() and db:
-                                db.rollback()
-                        finally:
-                            if 'db' in locals() and db:
-                                db.close()
-                else:
-                    print("⚠️  No Flask app context available, skipping database save")
-            else:
-                # print(f"» Streamed only (Skipped DB)") # Optional: Comment out to reduce noise
-                pass
+                self.write_queue.enqueue({
+                    'device_id': device_id,
+                    'temperature': temperature,
+                    'humidity': humidity,
+                    'co_level': co_level,
+                    'recorded_at': current_time.astimezone(timezone.utc)
+                })
+                device.last_save_time = now
                 
         except json.JSONDecodeError as e:
             print(f"✗ Invalid JSON in sensor data: {e}")
         except Exception as e:
             print(f"✗ Error handling sensor upload: {e}")
     
+    def handle_prediction_result(self, device_id, timestamp, ai_result):
+        """
+        Stream an AI prediction for a reading that was already broadcast.
+        Called from a PredictionDispatcher worker thread.
+        """
+        self.stream_transport.publish(device_id, {
+            'type': 'prediction',
+            'device_id': device_id,
+            'timestamp': timestamp, # Timestamp of the reading the prediction belongs to
+            'ai_prediction': ai_result
+        })
+    
     def publish_control_command(self, command: str, device_id: str = None):
         """
         Publish a control command to the ESP32.
@@ -211,15 +218,16 @@ class MQTTHandler:
             device_id: Device MAC address (e.g., "AA:BB:CC:DD:EE:FF")
         """
         try:
-            # Update local state tracking
+            # Update local state tracking for this device
+            device = self.device_states.touch(device_id)
             if "FAN_ON" in command:
-                self.actuators['fan'] = True
+                device.fan_on = True
             elif "FAN_OFF" in command:
-                self.actuators['fan'] = False
+                device.fan_on = False
             elif "PURIFIER_ON" in command:
-                self.actuators['purifier'] = True
+                device.purifier_on = True
             elif "PURIFIER_OFF" in command:
-                self.actuators['purifier'] = False
+                device.purifier_on = False
             
             # Publish to device-specific topic if device_id provided
             if device_id:
@@ -242,15 +250,35 @@ class MQTTHandler:
             print(f"✗ Failed to connect to MQTT broker: {e}")
     
     def start_loop(self):
-        """Start the MQTT client loop in a background thread."""
+        """Start the MQTT client loop and the DB writer in background threads."""
+        if self.app:
+            try:
+                self.ownership_cache.warm(self.app)
+            except Exception as e:
+                print(f"⚠️  Could not warm device ownership cache: {e}")
+        self.write_queue.start()
+        self.prediction_dispatcher.start()
         self.client.loop_start()
         print("✓ MQTT client loop started")
     
     def stop_loop(self):
-        """Stop the MQTT client loop."""
+        """Stop the MQTT client loop and flush pending readings."""
         self.client.loop_stop()
         self.client.disconnect()
+        self.prediction_dispatcher.stop()
+        self.write_queue.stop()
         print("MQTT client stopped")
+    
+    def get_ingest_stats(self):
+        """Write-behind queue metrics (depth, flush latency, dropped rows)."""
+        stats = self.write_queue.stats()
+        stats['tracked_devices'] = len(self.device_states)
+        stats['evicted_devices'] = self.device_states.evicted
+        stats['ownership_cache'] = self.ownership_cache.stats()
+        stats['ai_dispatcher'] = self.prediction_dispatcher.stats()
+        stats['stream'] = self.stream_hub.stats()
+        stats['stream_transport'] = self.stream_transport.stats()
+        return stats
 
 
 # Global MQTT handler instance
@@ -0,0 +1,260 @@
+"""
+Write-behind queue for sensor readings.
+Buffers readings coming from the MQTT callback and flushes them to the
+sensor_data table in bulk from a background writer thread. Each flush also
+updates the minute/hour/day rollups in the same transaction.
+"""
+
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import insert
+from sqlalchemy.exc import DisconnectionError, InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
+from config import Config
+from models import get_db, SensorData
+from services.rollups import apply_rollups
+from services.response_cache import get_data_versions
+
+# Database unavailable rather than a bad row: always retried, never dead-lettered
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, DisconnectionError, PoolTimeoutError)
+
+
+def late_owners(rows):
+    """Owners of rows recorded before the /history settle horizon."""
+    horizon = datetime.now(timezone.utc) - timedelta(seconds=Config.HISTORY_CACHE_SETTLE_SECONDS)
+    late = set()
+    for row in rows:
+        recorded_at = row['recorded_at']
+        if recorded_at.tzinfo is None:
+            recorded_at = recorded_at.replace(tzinfo=timezone.utc)
+        if recorded_at < horizon:
+            late.add(row['user_id'])
+    return late
+
+
+class SensorWriteQueue:
+    """
+    Buffers sensor readings and writes them to the database in batches.
+
+    A flush is triggered when `batch_size` readings are waiting (size trigger)
+    or every `flush_interval` seconds (time trigger), whichever comes first.
+    When the buffer is full the oldest readings are dropped and counted.
+    A batch that keeps failing is split and written row by row; rows that
+    still fail (other than with a connection error) are moved to a bounded
+    dead-letter list so they cannot block the rows behind them.
+    """
+
+    def __init__(self, app_provider, ownership_cache, batch_size=200, flush_interval=1.0, max_size=10000,
+                 max_batch_attempts=3, dead_letter_size=100):
+        """
+        Args:
+            app_provider: Callable returning the Flask app (or None if not attached yet)
+            ownership_cache: DeviceOwnershipCache used to tag rows with user_id
+            batch_size: Max rows written per INSERT statement
+            flush_interval: Max seconds a reading waits in the buffer
+            max_size: Max readings kept in memory before dropping the oldest
+            max_batch_attempts: Failed attempts before a batch is written row by row
+            dead_letter_size: Max rejected readings kept for inspection
+        """
+        self._app_provider = app_provider
+        self.ownership_cache = ownership_cache
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self.max_batch_attempts = max_batch_attempts
+        self.dead_letters = deque(maxlen=dead_letter_size)  # (reading, error message)
+        self._batch_attempts = 0
+        self._last_error = None
+
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+        # Counters (exposed through stats())
+        self.enqueued_rows = 0
+        self.flushed_rows = 0
+        self.dropped_rows = 0
+        self.rejected_rows = 0
+        self.flush_count = 0
+        self.failed_flushes = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+        self._total_flush_latency = 0.0
+
+    def enqueue(self, reading: dict):
+        """
+        Add a reading to the buffer. Never blocks on the database.
+
+        Args:
+            reading: {
+                'device_id': str | None,
+                'temperature': float,
+                'humidity': float,
+                'co_level': int,
+                'recorded_at': datetime (timezone-aware)
+            }
+        """
+        with self._lock:
+            if len(self._buffer) >= self.max_size:
+                self._buffer.popleft()
+                self.dropped_rows += 1
+            self._buffer.append(reading)
+            self.enqueued_rows += 1
+            size_reached = len(self._buffer) >= self.batch_size
+
+        if size_reached:
+            self._wakeup.set()
+
+    def depth(self):
+        """Number of readings waiting to be written."""
+        with self._lock:
+            return len(self._buffer)
+
+    def flush(self):
+        """
+        Write every buffered reading to the database.
+
+        Returns:
+            bool: False if a batch failed and was put back in the buffer
+        """
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    if not self._buffer:
+                        return True
+                    count = min(self.batch_size, len(self._buffer))
+                    batch = [self._buffer.popleft() for _ in range(count)]
+
+                if self._write_batch(batch):
+                    self._batch_attempts = 0
+                    continue
+                if self._last_error is not None:
+                    self._batch_attempts += 1
+                if self._batch_attempts < self.max_batch_attempts or isinstance(self._last_error, TRANSIENT_ERRORS):
+                    self._requeue(batch)
+                    return False
+                # Same batch failed repeatedly: isolate the bad rows
+                self._batch_attempts = 0
+                if not self._write_rows(batch):
+                    return False
+
+    def _write_rows(self, batch):
+        """
+        Write a batch one row at a time, dead-lettering rows that fail.
+        Stops (re-queueing the rest) if the database itself is unavailable.
+
+        Returns:
+            bool: False if the remaining rows were put back in the buffer
+        """
+        for index, reading in enumerate(batch):
+            if self._write_batch([reading]):
+                continue
+            if self._last_error is None or isinstance(self._last_error, TRANSIENT_ERRORS):
+                self._requeue(batch[index:])
+                return False
+            self.dead_letters.append((reading, str(self._last_error)))
+            self.rejected_rows += 1
+            print(f"✗ Rejected reading from {reading.get('device_id')}: {self._last_error}")
+        return True
+
+    def _requeue(self, batch):
+        """Put a failed batch back at the front of the buffer (oldest first)."""
+        with self._lock:
+            self._buffer.extendleft(reversed(batch))
+            while len(self._buffer) > self.max_size:
+                self._buffer.popleft()
+                self.dropped_rows += 1
+
+    def _write_batch(self, batch):
+        """
+        Insert one batch of readings. Returns True on success; on failure the
+        exception is kept in _last_error (None if no app is attached yet).
+        """
+        self._last_error = None
+        app = self._app_provider()
+        if app is None:
+            print(f"⚠️  No Flask app context available, deferring {len(batch)} readings")
+            return False
+
+        started = time.perf_counter()
+        with app.app_context():
+            db = get_db()
+            try:
+                owners = self.ownership_cache.resolve(db, {r['device_id'] for r in batch if r.get('device_id')})
+                rows = [{
+                    'user_id': owners.get(r.get('device_id')),
+                    'temperature': r['temperature'],
+                    'humidity': r['humidity'],
+                    'co_level': r['co_level'],
+                    'recorded_at': r['recorded_at'],
+                } for r in batch]
+
+                # List of parameter dicts -> SQLAlchemy emits multi-row INSERT ... VALUES
+                db.execute(insert(SensorData), rows)
+                apply_rollups(db, rows)
+                db.commit()
+                # Invalidate cached /history responses that touch now, and settled
+                # ones too for readings that land late (retried through an outage)
+                get_data_versions().bump({row['user_id'] for row in rows}, late_owners(rows))
+            except Exception as e:
+                print(f"✗ Error flushing {len(batch)} readings to database: {e}")
+                db.rollback()
+                self._last_error = e
+                self.failed_flushes += 1
+                return False
+            finally:
+                db.close()
+
+        latency = time.perf_counter() - started
+        self.flushed_rows += len(batch)
+        self.flush_count += 1
+        self.last_flush_latency = latency
+        self.max_flush_latency = max(self.max_flush_latency, latency)
+        self._total_flush_latency += latency
+        return True
+
+    def _run(self):
+        """Writer thread: flush on size trigger or every flush_interval seconds."""
+        while not self._stopping.is_set():
+            self._wakeup.wait(timeout=self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def start(self):
+        """Start the background writer thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='sensor-writer', daemon=True)
+        self._thread.start()
+        print("✓ Sensor write-behind queue started")
+
+    def stop(self):
+        """Stop the writer thread and flush whatever is still buffered."""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=self.flush_interval + 5)
+            self._thread = None
+        self.flush()
+
+    def stats(self):
+        """Queue depth, flush latency and drop counters."""
+        avg_latency = self._total_flush_latency / self.flush_count if self.flush_count else 0.0
+        return {
+            'queue_depth': self.depth(),
+            'enqueued_rows': self.enqueued_rows,
+            'flushed_rows': self.flushed_rows,
+            'dropped_rows': self.dropped_rows,
+            'rejected_rows': self.rejected_rows,
+            'dead_letters': len(self.dead_letters),
+            'flush_count': self.flush_count,
+            'failed_flushes': self.failed_flushes,
+            'last_flush_latency_ms': round(self.last_flush_latency * 1000, 2),
+            'avg_flush_latency_ms': round(avg_latency * 1000, 2),
+            'max_flush_latency_ms': round(self.max_flush_latency * 1000, 2),
+        }
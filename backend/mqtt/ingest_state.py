@@ -0,0 +1,93 @@
+"""
+Per-device ingest state for the MQTT handler.
+Keeps throttling and actuator state separate for every device so that one
+device in a hazard state does not affect the save cadence of the others.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class DeviceIngestState:
+    """Compact state for a single device."""
+
+    __slots__ = ('last_save_time', 'last_seen', 'last_reading', 'is_hazardous', 'fan_on', 'purifier_on')
+
+    def __init__(self):
+        self.last_save_time = None  # Monotonic time of last persisted reading (None = never)
+        self.last_seen = 0.0        # Monotonic time of last message or command
+        self.last_reading = None    # Latest reading dict streamed for this device
+        self.is_hazardous = False
+        self.fan_on = False
+        self.purifier_on = False
+
+    def current_action(self):
+        """Action label the AI models expect for the current actuator state."""
+        if self.fan_on:
+            return 'high_temp_turn_on_AC'
+        if self.purifier_on:
+            return 'high_CO_turn_on_Air_Purifier'
+        return 'normal'
+
+    def seconds_since_save(self, now):
+        """Seconds since the last save, or infinity if never saved."""
+        if self.last_save_time is None:
+            return float('inf')
+        return now - self.last_save_time
+
+
+class DeviceStateTable:
+    """
+    Bounded LRU table of DeviceIngestState keyed by device_id.
+
+    Every lookup is O(1). Devices that have been idle longer than
+    `idle_timeout` seconds, or the least recently used ones once
+    `max_devices` is exceeded, are evicted.
+    """
+
+    def __init__(self, max_devices=20000, idle_timeout=3600.0):
+        self.max_devices = max_devices
+        self.idle_timeout = idle_timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def touch(self, device_id, now=None):
+        """
+        Get (or create) the state for a device and mark it as recently used.
+
+        Args:
+            device_id: Device MAC address (None for payloads without device_id)
+            now: Monotonic timestamp, defaults to time.monotonic()
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._entries.get(device_id)
+            if entry is None:
+                entry = DeviceIngestState()
+                self._entries[device_id] = entry
+            else:
+                self._entries.move_to_end(device_id)
+            entry.last_seen = now
+            self._evict(now)
+            return entry
+
+    def get(self, device_id):
+        """Return the state for a device without creating it (None if unknown)."""
+        with self._lock:
+            return self._entries.get(device_id)
+
+    def _evict(self, now):
+        """Drop idle entries and enforce the size bound. Caller holds the lock."""
+        # Entries are ordered by last use, so only the front needs checking
+        while self._entries:
+            oldest_id, oldest = next(iter(self._entries.items()))
+            if len(self._entries) > self.max_devices or now - oldest.last_seen > self.idle_timeout:
+                del self._entries[oldest_id]
+                self.evicted += 1
+            else:
+                break
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,132 @@
+"""
+In-process cache of device ownership (device_id -> user_id).
+Lets the ingest path tag readings with their owner without a
+device_states round trip for every saved reading.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from config import Config
+from models import get_db, DeviceState
+
+
+class DeviceOwnershipCache:
+    """
+    Bounded LRU TTL cache of active device -> user mappings.
+
+    Entries are filled by warmup, /register-device and cache misses. Every
+    entry expires after `ttl` seconds so that changes made outside the app
+    (SQL console, another instance) are picked up.
+    Unregistered devices are cached as None for `negative_ttl` seconds.
+    Once `max_size` is exceeded the least recently used entries are evicted,
+    so publishers making up device ids cannot grow the cache without bound.
+    """
+
+    def __init__(self, ttl=300.0, negative_ttl=30.0, max_size=20000):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # device_id -> (user_id | None, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    @staticmethod
+    def _as_uuid(user_id):
+        if user_id is None or isinstance(user_id, uuid.UUID):
+            return user_id
+        return uuid.UUID(str(user_id))
+
+    def set(self, device_id, user_id):
+        """Record (or overwrite) the owner of a device."""
+        ttl = self.ttl if user_id is not None else self.negative_ttl
+        with self._lock:
+            self._entries[device_id] = (self._as_uuid(user_id), time.monotonic() + ttl)
+            self._entries.move_to_end(device_id)
+            self._evict()
+
+    def _evict(self):
+        """Enforce the size bound. Caller holds the lock."""
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evicted += 1
+
+    def invalidate(self, device_id=None):
+        """Forget one device, or everything if device_id is None."""
+        with self._lock:
+            if device_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(device_id, None)
+
+    def warm(self, app):
+        """Load every active device from device_states."""
+        with app.app_context():
+            db = get_db()
+            try:
+                rows = db.query(DeviceState.device_id, DeviceState.user_id).filter(
+                    DeviceState.is_active == True
+                ).all()
+            finally:
+                db.close()
+
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._entries = OrderedDict((row.device_id, (row.user_id, expires_at)) for row in rows)
+            self._evict()
+        print(f"✓ Device ownership cache warmed ({len(rows)} devices)")
+
+    def resolve(self, db, device_ids):
+        """
+        Return {device_id: user_id} for the given devices.
+
+        Cached entries are served from memory; missing or expired ones are
+        loaded with a single IN query on the given session.
+        """
+        now = time.monotonic()
+        owners = {}
+        missing = []
+        with self._lock:
+            for device_id in device_ids:
+                entry = self._entries.get(device_id)
+                if entry and entry[1] > now:
+                    owners[device_id] = entry[0]
+                    self._entries.move_to_end(device_id)
+                else:
+                    missing.append(device_id)
+            self.hits += len(owners)
+            self.misses += len(missing)
+
+        if missing:
+            rows = db.query(DeviceState.device_id, DeviceState.user_id).filter(
+                DeviceState.device_id.in_(missing),
+                DeviceState.is_active == True
+            ).all()
+            found = {row.device_id: row.user_id for row in rows}
+            for device_id in missing:
+                owners[device_id] = found.get(device_id)
+                self.set(device_id, owners[device_id])
+
+        return owners
+
+    def stats(self):
+        """Cache size and hit/miss counters."""
+        return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses, 'evicted': self.evicted}
+
+
+# Global ownership cache instance
+ownership_cache = None
+
+def get_ownership_cache():
+    """Get or create the global device ownership cache."""
+    global ownership_cache
+    if ownership_cache is None:
+        ownership_cache = DeviceOwnershipCache(
+            ttl=Config.OWNERSHIP_CACHE_TTL,
+            negative_ttl=Config.OWNERSHIP_CACHE_NEGATIVE_TTL,
+            max_size=Config.OWNERSHIP_CACHE_MAX_SIZE
+        )
+    return ownership_cache
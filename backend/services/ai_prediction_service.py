@@ -1,41 +1,116 @@
 import os
-import joblib
+import threading
+import time
 import numpy as np
-import pandas as pd
+from config import Config
+from services.numpy_inference import MODEL_DIR, BUNDLE_PATH, NumpyInferenceEngine, SklearnInferenceEngine
+from services.prediction_cache import PredictionCache
+
+# Numeric model inputs, in the column order the scaler was fitted with (action is appended last)
+FEATURE_FIELDS = ('temperature_C', 'humidity_%', 'CO_ppm')
 
 class AIPredictionService:
-    # Class-level variables to hold models and scalers
-    _reg_model = None
-    _cls_model = None
-    _scaler_X = None
-    _scaler_y = None
-    _label_encoder = None
+    # Class-level inference engine (NumPy bundle or the original sklearn pickles)
+    _engine = None
+    _engine_name = None
+    _load_lock = threading.Lock() # MQTT/dispatcher and request threads may race into _load_models
+    _load_error = None
+    _load_seconds = None
+    
+    # Opt-in memoization of results on quantized inputs (AI_CACHE_ENABLED)
+    _cache = PredictionCache(
+        resolution=(Config.AI_CACHE_RES_TEMPERATURE, Config.AI_CACHE_RES_HUMIDITY, Config.AI_CACHE_RES_CO),
+        max_entries=Config.AI_CACHE_MAX_ENTRIES
+    ) if Config.AI_CACHE_ENABLED else None
     
     # Path to models (Relative to this file)
-    model_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ai', 'ai_models')
+    model_dir = MODEL_DIR
+    bundle_path = BUNDLE_PATH
     
     @classmethod
     def _load_models(cls):
         """
-        Loads models and artifacts if not already loaded.
+        Loads models and artifacts if not already loaded. Thread-safe.
         
+        Uses the NumPy weight bundle when AI_ENGINE=numpy and the bundle exists
+        (no sklearn import), otherwise the original joblib pickles. Weights are
+        memory-mapped read-only (AI_MMAP_WEIGHTS) so forked workers share pages.
         """
         
-        if cls._reg_model is None:
+        if cls._engine is not None:
+            return
+        
+        with cls._load_lock:
+            if cls._engine is not None:
+                return # Another thread finished loading while we waited
+            
+            started = time.perf_counter()
             try:
-                print(f"Loading AI models from {cls.model_dir}...")
-                cls._reg_model = joblib.load(os.path.join(cls.model_dir, 'ecs_deep_regressor.pkl'))
-                cls._cls_model = joblib.load(os.path.join(cls.model_dir, 'ecs_deep_classifier.pkl'))
-                
-                cls._scaler_X = joblib.load(os.path.join(cls.model_dir, 'scaler_X.pkl'))
-                cls._scaler_y = joblib.load(os.path.join(cls.model_dir, 'scaler_y_reg.pkl'))
-                cls._label_encoder = joblib.load(os.path.join(cls.model_dir, 'label_encoder.pkl'))
-                print("AI models loaded successfully.")
+                if Config.AI_ENGINE == 'numpy' and os.path.exists(cls.bundle_path):
+                    print(f"Loading NumPy inference bundle from {cls.bundle_path}...")
+                    engine = NumpyInferenceEngine.load(cls.bundle_path, mmap=Config.AI_MMAP_WEIGHTS)
+                    engine_name = 'numpy'
+                else:
+                    if Config.AI_ENGINE == 'numpy':
+                        print("⚠️  NumPy inference bundle not found, falling back to sklearn models. "
+                              "Run `python -m services.numpy_inference` to export it.")
+                    print(f"Loading AI models from {cls.model_dir}...")
+                    engine = SklearnInferenceEngine(cls.model_dir, mmap=Config.AI_MMAP_WEIGHTS)
+                    engine_name = 'sklearn'
             except FileNotFoundError as e:
                 print(f"Error loading AI models: {e}")
+                cls._load_error = str(e)
                 # Important: Verify setup_ai.py was run if this fails
                 raise RuntimeError("AI models not found. Please run backend\\ai\\training_models\\env_prediction.ipynb to restore artifacts.") from e
             
+            cls._engine_name = engine_name
+            cls._load_seconds = time.perf_counter() - started
+            cls._load_error = None
+            if cls._cache is not None:
+                cls._cache.clear() # Cached results belong to the previous models
+            cls._engine = engine # Publish last, so other threads never see a half-built engine
+            print("AI models loaded successfully.")
+    
+    @classmethod
+    def reload_models(cls):
+        """Drop the loaded models (and cached predictions) and load them again."""
+        with cls._load_lock:
+            cls._engine = None
+        cls._load_models()
+    
+    @classmethod
+    def warmup(cls):
+        """
+        Load models eagerly (at app start) and run one dummy prediction, so the
+        first real reading does not pay the load latency. Never raises.
+        
+        Returns:
+            bool: True if models are loaded
+        """
+        try:
+            cls._load_models()
+            cls.predict_batch([{
+                'temperature_C': 25.0,
+                'humidity_%': 60.0,
+                'CO_ppm': 0.0,
+                'action': str(cls._engine.classes_[0])
+            }])
+            return True
+        except Exception as e:
+            cls._load_error = str(e)
+            print(f"⚠️  AI model warmup failed: {e}")
+            return False
+    
+    @classmethod
+    def status(cls):
+        """Health signal: whether models are loaded, which engine, and load time."""
+        return {
+            'models_loaded': cls._engine is not None,
+            'engine': cls._engine_name,
+            'load_ms': round(cls._load_seconds * 1000, 2) if cls._load_seconds is not None else None,
+            'error': cls._load_error,
+            'cache': cls._cache.stats() if cls._cache is not None else None
+        }
             
     @classmethod
     def prediction(cls, data):
@@ -52,54 +127,132 @@ class AIPredictionService:
             
         """
         
+        try:
+            return cls.predict_batch([data])[0]
+        except Exception as e:
+            print(f"Error during prediction: {e}")
+            return {
+                "status": "error",
+                "message": str(e)
+            }
+    
+    @staticmethod
+    def _copy_result(result):
+        """Copy a result so cached entries are never shared with callers."""
+        return {**result, "future_environment": dict(result["future_environment"])}
+    
+    @staticmethod
+    def _to_columns(samples):
+        """
+        Normalize batch input to (features without action, actions).
+        
+        Accepts:
+            - list of dicts in prediction() format
+            - dict of columns: {'temperature_C': [...], 'humidity_%': [...], 'CO_ppm': [...], 'action': [...]}
+            - 2D array-like of rows [temperature_C, humidity_%, CO_ppm, action]
+        """
+        if isinstance(samples, dict):
+            columns = [samples[field] for field in FEATURE_FIELDS]
+            actions = samples['action']
+        elif isinstance(samples, (list, tuple)) and (not samples or isinstance(samples[0], dict)):
+            columns = [[sample[field] for sample in samples] for field in FEATURE_FIELDS]
+            actions = [sample['action'] for sample in samples]
+        else:
+            rows = np.asarray(samples, dtype=object)
+            if rows.ndim != 2 or rows.shape[1] != 4:
+                raise ValueError("Array input must have shape (N, 4): temperature_C, humidity_%, CO_ppm, action")
+            columns = [rows[:, i] for i in range(3)]
+            actions = rows[:, 3]
+        
+        columns = [np.asarray(column, dtype=float) for column in columns]
+        actions = np.asarray(actions, dtype=object)
+        if actions.ndim != 1 or any(column.ndim != 1 for column in columns):
+            raise ValueError("Every input column must be a 1-D list of values")
+        if any(len(column) != len(actions) for column in columns):
+            raise ValueError("All input columns must have the same length")
+        return np.column_stack(columns), actions
+    
+    @classmethod
+    def predict_batch(cls, samples):
+        """
+        Vectorized prediction for many samples at once.
+        Encodes actions with one LabelEncoder call and runs the scaler, regressor,
+        classifier and inverse scaler once per batch.
+        
+        Args:
+            samples: list of dicts, dict of columns, or (N, 4) array (see _to_columns)
+            
+        Returns:
+            list[dict]: One result per sample, in input order (same format as prediction())
+            
+        Raises:
+            ValueError: If the input is malformed (missing fields, ragged columns, bad shape)
+        """
+        
         cls._load_models() # Load models if not already loaded
         
-        try: 
-            try:
-                action_encoded = cls._label_encoder.transform([data['action']])[0]
-            except ValueError:
-                raise ValueError(f"Action '{data['action']}' not recognized. Valid actions: {cls._label_encoder.classes_}")
-                
-                # Try defaulting to 'normal' action if unrecognised
-                try:
-                    action_encoded = cls._label_encoder.transform(['normal'])[0]
-                except:
-                     action_encoded = 0 # Absolute fallback
-                     
-            input_features = np.array([[
-                data['temperature_C'],
-                data['humidity_%'],
-                data['CO_ppm'],
-                action_encoded
-            ]])
+        try:
+            features, actions = cls._to_columns(samples)
+        except KeyError as e:
+            raise ValueError(f"Missing required field: {e.args[0]}") from e
+        except TypeError as e:
+            raise ValueError(f"Invalid input values: {e}") from e
+        
+        results = [None] * len(actions)
+        if not results:
+            return results
+        
+        try:
+            # Samples with an unknown action get an error result, the rest are predicted together
+            engine = cls._engine
+            known = np.isin(actions, engine.classes_)
+            for i in np.flatnonzero(~known):
+                results[i] = {
+                    "status": "error",
+                    "message": f"Action '{actions[i]}' not recognized. Valid actions: {engine.classes_}"
+                }
             
-            # Scale input features (translate into model language) using restored scaler
-            input_scaled = cls._scaler_X.transform(input_features)
+            rows = np.flatnonzero(known)
             
-            # Predict using regression model for future environment
-            future_env_scaled = cls._reg_model.predict(input_scaled)
-            # Inverse scale to get actual values
-            future_env = cls._scaler_y.inverse_transform(future_env_scaled) 
+            # Serve repeated (quantized) inputs from the cache, predict only the misses
+            cache = cls._cache
+            if cache is not None and len(rows):
+                keys = cache.make_keys(features[rows], actions[rows])
+                cached = cache.get_many(keys)
+                for i, result in zip(rows.tolist(), cached):
+                    if result is not None:
+                        results[i] = cls._copy_result(result)
+                miss = np.array([result is None for result in cached], dtype=bool)
+                miss_keys = [key for key, is_miss in zip(keys, miss) if is_miss]
+                rows = rows[miss]
             
-            # Predict using classification model for recommended action
-            recommended_action_encoded = cls._cls_model.predict(input_scaled)[0]
-            # Decode the recommended action
-            recommended_action = cls._label_encoder.inverse_transform([recommended_action_encoded])[0]
+            if len(rows) == 0:
+                return results
             
-            # Return results as dictionary
-            return {
-                "status": "success",
-                "future_environment": {
-                    "temperature_C": round(future_env[0][0], 2),
-                    "humidity_%": max(0, round(future_env[0][1], 2)),
-                    "CO_ppm": max(0, round(future_env[0][2], 2))
-                },
-                "recommended_action": recommended_action
-            }
+            input_features = np.empty((len(rows), 4), dtype=float)
+            input_features[:, :3] = features[rows]
+            input_features[:, 3] = engine.encode_actions(actions[rows])
+            
+            # Scale -> regressor/classifier -> inverse scale and decode, in one pass
+            future_env, recommended_actions = engine.predict(input_features)
+            
+            future_env = np.round(future_env, 2)
+            future_env[:, 1:] = np.maximum(future_env[:, 1:], 0)
+            for out_row, i in enumerate(rows.tolist()):
+                temperature, humidity, co = future_env[out_row].tolist()
+                results[i] = {
+                    "status": "success",
+                    "future_environment": {
+                        "temperature_C": temperature,
+                        "humidity_%": humidity,
+                        "CO_ppm": co
+                    },
+                    "recommended_action": str(recommended_actions[out_row])
+                }
+            
+            if cache is not None:
+                cache.put_many(miss_keys, [cls._copy_result(results[i]) for i in rows.tolist()])
+            return results
         except Exception as e:
-            print(f"Error during prediction: {e}")
-            return {
-                "status": "error",
-                "message": str(e)
-            }
-            
\ No newline at end of file
+            print(f"Error during batch prediction: {e}")
+            return [result or {"status": "error", "message": str(e)} for result in results]
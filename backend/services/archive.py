@@ -0,0 +1,440 @@
+"""
+Cold-tier archive of old sensor_data readings as compressed Parquet.
+
+Readings older than ARCHIVE_AFTER_DAYS (whole UTC months only) are moved out
+of Postgres into one file per user and month:
+
+    <ARCHIVE_DIR>/<user_id>/<YYYY-MM>.parquet
+
+Each file is sorted by (recorded_at, id) and split into row groups of
+ARCHIVE_ROW_GROUP_SIZE readings. Reads skip files by their month and row
+groups by the min/max statistics of recorded_at, and load only the columns
+asked for. The history, series and export endpoints merge archived rows with
+live rows, so a range crossing the archive boundary reads like one table.
+
+Requires the optional pyarrow package. Run the job from cron / a scheduler:
+    flask --app app archive run
+"""
+
+import heapq
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from sqlalchemy import delete, select
+from config import Config
+from models.sensor_data import SensorData
+from models.sensor_reader import SERIES_COLUMNS, SensorRow, select_readings
+from services.downsampling import METRICS, parse_timestamp
+from services.partitions import interval_start, next_interval
+
+COLUMNS = ('id', 'recorded_at', 'temperature', 'humidity', 'co_level')
+UNOWNED_DIR = 'unowned'
+
+
+def _schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ('id', pa.int64()),
+        ('recorded_at', pa.timestamp('us', tz='UTC')),
+        ('temperature', pa.float64()),
+        ('humidity', pa.float64()),
+        ('co_level', pa.int32()),
+    ])
+
+
+def _as_utc(value):
+    """Aware UTC datetime from an ISO string or a (possibly naive UTC) datetime."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        return parse_timestamp(value)
+    return value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def reading_key(row):
+    """Sort key of an (id, recorded_at, ...) tuple."""
+    return _as_utc(row[1]), row[0]
+
+
+def record_key(record):
+    """Sort key of a SensorRow."""
+    return _as_utc(record.recorded_at), record.id
+
+
+def merge_readings(live, archived, newest_first=True, key=reading_key):
+    """
+    Merge two reading streams ordered by (recorded_at, id) into one, dropping
+    rows present in both (a month that was archived but not yet deleted).
+    Lazy: consumes only as much of either stream as is read.
+    """
+    last = None
+    for row in heapq.merge(live, archived, key=key, reverse=newest_first):
+        current = key(row)
+        if current != last:
+            yield row
+        last = current
+
+
+class ReadingArchive:
+    """Per-user, per-month Parquet files under one directory."""
+
+    def __init__(self, root, compression='zstd', row_group_size=65536):
+        """
+        Args:
+            root: Archive directory (created on first write)
+            compression: Parquet codec (zstd, snappy, gzip, ...)
+            row_group_size: Readings per row group
+        """
+        self.root = root
+        self.compression = compression
+        self.row_group_size = row_group_size
+
+    def _user_dir(self, user_id):
+        return os.path.join(self.root, str(user_id) if user_id is not None else UNOWNED_DIR)
+
+    def path_for(self, user_id, month):
+        return os.path.join(self._user_dir(user_id), f"{month:%Y-%m}.parquet")
+
+    def months(self, user_id):
+        """Start of every archived month of a user, oldest first."""
+        try:
+            names = os.listdir(self._user_dir(user_id))
+        except FileNotFoundError:
+            return []
+        months = []
+        for name in names:
+            if name.endswith('.parquet'):
+                try:
+                    months.append(datetime.strptime(name[:-8], '%Y-%m').replace(tzinfo=timezone.utc))
+                except ValueError:
+                    continue
+        return sorted(months)
+
+    def _files(self, user_id, start, end, newest_first):
+        """(path, month start, month end) of the files that can hold rows in [start, end]."""
+        files = []
+        for month in self.months(user_id):
+            upper = next_interval(month, 'month')
+            if (start is None or upper > start) and (end is None or month <= end):
+                files.append((self.path_for(user_id, month), month, upper))
+        return files[::-1] if newest_first else files
+
+    def users(self):
+        """Owners with archived readings (None for unowned readings)."""
+        try:
+            names = sorted(os.listdir(self.root))
+        except FileNotFoundError:
+            return []
+        owners = []
+        for name in names:
+            if name == UNOWNED_DIR:
+                owners.append(None)
+                continue
+            try:
+                owners.append(uuid.UUID(name))
+            except ValueError:
+                continue
+        return owners
+
+    def older_than(self, user_id, moment):
+        """True if every archived reading of the user is older than `moment`."""
+        months = self.months(user_id)
+        return not months or next_interval(months[-1], 'month') <= _as_utc(moment)
+
+    def overlaps(self, user_id, start=None, end=None):
+        """True if any archived month of the user intersects [start, end]."""
+        return bool(self._files(user_id, _as_utc(start), _as_utc(end), False))
+
+    def _row_groups(self, parquet_file, start, end, before):
+        """Indices of row groups whose recorded_at statistics intersect the range."""
+        metadata = parquet_file.metadata
+        column = parquet_file.schema_arrow.get_field_index('recorded_at')
+        selected = []
+        for index in range(metadata.num_row_groups):
+            stats = metadata.row_group(index).column(column).statistics
+            if stats is not None and stats.has_min_max:
+                low, high = _as_utc(stats.min), _as_utc(stats.max)
+                if (start is not None and high < start) or (end is not None and low > end):
+                    continue
+                if before is not None and low > before[0]:
+                    continue
+            selected.append(index)
+        return selected
+
+    def _read_group(self, parquet_file, index, columns, start, end, before):
+        """One row group as a pyarrow Table of `columns`, filtered to the range."""
+        import pyarrow.compute as pc
+
+        needed = list(columns)
+        for extra in ('recorded_at', 'id') if before is not None else ('recorded_at',):
+            if extra not in needed:
+                needed.append(extra)
+        table = parquet_file.read_row_group(index, columns=needed)
+
+        times = table.column('recorded_at')
+        mask = None
+        conditions = []
+        if start is not None:
+            conditions.append(pc.greater_equal(times, start))
+        if end is not None:
+            conditions.append(pc.less_equal(times, end))
+        if before is not None:
+            cursor_time, cursor_id = before
+            conditions.append(pc.or_(
+                pc.less(times, cursor_time),
+                pc.and_(pc.equal(times, cursor_time), pc.less(table.column('id'), cursor_id))
+            ))
+        for condition in conditions:
+            mask = condition if mask is None else pc.and_(mask, condition)
+        if mask is not None:
+            table = table.filter(mask)
+        return table.select(list(columns))
+
+    def read(self, user_id, start=None, end=None, newest_first=True, before=None, columns=COLUMNS):
+        """
+        Yield archived readings as tuples of `columns`, ordered by
+        (recorded_at, id). Row groups are loaded one at a time as the
+        generator is consumed, so a caller that stops early (limit) reads
+        only the newest (or oldest) groups it needs.
+
+        Args:
+            user_id: Owner of the readings
+            start, end: Optional inclusive bounds on recorded_at
+            newest_first: Descending order (default) or oldest first
+            before: Optional keyset cursor (recorded_at, id), newest_first only
+            columns: Subset of COLUMNS to return
+        """
+        import pyarrow.parquet as pq
+
+        start, end = _as_utc(start), _as_utc(end)
+        if before is not None:
+            before = (_as_utc(before[0]), before[1])
+        for path, _, _ in self._files(user_id, start, end, newest_first):
+            parquet_file = pq.ParquetFile(path)
+            groups = self._row_groups(parquet_file, start, end, before)
+            for index in reversed(groups) if newest_first else groups:
+                table = self._read_group(parquet_file, index, columns, start, end, before)
+                values = [table.column(name).to_pylist() for name in columns]
+                rows = zip(*values)
+                yield from (reversed(list(rows)) if newest_first else rows)
+
+    def read_rows(self, user_id, start=None, end=None, before=None):
+        """Archived readings as SensorRow records, newest first (like fetch_rows)."""
+        for row in self.read(user_id, start, end, newest_first=True, before=before):
+            yield SensorRow(row[0], user_id, *row[1:])
+
+    def count(self, user_id, start=None, end=None, before=None):
+        """
+        Number of archived readings in the range. Files and row groups that
+        lie entirely inside it are counted from metadata without reading data.
+        """
+        import pyarrow.parquet as pq
+
+        start, end = _as_utc(start), _as_utc(end)
+        if before is not None:
+            before = (_as_utc(before[0]), before[1])
+        total = 0
+        for path, month, upper in self._files(user_id, start, end, False):
+            parquet_file = pq.ParquetFile(path)
+            if before is None and (start is None or month >= start) and (end is None or upper <= end):
+                total += parquet_file.metadata.num_rows
+                continue
+            column = parquet_file.schema_arrow.get_field_index('recorded_at')
+            for index in self._row_groups(parquet_file, start, end, before):
+                group = parquet_file.metadata.row_group(index)
+                stats = group.column(column).statistics
+                inside = (
+                    before is None and stats is not None and stats.has_min_max
+                    and (start is None or _as_utc(stats.min) >= start)
+                    and (end is None or _as_utc(stats.max) <= end)
+                )
+                if inside:
+                    total += group.num_rows
+                else:
+                    total += self._read_group(parquet_file, index, ('recorded_at',), start, end, before).num_rows
+        return total
+
+    def bucket_stats(self, user_id, start, end, width, points, origin=None, end_exclusive=False):
+        """
+        Per-bucket count and min/sum/max of every metric over archived
+        readings, bucketed like services.downsampling.bucket_aggregates.
+
+        Args:
+            origin: Start of bucket 0 (default: start)
+            end_exclusive: Leave out readings exactly at `end`
+
+        Returns:
+            dict: bucket index -> [count, min, sum, max (per metric, in METRICS order)]
+        """
+        import pyarrow.parquet as pq
+
+        start, end = _as_utc(start), _as_utc(end)
+        times, values = [], {name: [] for name in METRICS}
+        for path, _, _ in self._files(user_id, start, end, False):
+            parquet_file = pq.ParquetFile(path)
+            for index in self._row_groups(parquet_file, start, end, None):
+                table = self._read_group(parquet_file, index, ('recorded_at',) + METRICS, start, end, None)
+                times.append(table.column('recorded_at').cast('int64').to_numpy() / 1e6)
+                for name in METRICS:
+                    values[name].append(table.column(name).to_numpy().astype(np.float64))
+        if not times or not sum(len(t) for t in times):
+            return {}
+
+        seconds = np.concatenate(times)
+        keep = seconds < end.timestamp() if end_exclusive else np.ones(len(seconds), dtype=bool)
+        if not keep.any():
+            return {}
+        # Files and row groups are read in time order, so buckets are non-decreasing
+        offsets = (seconds[keep] - (origin or start).timestamp()) / width
+        buckets = np.minimum(np.floor(offsets).astype(np.int64), points - 1)
+        keys, first = np.unique(buckets, return_index=True)
+        counts = np.diff(np.append(first, len(buckets)))
+        stats = {int(key): [int(count)] for key, count in zip(keys, counts)}
+        for name in METRICS:
+            column = np.concatenate(values[name])[keep]
+            for key, low, total, high in zip(
+                keys, np.minimum.reduceat(column, first), np.add.reduceat(column, first),
+                np.maximum.reduceat(column, first)
+            ):
+                stats[int(key)] += [float(low), float(total), float(high)]
+        return stats
+
+    def write_month(self, user_id, month, rows):
+        """
+        Write one user's readings of one month, streaming them into row
+        groups. Readings already archived for that month (late arrivals,
+        an interrupted run) are merged in, duplicates dropped.
+
+        Args:
+            rows: (id, recorded_at, temperature, humidity, co_level) tuples,
+                  oldest first
+
+        Returns:
+            int: Readings written from `rows`
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        path = self.path_for(user_id, month)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        schema = _schema()
+        temp_path = path + '.tmp'
+
+        written = 0
+        with pq.ParquetWriter(temp_path, schema, compression=self.compression) as writer:
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= self.row_group_size:
+                    writer.write_table(self._table(batch, schema), row_group_size=self.row_group_size)
+                    written += len(batch)
+                    batch = []
+            if batch:
+                writer.write_table(self._table(batch, schema), row_group_size=self.row_group_size)
+                written += len(batch)
+
+        if os.path.exists(path):
+            table = pa.concat_tables([pq.read_table(path, schema=schema), pq.read_table(temp_path, schema=schema)])
+            table = table.sort_by([('recorded_at', 'ascending'), ('id', 'ascending')])
+            ids = table.column('id').to_numpy()
+            keep = np.ones(len(ids), dtype=bool)
+            keep[1:] = ids[1:] != ids[:-1]
+            pq.write_table(table.filter(pa.array(keep)), temp_path,
+                           compression=self.compression, row_group_size=self.row_group_size)
+        os.replace(temp_path, path)
+        return written
+
+    @staticmethod
+    def _table(rows, schema):
+        import pyarrow as pa
+
+        columns = list(zip(*rows))
+        return pa.table([pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema)
+
+
+def _month_groups(rows):
+    """Split (id, recorded_at, ...) tuples, oldest first, into (month, rows iterator) runs."""
+    rows = iter(rows)
+    pending = next(rows, None)
+    while pending is not None:
+        month = interval_start(pending[1], 'month')
+        upper = next_interval(month, 'month')
+        state = {'next': None}
+
+        def run(first=pending, upper=upper, state=state):
+            yield first
+            for row in rows:
+                if _as_utc(row[1]) >= upper:
+                    state['next'] = row
+                    return
+                yield row
+
+        yield month, run()
+        pending = state['next']
+
+
+def archive_readings(db, archive, older_than_days, now=None, batch_size=5000):
+    """
+    Move readings of complete UTC months older than `older_than_days` from
+    sensor_data into the archive. Each user's files are written before
+    their rows are deleted; one commit per user.
+
+    Returns:
+        (cutoff datetime, number of readings archived)
+    """
+    now = now or datetime.now(timezone.utc)
+    cutoff = interval_start(now - timedelta(days=older_than_days), 'month')
+
+    user_ids = db.execute(
+        select(SensorData.user_id).where(SensorData.recorded_at < cutoff).distinct()
+    ).scalars().all()
+
+    total = 0
+    for user_id in user_ids:
+        stmt = select_readings(user_id, columns=SERIES_COLUMNS, newest_first=False)
+        stmt = stmt.where(SensorData.recorded_at < cutoff).execution_options(yield_per=batch_size)
+        result = db.execute(stmt)
+        max_id = None
+        try:
+            rows = (row for partition in result.partitions() for row in partition)
+            for month, month_rows in _month_groups(rows):
+                def tracked(month_rows=month_rows):
+                    nonlocal max_id
+                    for row in month_rows:
+                        max_id = row[0] if max_id is None else max(max_id, row[0])
+                        yield tuple(row)
+                total += archive.write_month(user_id, month, tracked())
+        finally:
+            result.close()
+
+        if max_id is not None:
+            # Rows inserted after the read (higher ids) stay for the next run
+            db.execute(delete(SensorData).where(
+                SensorData.user_id == user_id,
+                SensorData.recorded_at < cutoff,
+                SensorData.id <= max_id
+            ))
+        db.commit()
+        print(f"✓ Archived readings of {user_id or UNOWNED_DIR} before {cutoff:%Y-%m}")
+    return cutoff, total
+
+
+# Global instance
+reading_archive = None
+
+def get_archive():
+    """Get the configured reading archive, or None if ARCHIVE_DIR is not set."""
+    global reading_archive
+    if reading_archive is None and Config.ARCHIVE_DIR:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("⚠️  ARCHIVE_DIR is set but pyarrow is not installed; archived readings are unreadable")
+        reading_archive = ReadingArchive(
+            Config.ARCHIVE_DIR,
+            compression=Config.ARCHIVE_COMPRESSION,
+            row_group_size=Config.ARCHIVE_ROW_GROUP_SIZE
+        )
+    return reading_archive
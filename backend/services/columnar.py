@@ -0,0 +1,123 @@
+"""
+Columnar encodings of sensor history for chart loads.
+
+Rows are read as Core tuples through models.sensor_reader (no ORM
+objects, no Decimal, no to_dict) into NumPy columns, then encoded as one of:
+
+    columnar: JSON object of parallel arrays, epoch-millisecond timestamps
+    arrow:    Apache Arrow IPC stream (requires the optional pyarrow package)
+    binary:   packed little-endian arrays, see pack_binary()
+"""
+
+import struct
+from datetime import timezone
+from itertools import islice
+import numpy as np
+from models.sensor_reader import SERIES_COLUMNS, select_readings
+
+COLUMNAR_FORMATS = ('columnar', 'arrow', 'binary')
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+BINARY_MIMETYPE = 'application/octet-stream'
+BINARY_MAGIC = b'ECS1'
+
+
+def _epoch_ms(recorded_at):
+    if recorded_at.tzinfo is None:
+        # SQLite hands back naive UTC timestamps
+        recorded_at = recorded_at.replace(tzinfo=timezone.utc)
+    return int(recorded_at.timestamp() * 1000)
+
+
+def fetch_columns(db, user_id, start=None, end=None, limit=100, archive=None):
+    """
+    Newest `limit` readings of a user as NumPy columns (newest first, like
+    /history limit mode), merged with `archive` when the range reaches it.
+
+    Returns:
+        dict: id (int64), t (int64 epoch ms), temperature, humidity (float64),
+              co_level (int32)
+    """
+    stmt = select_readings(user_id, start, end, columns=SERIES_COLUMNS).limit(limit)
+    rows = db.execute(stmt).all()
+    # Live rows that fill the limit and are all newer than the archive win outright
+    filled = rows and len(rows) >= limit and archive is not None and archive.older_than(user_id, rows[-1][1])
+    if archive is not None and not filled and archive.overlaps(user_id, start, end):
+        from services.archive import merge_readings
+
+        rows = list(islice(merge_readings(rows, archive.read(user_id, start, end)), limit))
+    count = len(rows)
+    ids, times, temperature, humidity, co_level = zip(*rows) if rows else ((),) * 5
+    return {
+        'id': np.fromiter(ids, dtype=np.int64, count=count),
+        't': np.fromiter(map(_epoch_ms, times), dtype=np.int64, count=count),
+        'temperature': np.fromiter(temperature, dtype=np.float64, count=count),
+        'humidity': np.fromiter(humidity, dtype=np.float64, count=count),
+        'co_level': np.fromiter(co_level, dtype=np.int32, count=count),
+    }
+
+
+def to_columnar(columns):
+    """Parallel JSON arrays."""
+    return {name: values.tolist() for name, values in columns.items()}
+
+
+def to_arrow(columns):
+    """
+    Arrow IPC stream bytes.
+
+    Raises:
+        ImportError: If pyarrow is not installed
+    """
+    import pyarrow as pa
+
+    table = pa.table({
+        'id': columns['id'],
+        't': pa.array(columns['t'], type=pa.timestamp('ms', tz='UTC')),
+        'temperature': columns['temperature'],
+        'humidity': columns['humidity'],
+        'co_level': columns['co_level'],
+    })
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def pack_binary(columns):
+    """
+    Packed little-endian layout (every array starts 8-byte aligned, so it
+    can be viewed directly as a JS typed array):
+
+        4s  magic b'ECS1'
+        u32 count (n)
+        i64[n] id, i64[n] t (epoch ms),
+        f64[n] temperature, f64[n] humidity, i32[n] co_level
+        (+ 4 padding bytes when n is odd, keeping the total 8-byte aligned)
+
+    Metrics stay float64, so values match the json and columnar formats exactly.
+    """
+    count = len(columns['id'])
+    parts = [
+        struct.pack('<4sI', BINARY_MAGIC, count),
+        columns['id'].astype('<i8').tobytes(),
+        columns['t'].astype('<i8').tobytes(),
+        columns['temperature'].astype('<f8').tobytes(),
+        columns['humidity'].astype('<f8').tobytes(),
+        columns['co_level'].astype('<i4').tobytes(),
+    ]
+    if count % 2:
+        parts.append(b'\0' * 4)
+    return b''.join(parts)
+
+
+def unpack_binary(data):
+    """Inverse of pack_binary() (for clients and tests)."""
+    magic, count = struct.unpack_from('<4sI', data)
+    if magic != BINARY_MAGIC:
+        raise ValueError('Not an ECS binary history payload')
+    columns, offset = {}, 8
+    for name, dtype in (('id', '<i8'), ('t', '<i8'), ('temperature', '<f8'),
+                        ('humidity', '<f8'), ('co_level', '<i4')):
+        columns[name] = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+        offset += columns[name].nbytes
+    return columns
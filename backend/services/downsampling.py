@@ -0,0 +1,323 @@
+"""
+Server-side downsampling of sensor history for charts.
+
+Two ways to reduce a time range to roughly `points` values per metric, so
+the payload is bounded by chart width instead of by how much data exists:
+
+    buckets: fixed-width time buckets with min/avg/max per metric, aggregated
+             in SQL (only one row per bucket leaves the database), from
+             the rollup tables when buckets are a minute or wider
+    lttb:    Largest-Triangle-Three-Buckets decimation in NumPy, which keeps
+             real readings and preserves the visual shape (peaks included);
+             ranges with more than HISTORY_LTTB_MAX_ROWS readings are
+             pre-bucketed in SQL (min/max per bucket) first
+"""
+
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from itertools import islice
+from sqlalchemy import Float, Integer, Numeric, cast, func, literal, literal_column
+from config import Config
+from models import SensorData
+from models.sensor_reader import SERIES_COLUMNS, select_readings
+from services.rollups import GRANULARITIES, bucket_start, rollups_cover
+
+METRICS = ('temperature', 'humidity', 'co_level')
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def parse_timestamp(value):
+    """
+    Parse an ISO timestamp; naive values are taken as UTC.
+
+    Raises:
+        ValueError: If the value is not an ISO timestamp
+    """
+    parsed = datetime.fromisoformat(value.strip().replace(' ', '+').replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def epoch_seconds(column, dialect_name):
+    """SQL expression for a timestamp column as Unix seconds."""
+    if dialect_name == 'postgresql':
+        return func.extract('epoch', column)
+    # SQLite stores UTC timestamps as text; whole seconds plus milliseconds
+    # (julianday() arithmetic is too imprecise to land on bucket edges)
+    return cast(func.strftime('%s', column), Integer) + (func.strftime('%f', column) - func.strftime('%S', column))
+
+
+def _stats_from_sql(db, user_id, model, lower, upper, upper_inclusive, origin, width, points):
+    """
+    Per-bucket count and min/sum/max of every metric over [lower, upper)
+    (or [lower, upper]), from a rollup model or, for model None, raw rows.
+
+    Returns:
+        dict: bucket index -> [count, min, sum, max (per metric, in METRICS order)]
+    """
+    dialect_name = db.get_bind().dialect.name
+    if model is not None:
+        source, time_column = model, model.bucket_start
+        aggregates = [func.sum(model.count)]
+        for name in METRICS:
+            aggregates += [
+                func.min(getattr(model, f'{name}_min')),
+                cast(func.sum(getattr(model, f'{name}_sum')), Float),
+                func.max(getattr(model, f'{name}_max')),
+            ]
+    else:
+        source, time_column = SensorData, SensorData.recorded_at
+        aggregates = [func.count()]
+        for name in METRICS:
+            column = getattr(SensorData, name)
+            aggregates += [func.min(column), cast(func.sum(cast(column, Numeric)), Float), func.max(column)]
+
+    offset = (epoch_seconds(time_column, dialect_name) - origin.timestamp()) / literal(width)
+    # Rows are >= origin, so truncation is floor (Postgres casts round instead).
+    # Readings exactly at `end` belong to the last bucket.
+    if dialect_name == 'postgresql':
+        bucket = func.least(func.floor(offset), points - 1)
+    else:
+        bucket = func.min(cast(offset, Integer), points - 1)
+    bucket = bucket.label('bucket')
+    # Group by the output name: the expression's bound parameters would
+    # otherwise be rendered twice and Postgres would not match them
+    by_bucket = literal_column('bucket')
+
+    rows = db.query(bucket, *aggregates).filter(
+        source.user_id == user_id,
+        time_column >= lower,
+        time_column <= upper if upper_inclusive else time_column < upper
+    ).group_by(by_bucket).all()
+    return {int(row[0]): [int(row[1])] + [float(value) for value in row[2:]] for row in rows}
+
+
+def merge_bucket_stats(into, stats):
+    """Fold one bucket -> [count, min, sum, max, ...] dict into another."""
+    for key, other in stats.items():
+        merged = into.get(key)
+        if merged is None:
+            into[key] = list(other)
+            continue
+        merged[0] += other[0]
+        for i in range(len(METRICS)):
+            merged[1 + 3 * i] = min(merged[1 + 3 * i], other[1 + 3 * i])
+            merged[2 + 3 * i] += other[2 + 3 * i]
+            merged[3 + 3 * i] = max(merged[3 + 3 * i], other[3 + 3 * i])
+    return into
+
+
+def plan_sources(lower, upper, upper_inclusive, levels):
+    """
+    Cover a time range with whole rollup buckets: the coarsest level for
+    the aligned middle, finer levels for the partial buckets at either edge
+    and raw rows for what is left (less than a minute at each end).
+
+    Args:
+        levels: (bucket seconds, model) allowed, finest first
+
+    Returns:
+        list: (model or None for raw rows, lower, upper, upper_inclusive)
+    """
+    if not levels:
+        return [(None, lower, upper, upper_inclusive)]
+    seconds, model = levels[-1]
+    finer = levels[:-1]
+    first = bucket_start(lower, seconds)
+    if first < lower:
+        first += timedelta(seconds=seconds)
+    last = bucket_start(upper, seconds)
+    if first >= last:
+        return plan_sources(lower, upper, upper_inclusive, finer)
+
+    pieces = []
+    if lower < first:
+        pieces += plan_sources(lower, first, False, finer)
+    pieces.append((model, first, last, False))
+    if last < upper or upper_inclusive:
+        pieces += plan_sources(last, upper, upper_inclusive, finer)
+    return pieces
+
+
+def bucket_aggregates(db, user_id, start, end, points, archive=None):
+    """
+    Min/avg/max of every metric per fixed-width time bucket, computed in SQL.
+
+    Buckets of a minute or wider are aggregated from the coarsest rollup
+    table that fits (O(buckets) instead of O(rows)), provided a rebuild has
+    made them complete from `start` on. Rollup buckets only
+    count when they lie entirely inside [start, end]; the partial ones at
+    the edges are filled from finer rollups and raw readings. Rollups
+    outlive archived readings; raw edges also fold in the archive.
+
+    Args:
+        db: Database session
+        user_id: Owner of the readings
+        start, end: Aware datetimes bounding the range (inclusive)
+        points: Target number of buckets
+        archive: Optional ReadingArchive with older readings
+
+    Returns:
+        (bucket width in seconds, source table name, list of bucket dicts
+         ordered by time; empty buckets are omitted)
+    """
+    width = max((end - start).total_seconds() / points, 0.001)
+    levels = [level for level in GRANULARITIES if level[0] <= width]
+    if levels and not rollups_cover(db, start):
+        # Rollups not backfilled that far back: they would miss readings
+        levels = []
+    source = levels[-1][1].__tablename__ if levels else SensorData.__tablename__
+
+    # bucket -> [count, min, sum, max per metric]
+    stats = {}
+    for model, lower, upper, upper_inclusive in plan_sources(start, end, True, levels):
+        merge_bucket_stats(stats, _stats_from_sql(
+            db, user_id, model, lower, upper, upper_inclusive, start, width, points
+        ))
+        if model is None and archive is not None and archive.overlaps(user_id, lower, upper):
+            merge_bucket_stats(stats, archive.bucket_stats(
+                user_id, lower, upper, width, points, origin=start, end_exclusive=not upper_inclusive
+            ))
+
+    buckets = []
+    for key in sorted(stats):
+        count, values = stats[key][0], stats[key][1:]
+        item = {
+            't': datetime.fromtimestamp(start.timestamp() + key * width, timezone.utc).isoformat(),
+            'count': count,
+        }
+        for i, name in enumerate(METRICS):
+            low, total, high = values[3 * i: 3 + 3 * i]
+            item[name] = {'min': low, 'avg': round(total / count, 2), 'max': high}
+        buckets.append(item)
+    return width, source, buckets
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets: indices of `threshold` points of (x, y)
+    that best preserve the shape of the line.
+
+    The first and last points are always kept; every bucket in between
+    contributes the point forming the largest triangle with the previously
+    kept point and the average of the next bucket.
+
+    Args:
+        x: 1-D array, strictly increasing
+        y: 1-D array, same length
+        threshold: Number of points to keep
+
+    Returns:
+        np.ndarray: Sorted indices into x/y
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Bucket edges over the interior points 1 .. n-2
+    edges = np.floor(np.linspace(1, n - 1, threshold - 1)).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < threshold - 1:
+            next_lo, next_hi = edges[i + 1], edges[i + 2]
+            avg_x, avg_y = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        # Twice the triangle area; the constant factor does not change argmax
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def _raw_arrays(rows, max_rows):
+    """
+    Fill NumPy arrays from (recorded_at, temperature, humidity, co_level) rows.
+
+    Returns:
+        (int64 epoch microseconds, float64 array of shape (metrics, rows)),
+        or None if there are more than `max_rows` rows
+    """
+    times = np.empty(max_rows, dtype=np.int64)
+    values = np.empty((len(METRICS), max_rows), dtype=np.float64)
+    count = 0
+    for row in rows:
+        if count == max_rows:
+            return None
+        recorded_at = row[0] if row[0].tzinfo else row[0].replace(tzinfo=timezone.utc)
+        times[count] = (recorded_at - EPOCH) // timedelta(microseconds=1)
+        values[:, count] = row[1:4]
+        count += 1
+    return times[:count], values[:, :count]
+
+
+def _bucketed_arrays(db, user_id, start, end, buckets, archive=None):
+    """
+    Min and max of every metric per time bucket (see bucket_aggregates), as
+    two points per bucket at a third and two thirds of its width.
+
+    Returns:
+        (number of readings, int64 epoch microseconds, float64 array of shape (metrics, points))
+    """
+    width, _, rows = bucket_aggregates(db, user_id, start, end, buckets, archive=archive)
+    times = np.empty(2 * len(rows), dtype=np.int64)
+    values = np.empty((len(METRICS), 2 * len(rows)), dtype=np.float64)
+    for index, bucket in enumerate(rows):
+        offset = (parse_timestamp(bucket['t']) - EPOCH) // timedelta(microseconds=1)
+        times[2 * index] = offset + round(width * 1e6 / 3)
+        times[2 * index + 1] = offset + round(width * 2e6 / 3)
+        for i, name in enumerate(METRICS):
+            values[i, 2 * index] = bucket[name]['min']
+            values[i, 2 * index + 1] = bucket[name]['max']
+    return sum(bucket['count'] for bucket in rows), times, values
+
+
+def lttb_series(db, user_id, start, end, points, archive=None, max_rows=None):
+    """
+    LTTB-decimated series per metric over raw readings (live and, given an
+    archive, archived ones).
+
+    Raw rows are streamed into NumPy arrays, at most `max_rows` of them
+    (default: Config.HISTORY_LTTB_MAX_ROWS). A range holding more readings
+    is pre-bucketed in SQL instead (from the rollups where they cover it):
+    the min and max per bucket are the candidates LTTB picks from, so peaks
+    are kept but their timestamps are bucket positions.
+
+    Returns:
+        (number of raw readings, {metric: {'t': [iso, ...], 'value': [...]}})
+    """
+    max_rows = Config.HISTORY_LTTB_MAX_ROWS if max_rows is None else max_rows
+    stmt = select_readings(user_id, start, end, columns=SERIES_COLUMNS, newest_first=False)
+    stmt = stmt.limit(max_rows + 1).execution_options(yield_per=5000)
+    if archive is not None and archive.overlaps(user_id, start, end):
+        from services.archive import merge_readings
+
+        archived = archive.read(user_id, start, end, newest_first=False)
+        rows = (row[1:] for row in merge_readings(db.execute(stmt), archived, newest_first=False))
+        arrays = _raw_arrays(islice(rows, max_rows + 1), max_rows)
+    else:
+        arrays = _raw_arrays((row[1:] for row in db.execute(stmt)), max_rows)
+
+    if arrays is None:
+        readings, times, values = _bucketed_arrays(db, user_id, start, end, min(max_rows // 2, 4 * points),
+                                                   archive=archive)
+    else:
+        times, values = arrays
+        readings = len(times)
+
+    x = times / 1e6
+    series = {}
+    for i, name in enumerate(METRICS):
+        keep = lttb_indices(x, values[i], points)
+        series[name] = {
+            't': [(EPOCH + timedelta(microseconds=int(times[j]))).isoformat() for j in keep],
+            'value': values[i][keep].tolist(),
+        }
+    return readings, series
@@ -0,0 +1,99 @@
+"""
+Streaming bulk export of sensor history (NDJSON or CSV).
+
+Rows come from a server-side cursor (yield_per) as plain Core tuples and are
+encoded in fixed-size chunks, optionally gzip-compressed on the fly, so an
+export of millions of rows runs in constant memory.
+"""
+
+import csv
+import io
+import json
+import zlib
+from models.sensor_reader import SERIES_COLUMNS, select_readings
+
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv'),
+}
+COLUMNS = ('id', 'recorded_at', 'temperature', 'humidity', 'co_level')
+
+
+def _live_rows(db, user_id, start, end, batch_size):
+    stmt = select_readings(user_id, start, end, columns=SERIES_COLUMNS, newest_first=False)
+    stmt = stmt.execution_options(yield_per=batch_size)
+
+    result = db.execute(stmt)
+    try:
+        for partition in result.partitions():
+            yield from partition
+    finally:
+        result.close()
+
+
+def export_rows(db, user_id, start=None, end=None, batch_size=2000, archive=None):
+    """
+    Yield (id, recorded_at, temperature, humidity, co_level) oldest first,
+    fetching `batch_size` rows at a time from a server-side cursor. Given an
+    archive, archived readings are merged in one row group at a time.
+    """
+    live = _live_rows(db, user_id, start, end, batch_size)
+    if archive is None or not archive.overlaps(user_id, start, end):
+        yield from live
+        return
+
+    from services.archive import merge_readings
+
+    try:
+        yield from merge_readings(live, archive.read(user_id, start, end, newest_first=False), newest_first=False)
+    finally:
+        live.close()
+
+
+def _values(row):
+    record_id, recorded_at, temperature, humidity, co_level = row
+    return record_id, recorded_at.isoformat(), temperature, humidity, co_level
+
+
+def ndjson_chunks(rows, rows_per_chunk=1000):
+    """One JSON object per line, yielded `rows_per_chunk` lines at a time."""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(COLUMNS, _values(row)))))
+        if len(lines) >= rows_per_chunk:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def csv_chunks(rows, rows_per_chunk=1000):
+    """CSV with a header row, yielded `rows_per_chunk` rows at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(COLUMNS)
+    pending = 0
+    for row in rows:
+        writer.writerow(_values(row))
+        pending += 1
+        if pending >= rows_per_chunk:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+
+def encode_chunks(chunks, compress=False):
+    """Encode text chunks as UTF-8, gzip-compressing them as a single stream if asked."""
+    if not compress:
+        for chunk in chunks:
+            yield chunk.encode('utf-8')
+        return
+    # wbits=31: gzip container (header + CRC) around the deflate stream
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,231 @@
+"""
+Pure-NumPy inference engine for the ECS deep models.
+
+The sklearn MLPRegressor/MLPClassifier pickles plus scaler_X and scaler_y_reg
+are exported once to a compact weight bundle (.npz). Input standardization is
+folded into the first layer of both networks and the regressor's output
+de-standardization into its last layer, so serving is a handful of matmuls
+with no sklearn/pandas import and no per-call input validation.
+
+Export the bundle (from the backend directory):
+    python -m services.numpy_inference
+"""
+
+import os
+import shutil
+import tempfile
+import numpy as np
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ai', 'ai_models')
+BUNDLE_PATH = os.path.join(MODEL_DIR, 'ecs_inference_bundle.npz')
+
+ACTIVATIONS = {
+    'relu': lambda x: np.maximum(x, 0, out=x),
+    'tanh': lambda x: np.tanh(x, out=x),
+    'logistic': lambda x: np.divide(1.0, 1.0 + np.exp(-x), out=x),
+    'identity': lambda x: x,
+}
+
+
+def _fold_network(coefs, intercepts, in_mean, in_scale, out_mean=None, out_scale=None):
+    """
+    Fold input standardization into the first layer (and optionally output
+    de-standardization into the last layer) of an MLP.
+
+    (x - mean) / scale @ W + b  ==  x @ (W / scale[:, None]) + (b - (mean / scale) @ W)
+    (h @ W + b) * scale + mean  ==  h @ (W * scale) + (b * scale + mean)
+    """
+    coefs = [np.asarray(w, dtype=np.float64).copy() for w in coefs]
+    intercepts = [np.asarray(b, dtype=np.float64).copy() for b in intercepts]
+
+    intercepts[0] = intercepts[0] - (in_mean / in_scale) @ coefs[0]
+    coefs[0] = coefs[0] / in_scale[:, None]
+
+    if out_mean is not None:
+        intercepts[-1] = intercepts[-1] * out_scale + out_mean
+        coefs[-1] = coefs[-1] * out_scale[None, :]
+
+    return coefs, intercepts
+
+
+def export_bundle(model_dir=MODEL_DIR, bundle_path=BUNDLE_PATH):
+    """
+    Convert the joblib pickles in `model_dir` into a folded .npz weight bundle.
+    Requires joblib/scikit-learn (export-time only).
+    """
+    import joblib
+
+    reg = joblib.load(os.path.join(model_dir, 'ecs_deep_regressor.pkl'))
+    cls = joblib.load(os.path.join(model_dir, 'ecs_deep_classifier.pkl'))
+    scaler_X = joblib.load(os.path.join(model_dir, 'scaler_X.pkl'))
+    scaler_y = joblib.load(os.path.join(model_dir, 'scaler_y_reg.pkl'))
+    label_encoder = joblib.load(os.path.join(model_dir, 'label_encoder.pkl'))
+
+    if cls.out_activation_ != 'softmax':
+        raise ValueError(f"Unsupported classifier output activation: {cls.out_activation_}")
+    if reg.out_activation_ != 'identity':
+        raise ValueError(f"Unsupported regressor output activation: {reg.out_activation_}")
+
+    x_mean, x_scale = scaler_X.mean_, scaler_X.scale_
+    reg_coefs, reg_intercepts = _fold_network(
+        reg.coefs_, reg.intercepts_, x_mean, x_scale, scaler_y.mean_, scaler_y.scale_
+    )
+    cls_coefs, cls_intercepts = _fold_network(cls.coefs_, cls.intercepts_, x_mean, x_scale)
+
+    arrays = {
+        'reg_activation': np.array(reg.activation),
+        'cls_activation': np.array(cls.activation),
+        'cls_classes': np.asarray(cls.classes_),
+        'action_labels': np.asarray(label_encoder.classes_, dtype=str),
+    }
+    for i, (w, b) in enumerate(zip(reg_coefs, reg_intercepts)):
+        arrays[f'reg_W{i}'] = w
+        arrays[f'reg_b{i}'] = b
+    for i, (w, b) in enumerate(zip(cls_coefs, cls_intercepts)):
+        arrays[f'cls_W{i}'] = w
+        arrays[f'cls_b{i}'] = b
+
+    np.savez_compressed(bundle_path, **arrays)
+    print(f"✓ Exported NumPy inference bundle to {bundle_path}")
+    return bundle_path
+
+
+def _mmap_store(bundle_path):
+    """
+    Return a directory of uncompressed .npy files extracted from the bundle.
+
+    .npz members cannot be memory-mapped, so the bundle is unpacked once next
+    to itself (re-extracted when the bundle changes). Extraction goes through
+    a temp directory + rename, so concurrent workers never see partial files.
+    """
+    store_dir = os.path.splitext(bundle_path)[0] + '_mmap'
+    stamp = f"{os.path.getsize(bundle_path)}:{os.path.getmtime(bundle_path)}"
+    stamp_file = os.path.join(store_dir, 'SOURCE')
+
+    if os.path.exists(stamp_file):
+        with open(stamp_file) as f:
+            if f.read() == stamp:
+                return store_dir
+
+    tmp_dir = tempfile.mkdtemp(prefix='.bundle-', dir=os.path.dirname(bundle_path))
+    try:
+        with np.load(bundle_path, allow_pickle=False) as bundle:
+            for name in bundle.files:
+                np.save(os.path.join(tmp_dir, f'{name}.npy'), bundle[name], allow_pickle=False)
+        with open(os.path.join(tmp_dir, 'SOURCE'), 'w') as f:
+            f.write(stamp)
+        shutil.rmtree(store_dir, ignore_errors=True)
+        os.rename(tmp_dir, store_dir)
+    except OSError:
+        # Another worker renamed its copy first (or the dir is read-only)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.exists(stamp_file):
+            raise
+    return store_dir
+
+
+class NumpyInferenceEngine:
+    """Forward pass over a folded weight bundle. Inputs are raw (unscaled) features."""
+
+    def __init__(self, arrays):
+        self.action_labels = np.asarray(arrays['action_labels'])
+        self.cls_classes = np.asarray(arrays['cls_classes'])
+        self._reg_layers = self._layers(arrays, 'reg')
+        self._cls_layers = self._layers(arrays, 'cls')
+        self._reg_activation = ACTIVATIONS[str(arrays['reg_activation'])]
+        self._cls_activation = ACTIVATIONS[str(arrays['cls_activation'])]
+
+    @staticmethod
+    def _layers(arrays, prefix):
+        layers = []
+        i = 0
+        while f'{prefix}_W{i}' in arrays:
+            layers.append((np.asarray(arrays[f'{prefix}_W{i}']), np.asarray(arrays[f'{prefix}_b{i}'])))
+            i += 1
+        return layers
+
+    @classmethod
+    def load(cls, bundle_path=BUNDLE_PATH, mmap=False):
+        """
+        Load an exported .npz bundle.
+
+        Args:
+            bundle_path: Path to the .npz written by export_bundle()
+            mmap: Memory-map the weights read-only, so forked worker processes
+                  share the same physical pages instead of each holding a copy
+        """
+        if mmap:
+            try:
+                store_dir = _mmap_store(bundle_path)
+                arrays = {
+                    name[:-4]: np.load(os.path.join(store_dir, name), mmap_mode='r', allow_pickle=False)
+                    for name in os.listdir(store_dir) if name.endswith('.npy')
+                }
+                return cls(arrays)
+            except OSError as e:
+                print(f"⚠️  Could not memory-map inference bundle ({e}), loading into memory")
+
+        with np.load(bundle_path, allow_pickle=False) as bundle:
+            return cls({name: bundle[name] for name in bundle.files})
+
+    @property
+    def classes_(self):
+        """Action labels (same order as LabelEncoder.classes_)."""
+        return self.action_labels
+
+    def encode_actions(self, actions):
+        """Vectorized LabelEncoder.transform for labels known to be valid."""
+        return np.searchsorted(self.action_labels, np.asarray(actions, dtype=str))
+
+    @staticmethod
+    def _forward(x, layers, activation):
+        for W, b in layers[:-1]:
+            x = activation(x @ W + b)
+        W, b = layers[-1]
+        return x @ W + b
+
+    def predict(self, features):
+        """
+        Args:
+            features: (N, 4) raw features [temperature_C, humidity_%, CO_ppm, action_encoded]
+
+        Returns:
+            (future_env (N, 3), recommended action labels (N,))
+        """
+        x = np.asarray(features, dtype=np.float64)
+        future_env = self._forward(x, self._reg_layers, self._reg_activation)
+        logits = self._forward(x, self._cls_layers, self._cls_activation)
+        encoded = self.cls_classes[np.argmax(logits, axis=1)]
+        return future_env, self.action_labels[encoded]
+
+
+class SklearnInferenceEngine:
+    """Reference engine running the original joblib pickles (same interface as NumpyInferenceEngine)."""
+
+    def __init__(self, model_dir=MODEL_DIR, mmap=False):
+        import joblib
+        # mmap_mode only applies to arrays stored uncompressed by joblib.dump; otherwise it is a no-op
+        mmap_mode = 'r' if mmap else None
+        load = lambda name: joblib.load(os.path.join(model_dir, name), mmap_mode=mmap_mode)
+        self.reg_model = load('ecs_deep_regressor.pkl')
+        self.cls_model = load('ecs_deep_classifier.pkl')
+        self.scaler_X = load('scaler_X.pkl')
+        self.scaler_y = load('scaler_y_reg.pkl')
+        self.label_encoder = load('label_encoder.pkl')
+
+    @property
+    def classes_(self):
+        return self.label_encoder.classes_
+
+    def encode_actions(self, actions):
+        return self.label_encoder.transform(actions)
+
+    def predict(self, features):
+        input_scaled = self.scaler_X.transform(features)
+        future_env = self.scaler_y.inverse_transform(self.reg_model.predict(input_scaled))
+        recommended = self.label_encoder.inverse_transform(self.cls_model.predict(input_scaled))
+        return future_env, recommended
+
+
+if __name__ == '__main__':
+    export_bundle()
@@ -0,0 +1,190 @@
+"""
+Range partitions of sensor_data on recorded_at (Postgres).
+
+The table is partitioned by migration 7a4e2b9c1d58. This module keeps the
+partition set current:
+
+    - creates partitions `premake` intervals ahead of now, so inserts never
+      land in the default partition
+    - moves readings that landed in the default partition (maintenance not
+      run for a while) into the partition created for their range
+    - detaches (and by default drops) partitions whose whole range is older
+      than the retention period, and deletes expired readings stuck in the
+      default partition; rollups keep their aggregates
+
+Run it from cron / a scheduler:
+    flask --app app partitions maintain
+"""
+
+import re
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import text
+
+PARENT_TABLE = 'sensor_data'
+DEFAULT_PARTITION = f'{PARENT_TABLE}_default'
+INTERVALS = ('day', 'week', 'month')
+
+_BOUND_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def interval_start(moment, interval):
+    """Start (UTC) of the partition interval containing `moment`."""
+    moment = moment.astimezone(timezone.utc) if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == 'day':
+        return day
+    if interval == 'week':
+        return day - timedelta(days=day.weekday())
+    if interval == 'month':
+        return day.replace(day=1)
+    raise ValueError(f"interval must be one of {', '.join(INTERVALS)}")
+
+
+def next_interval(start, interval):
+    """Start of the interval after the one starting at `start`."""
+    if interval == 'day':
+        return start + timedelta(days=1)
+    if interval == 'week':
+        return start + timedelta(weeks=1)
+    if interval == 'month':
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    raise ValueError(f"interval must be one of {', '.join(INTERVALS)}")
+
+
+def partition_name(lower):
+    return f"{PARENT_TABLE}_p{lower:%Y%m%d}"
+
+
+def plan_maintenance(partitions, now, interval='month', premake=3, retention_days=0):
+    """
+    Work out which partitions to create and which have expired.
+
+    Args:
+        partitions: Existing ranged partitions as (name, lower, upper)
+        now: Current time (aware)
+        interval: Size of new partitions: day | week | month
+        premake: Number of intervals after the current one to cover
+        retention_days: Expire partitions entirely older than this (0 keeps everything)
+
+    Returns:
+        (to_create [(name, lower, upper)], to_expire [name])
+    """
+    # New partitions continue from the newest existing bound, so a change of
+    # interval never produces overlapping ranges
+    horizon = interval_start(now, interval)
+    for _ in range(premake + 1):
+        horizon = next_interval(horizon, interval)
+
+    lower = max((upper for _, _, upper in partitions), default=interval_start(now, interval))
+    to_create = []
+    while lower < horizon:
+        upper = next_interval(interval_start(lower, interval), interval)
+        to_create.append((partition_name(lower), lower, upper))
+        lower = upper
+
+    to_expire = []
+    if retention_days > 0:
+        cutoff = now - timedelta(days=retention_days)
+        to_expire = [name for name, _, upper in sorted(partitions, key=lambda p: p[1]) if upper <= cutoff]
+    return to_create, to_expire
+
+
+def _parse_bound(value):
+    parsed = datetime.fromisoformat(value.replace(' ', 'T'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def list_partitions(db):
+    """Ranged partitions of sensor_data as (name, lower, upper); the default partition is skipped."""
+    rows = db.execute(text("""
+        SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = :parent
+    """), {'parent': PARENT_TABLE}).all()
+
+    partitions = []
+    for name, bound in rows:
+        match = _BOUND_RE.search(bound or '')
+        if match:
+            partitions.append((name, _parse_bound(match.group(1)), _parse_bound(match.group(2))))
+    return partitions
+
+
+def _has_default_partition(db):
+    return db.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {'name': DEFAULT_PARTITION}).scalar()
+
+
+def _create_partition(db, name, lower, upper, has_default):
+    """
+    Create one partition. Postgres refuses to while the default partition
+    holds rows of that range, so those rows are moved out first and
+    inserted back (into the new partition) in the same transaction.
+
+    Returns:
+        int: Readings moved out of the default partition
+    """
+    bounds = {'lower': lower, 'upper': upper}
+    in_range = "recorded_at >= :lower AND recorded_at < :upper"
+    stranded = has_default and db.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_range})"), bounds
+    ).scalar()
+
+    if stranded:
+        db.execute(text(f"CREATE TEMP TABLE stranded_readings (LIKE {PARENT_TABLE}) ON COMMIT DROP"))
+        db.execute(text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE {in_range} RETURNING *) "
+            f"INSERT INTO stranded_readings SELECT * FROM moved"
+        ), bounds)
+    db.execute(text(
+        f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF {PARENT_TABLE} '
+        f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+    ))
+    if not stranded:
+        return 0
+    moved = db.execute(text(f"INSERT INTO {PARENT_TABLE} SELECT * FROM stranded_readings")).rowcount
+    db.execute(text("DROP TABLE stranded_readings"))
+    print(f"✓ Moved {moved} readings from {DEFAULT_PARTITION} into {name}")
+    return moved
+
+
+def run_maintenance(db, interval='month', premake=3, retention_days=0, drop=True, dry_run=False, now=None):
+    """
+    Create upcoming partitions and expire old ones.
+
+    Returns:
+        (created names, expired names)
+    """
+    if db.get_bind().dialect.name != 'postgresql':
+        print("⚠️  Partition maintenance needs PostgreSQL, skipped")
+        return [], []
+
+    now = now or datetime.now(timezone.utc)
+    to_create, to_expire = plan_maintenance(list_partitions(db), now, interval, premake, retention_days)
+    if dry_run:
+        return [name for name, _, _ in to_create], to_expire
+
+    has_default = _has_default_partition(db)
+    for name, lower, upper in to_create:
+        _create_partition(db, name, lower, upper, has_default)
+    for name in to_expire:
+        db.execute(text(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION "{name}"'))
+        if drop:
+            db.execute(text(f'DROP TABLE "{name}"'))
+
+    if retention_days > 0 and has_default:
+        # Readings of ranges without a partition (e.g. late ones for a dropped month)
+        cutoff = {'cutoff': now - timedelta(days=retention_days)}
+        if drop:
+            deleted = db.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE recorded_at < :cutoff"), cutoff).rowcount
+            if deleted:
+                print(f"✓ Deleted {deleted} expired readings from {DEFAULT_PARTITION}")
+        else:
+            stale = db.execute(text(f"SELECT count(*) FROM {DEFAULT_PARTITION} WHERE recorded_at < :cutoff"), cutoff).scalar()
+            if stale:
+                print(f"⚠️  {stale} expired readings remain in {DEFAULT_PARTITION} (detach-only mode)")
+    db.commit()
+    return [name for name, _, _ in to_create], to_expire
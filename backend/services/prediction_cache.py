@@ -0,0 +1,83 @@
+"""
+Memoization for AI predictions.
+ESP32 readings drift by hundredths between samples, so inputs are quantized
+to a configurable resolution and identical (quantized inputs, action) pairs
+reuse the previous prediction instead of running the models again.
+"""
+
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+class PredictionCache:
+    """
+    Bounded LRU of prediction results keyed on quantized inputs + action.
+
+    Two samples share a cache entry when temperature, humidity and CO fall in
+    the same bucket of width `resolution` and the action is identical.
+    """
+
+    def __init__(self, resolution=(0.1, 0.5, 1.0), max_entries=4096):
+        """
+        Args:
+            resolution: Bucket widths for (temperature_C, humidity_%, CO_ppm)
+            max_entries: Max cached results (least recently used evicted first)
+        """
+        self.resolution = np.asarray(resolution, dtype=float)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def make_keys(self, features, actions):
+        """
+        Vectorized key computation.
+
+        Args:
+            features: (N, 3) array of temperature_C, humidity_%, CO_ppm
+            actions: (N,) array of action labels
+        """
+        buckets = np.rint(np.asarray(features, dtype=float) / self.resolution).astype(np.int64)
+        return [(*bucket, action) for bucket, action in zip(buckets.tolist(), np.asarray(actions).tolist())]
+
+    def get_many(self, keys):
+        """Return cached results (None for misses), updating LRU order and stats."""
+        results = []
+        with self._lock:
+            for key in keys:
+                result = self._entries.get(key)
+                if result is not None:
+                    self._entries.move_to_end(key)
+                results.append(result)
+        hits = sum(1 for r in results if r is not None)
+        self.hits += hits
+        self.misses += len(results) - hits
+        return results
+
+    def put_many(self, keys, results):
+        """Store successful results, evicting the least recently used entries."""
+        with self._lock:
+            for key, result in zip(keys, results):
+                if result.get('status') != 'success':
+                    continue
+                self._entries[key] = result
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry (called when models are reloaded)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Size and hit/miss counters."""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+        }
@@ -0,0 +1,133 @@
+"""
+Background dispatcher for AI predictions.
+Collects readings from many devices into micro-batches and runs one
+vectorized inference pass per batch, off the MQTT network thread.
+"""
+
+import queue
+import threading
+import time
+from services.ai_prediction_service import AIPredictionService
+
+
+class PredictionDispatcher:
+    """
+    Worker pool that turns individual prediction requests into micro-batches.
+
+    A worker blocks for the first request, then keeps collecting until it has
+    `max_batch` requests or `max_wait` seconds have passed, and calls
+    AIPredictionService.predict_batch once for the whole batch. Each request's
+    callback receives its own result.
+    """
+
+    def __init__(self, max_batch=64, max_wait=0.05, workers=1, max_pending=5000):
+        """
+        Args:
+            max_batch: Max samples per inference pass
+            max_wait: Max seconds a worker waits to fill a batch
+            workers: Number of worker threads
+            max_pending: Max queued requests; new ones are dropped when full
+        """
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.workers = workers
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._stopping = threading.Event()
+        self._threads = []
+
+        # Counters (exposed through stats())
+        self.submitted = 0
+        self.dropped = 0
+        self.batches = 0
+        self.predicted = 0
+        self.last_batch_latency = 0.0
+
+    def submit(self, ai_input: dict, callback):
+        """
+        Queue a sample for prediction. Never blocks.
+
+        Args:
+            ai_input: Sample in AIPredictionService.prediction() format
+            callback: Called as callback(result) from a worker thread
+
+        Returns:
+            bool: False if the queue was full and the sample was dropped
+        """
+        try:
+            self._pending.put_nowait((ai_input, callback))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.submitted += 1
+        return True
+
+    def _collect_batch(self):
+        """Block for one request, then gather more until the batch is full or max_wait expires."""
+        try:
+            batch = [self._pending.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def run_batch(self, batch):
+        """Run one inference pass and deliver results to the callbacks."""
+        started = time.perf_counter()
+        results = AIPredictionService.predict_batch([ai_input for ai_input, _ in batch])
+        self.last_batch_latency = time.perf_counter() - started
+        self.batches += 1
+        self.predicted += len(batch)
+
+        for (_, callback), result in zip(batch, results):
+            try:
+                callback(result)
+            except Exception as e:
+                print(f"✗ Error delivering AI prediction: {e}")
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._collect_batch()
+            if batch:
+                try:
+                    self.run_batch(batch)
+                except Exception as e:
+                    print(f"✗ Error running AI prediction batch: {e}")
+
+    def start(self):
+        """Start the worker threads."""
+        if self._threads:
+            return
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'ai-predict-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"✓ AI prediction dispatcher started ({self.workers} worker(s))")
+
+    def stop(self):
+        """Stop the worker threads. Pending requests are discarded."""
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self._threads = []
+
+    def stats(self):
+        """Queue depth, batch counters and last batch latency."""
+        return {
+            'pending': self._pending.qsize(),
+            'submitted': self.submitted,
+            'dropped': self.dropped,
+            'batches': self.batches,
+            'predicted': self.predicted,
+            'avg_batch_size': round(self.predicted / self.batches, 2) if self.batches else 0.0,
+            'last_batch_latency_ms': round(self.last_batch_latency * 1000, 2),
+        }
@@ -0,0 +1,188 @@
+"""
+Bounded cache of rendered /history responses.
+
+A response for a range whose end is safely in the past ("settled") is kept
+for a TTL that grows with the age of the range (LRU, bounded by entry count
+and total bytes), and dropped early when the ingest writer commits readings
+of that user older than the settle horizon (a batch retried through a
+database outage lands with its original timestamps). A response for a range
+that touches "now" is tied to the user's data version, which the ingest
+writer bumps after every flush containing that user's readings, and also
+expires after a short TTL (versions are per process, so a web worker that
+does not run the ingest writer never sees the bumps).
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from config import Config
+
+
+class DataVersions:
+    """
+    Per-user counters bumped whenever new readings are committed, and
+    separate "late" counters bumped only for readings older than the settle
+    horizon (the only ones that can change a settled range).
+    """
+
+    def __init__(self):
+        self._versions = {}
+        self._late = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        return self._versions.get(str(user_id), 0)
+
+    def late(self, user_id):
+        return self._late.get(str(user_id), 0)
+
+    def bump(self, user_ids, late_user_ids=()):
+        """
+        Args:
+            user_ids: Users with newly committed readings
+            late_user_ids: Users among them with readings older than the settle horizon
+        """
+        with self._lock:
+            for counters, ids in ((self._versions, user_ids), (self._late, late_user_ids)):
+                for user_id in ids:
+                    if user_id is not None:
+                        key = str(user_id)
+                        counters[key] = counters.get(key, 0) + 1
+
+
+class CachedResponse:
+    __slots__ = ('body', 'mimetype', 'etag', 'version', 'late', 'expires_at')
+
+    def __init__(self, body, mimetype, etag, version, late, expires_at):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = etag
+        self.version = version
+        self.late = late
+        self.expires_at = expires_at
+
+
+def strong_etag(body):
+    """Strong validator for a response body (hash of its bytes)."""
+    return hashlib.sha256(body).hexdigest()[:32]
+
+
+class ResponseCache:
+    """LRU response cache with immutable and version-bound entries."""
+
+    def __init__(self, versions, max_entries=512, max_bytes=64 * 1024 * 1024, live_ttl=5.0):
+        """
+        Args:
+            versions: DataVersions consulted for live entries
+            max_entries: Max cached responses
+            max_bytes: Max total size of cached bodies
+            live_ttl: Max seconds a live (touches now) entry is served
+        """
+        self.versions = versions
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.live_ttl = live_ttl
+
+        self._entries = OrderedDict()  # key -> CachedResponse
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        # Counters (exposed through stats())
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def get(self, key, user_id):
+        """Cached response for `key`, or None if missing or out of date."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            current = self.versions.get(user_id) if entry.version is not None else self.versions.late(user_id)
+            if (entry.late if entry.version is None else entry.version) != current \
+                    or entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self.stale += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, user_id, body, mimetype, immutable, version=None, late=None, ttl=None):
+        """
+        Store a response body.
+
+        Args:
+            immutable: True if the range is settled (fully in the past)
+            version: User's data version read *before* the query ran (live entries)
+            late: User's late version read *before* the query ran (settled entries)
+            ttl: Seconds a settled entry is kept (default: until evicted)
+
+        Returns:
+            CachedResponse: The stored entry (also returned when too large to keep)
+        """
+        now = time.monotonic()
+        if immutable:
+            entry = CachedResponse(
+                body, mimetype, strong_etag(body), None,
+                self.versions.late(user_id) if late is None else late,
+                now + ttl if ttl is not None else float('inf')
+            )
+        else:
+            entry = CachedResponse(
+                body, mimetype, strong_etag(body),
+                self.versions.get(user_id) if version is None else version, None,
+                now + self.live_ttl
+            )
+        if len(body) > self.max_bytes // 4:
+            return entry
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+        return entry
+
+    def _remove(self, key):
+        self._bytes -= len(self._entries.pop(key).body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Size and hit counters."""
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'stale': self.stale,
+        }
+
+
+# Global instances
+data_versions = DataVersions()
+response_cache = None
+
+def get_data_versions():
+    """Get the per-user data versions of this process."""
+    return data_versions
+
+def get_response_cache():
+    """Get or create the global /history response cache."""
+    global response_cache
+    if response_cache is None:
+        response_cache = ResponseCache(
+            data_versions,
+            max_entries=Config.HISTORY_CACHE_MAX_ENTRIES,
+            max_bytes=Config.HISTORY_CACHE_MAX_BYTES,
+            live_ttl=Config.HISTORY_CACHE_LIVE_TTL
+        )
+    return response_cache
@@ -0,0 +1,218 @@
+"""
+Incrementally maintained sensor rollups (1 minute, 1 hour, 1 day).
+
+The ingest writer calls apply_rollups() with every batch it inserts, in the
+same transaction, so each rollup row always matches the raw rows it covers.
+Rollups store count/sum/min/max per metric; they merge by adding counts and
+sums and taking min/max, which is what the upsert does on conflict.
+
+Existing data is (re)built with:
+    flask --app app rollups rebuild [--since 2025-01-01]
+
+Readers only trust the rollups for ranges covered by a completed rebuild
+(sensor_rollup_state, see rollups_cover()). A rebuild also rolls up the
+cold-tier archive, and refuses to start before readings that retention may
+have dropped, since only their rollups are left.
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal, ROUND_HALF_UP
+from itertools import islice
+from zoneinfo import ZoneInfo
+from sqlalchemy import delete, func
+from models import SensorData, SensorRollup1m, SensorRollup1h, SensorRollup1d, SensorRollupState
+
+# Readings without an owner (unregistered devices) are rolled up under this id
+NIL_USER_ID = uuid.UUID(int=0)
+
+# Day buckets follow the local calendar day used by the chatbot's daily averages
+DAY_TIMEZONE = ZoneInfo('Asia/Ho_Chi_Minh')
+
+# (bucket seconds, model), finest first
+GRANULARITIES = (
+    (60, SensorRollup1m),
+    (3600, SensorRollup1h),
+    (86400, SensorRollup1d),
+)
+
+METRICS = ('temperature', 'humidity', 'co_level')
+STATE_ID = 1
+CENT = Decimal('0.01')
+
+
+def bucket_start(recorded_at, seconds):
+    """Start (UTC) of the bucket of `seconds` containing a timestamp."""
+    if recorded_at.tzinfo is None:
+        recorded_at = recorded_at.replace(tzinfo=timezone.utc)
+    if seconds == 86400:
+        local = recorded_at.astimezone(DAY_TIMEZONE)
+        return local.replace(hour=0, minute=0, second=0, microsecond=0).astimezone(timezone.utc)
+    epoch = int(recorded_at.timestamp()) // seconds * seconds
+    return datetime.fromtimestamp(epoch, timezone.utc)
+
+
+def _metric_values(reading):
+    # Same rounding as the DECIMAL(5, 2) columns, so incremental and rebuilt sums agree
+    return (
+        Decimal(str(reading['temperature'])).quantize(CENT, ROUND_HALF_UP),
+        Decimal(str(reading['humidity'])).quantize(CENT, ROUND_HALF_UP),
+        int(reading['co_level']),
+    )
+
+
+def accumulate(readings):
+    """
+    Aggregate readings into rollup rows for every granularity.
+
+    Args:
+        readings: Iterable of dicts with user_id, temperature, humidity,
+                  co_level and recorded_at
+
+    Returns:
+        dict: {model: {(user_id, bucket_start): row dict}}
+    """
+    rollups = {model: {} for _, model in GRANULARITIES}
+    for reading in readings:
+        user_id = reading.get('user_id') or NIL_USER_ID
+        values = _metric_values(reading)
+        for seconds, model in GRANULARITIES:
+            key = (user_id, bucket_start(reading['recorded_at'], seconds))
+            row = rollups[model].get(key)
+            if row is None:
+                row = rollups[model][key] = {'user_id': key[0], 'bucket_start': key[1], 'count': 0}
+                for name, value in zip(METRICS, values):
+                    row[f'{name}_sum'] = 0
+                    row[f'{name}_min'] = row[f'{name}_max'] = value
+            row['count'] += 1
+            for name, value in zip(METRICS, values):
+                row[f'{name}_sum'] += value
+                row[f'{name}_min'] = min(row[f'{name}_min'], value)
+                row[f'{name}_max'] = max(row[f'{name}_max'], value)
+    return rollups
+
+
+def _upsert(db, model, rows):
+    """INSERT ... ON CONFLICT DO UPDATE merging counts, sums, mins and maxes."""
+    if db.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        least, greatest = func.least, func.greatest
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+        least, greatest = func.min, func.max
+
+    stmt = insert(model)
+    table, excluded = model.__table__.c, stmt.excluded
+    merged = {'count': table['count'] + excluded['count']}
+    for name in METRICS:
+        merged[f'{name}_sum'] = table[f'{name}_sum'] + excluded[f'{name}_sum']
+        merged[f'{name}_min'] = least(table[f'{name}_min'], excluded[f'{name}_min'])
+        merged[f'{name}_max'] = greatest(table[f'{name}_max'], excluded[f'{name}_max'])
+    stmt = stmt.on_conflict_do_update(index_elements=['user_id', 'bucket_start'], set_=merged)
+    db.execute(stmt, rows)
+
+
+def apply_rollups(db, readings):
+    """
+    Add readings to every rollup table. Runs in the caller's transaction.
+
+    Args:
+        db: Database session
+        readings: Row dicts as inserted into sensor_data
+    """
+    for model, rows in accumulate(readings).items():
+        if rows:
+            # Stable key order keeps concurrent writers from deadlocking
+            _upsert(db, model, [rows[key] for key in sorted(rows, key=lambda k: (str(k[0]), k[1]))])
+
+
+def rebuild_rollups(db, since=None, batch_size=5000, archive=None, floor=None):
+    """
+    Recompute rollups from sensor_data and, given an archive, from archived
+    readings, from the start of the local day containing `since` (or from
+    scratch). Commits once at the end.
+
+    Args:
+        db: Database session
+        since: Optional start of the rebuild (default: everything)
+        batch_size: Raw readings per upsert batch
+        archive: Optional ReadingArchive whose readings are rolled up too
+        floor: Optional time before which raw readings may have expired
+               (dropped partitions); rebuilding below it is refused
+
+    Returns:
+        int: Number of raw readings rolled up
+
+    Raises:
+        ValueError: If the rebuild would start before `floor`
+    """
+    start = bucket_start(since, 86400) if since else None
+    if floor is not None:
+        earliest = bucket_start(floor, 86400)
+        if earliest < floor:
+            earliest += timedelta(days=1)
+        if start is None or start < earliest:
+            raise ValueError(
+                f"Raw readings before {floor.isoformat()} may have expired and their rollups "
+                f"cannot be rebuilt; rebuild since {earliest.astimezone(DAY_TIMEZONE).date()} or later"
+            )
+
+    for _, model in GRANULARITIES:
+        stmt = delete(model)
+        if start is not None:
+            stmt = stmt.where(model.bucket_start >= start)
+        db.execute(stmt)
+
+    query = db.query(
+        SensorData.user_id, SensorData.temperature, SensorData.humidity,
+        SensorData.co_level, SensorData.recorded_at
+    )
+    if start is not None:
+        query = query.filter(SensorData.recorded_at >= start)
+    rows = query.order_by(SensorData.recorded_at).yield_per(batch_size)
+    total = _roll_up_rows(db, (row._asdict() for row in rows), batch_size)
+
+    if archive is not None:
+        columns = ('recorded_at', 'temperature', 'humidity', 'co_level')
+        for user_id in archive.users():
+            rows = archive.read(user_id, start, newest_first=False, columns=columns)
+            total += _roll_up_rows(db, (dict(zip(columns, row), user_id=user_id) for row in rows), batch_size)
+
+    _record_rebuild(db, start)
+    db.commit()
+    return total
+
+
+def _roll_up_rows(db, readings, batch_size):
+    """apply_rollups() over reading dicts in chunks of batch_size."""
+    readings = iter(readings)
+    total = 0
+    while True:
+        chunk = list(islice(readings, batch_size))
+        if not chunk:
+            return total
+        apply_rollups(db, chunk)
+        total += len(chunk)
+
+
+def _as_utc(moment):
+    return moment if moment is None or moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def _record_rebuild(db, start):
+    """Extend the complete range to `start` (None: everything)."""
+    state = db.get(SensorRollupState, STATE_ID)
+    if state is None:
+        state = SensorRollupState(id=STATE_ID, complete_since=start)
+        db.add(state)
+    elif start is None or (state.complete_since is not None and start < _as_utc(state.complete_since)):
+        state.complete_since = start
+    state.rebuilt_at = datetime.now(timezone.utc)
+
+
+def rollups_cover(db, start):
+    """True if a completed rebuild makes the rollups complete from `start` on."""
+    state = db.get(SensorRollupState, STATE_ID)
+    if state is None:
+        return False
+    return state.complete_since is None or _as_utc(state.complete_since) <= start
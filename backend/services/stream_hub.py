@@ -0,0 +1,452 @@
+"""
+In-process pub/sub hub for real-time sensor streaming.
+The MQTT handler publishes each reading to its device's topic and every SSE
+connection holds a Subscription to the devices its user owns.
+"""
+
+import itertools
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from config import Config
+
+
+class StreamMessage:
+    """
+    A published reading, serialized once at ingest.
+
+    `frame` is the complete SSE event as bytes, shared by every subscriber.
+    `seq` is a monotonic sequence number used for de-duplication and replay;
+    the SSE event id is "<epoch>-<seq>", so ids from before a restart are
+    never mistaken for current ones.
+    """
+
+    __slots__ = ('seq', 'epoch', 'device_id', 'payload', 'event_id', 'frame')
+
+    def __init__(self, seq, device_id, payload, encoded=None, epoch='0', resume_seq=None):
+        """
+        Args:
+            seq: Sequence number
+            device_id: Topic the message is published on
+            payload: JSON-serializable dict
+            encoded: Pre-serialized JSON bytes of payload (computed if omitted)
+            epoch: Publisher's epoch (see StreamHub.epoch)
+            resume_seq: Sequence number in the event id, if not seq (see with_resume_seq)
+        """
+        self.seq = seq
+        self.epoch = epoch
+        self.device_id = device_id
+        self.payload = payload
+        self.event_id = f"{epoch}-{seq if resume_seq is None else resume_seq}"
+        if encoded is None:
+            encoded = json.dumps(payload).encode('utf-8')
+        self.frame = b"id: " + self.event_id.encode('ascii') + b"\ndata: " + encoded + b"\n\n"
+
+    def with_resume_seq(self, resume_seq):
+        """
+        The same message (same seq, payload not re-serialized) with an event
+        id that resumes after `resume_seq` instead of after itself.
+        """
+        encoded = self.frame[self.frame.index(b"\ndata: ") + len(b"\ndata: "):-2]
+        return StreamMessage(self.seq, self.device_id, self.payload, encoded, self.epoch, resume_seq)
+
+    @classmethod
+    def reset(cls, seq, epoch, reason):
+        """
+        Control message telling a resuming client that events it missed are
+        gone (evicted from the replay buffer, or issued before a restart), so
+        it must refetch /history. Carries the current event id to resume from.
+        """
+        return cls(seq, None, {'type': 'reset', 'reason': reason}, epoch=epoch)
+
+    def __repr__(self):
+        return f"<StreamMessage(seq={self.seq}, device={self.device_id})>"
+
+
+class StreamThrottle:
+    """
+    Per-subscriber rate limit with coalescing (/stream?max_hz=).
+
+    At most one message per (device, kind) is passed through every
+    1/max_hz seconds; messages arriving inside the window replace the one
+    held for that key, so the newest value is sent when the window closes.
+    A reading whose is_hazardous differs from the device's previous reading
+    (a hazard transition) is always passed through immediately.
+    """
+
+    def __init__(self, max_hz):
+        self.interval = 1.0 / max_hz
+        self.coalesced = 0
+        self._last_sent = {}  # (device_id, kind) -> monotonic time
+        self._held = {}  # (device_id, kind) -> newest StreamMessage inside the window
+        self._hazardous = {}  # device_id -> is_hazardous of the last reading seen
+
+    @staticmethod
+    def _key(message):
+        payload = message.payload
+        kind = payload.get('type', 'reading') if isinstance(payload, dict) else 'reading'
+        return message.device_id, kind
+
+    def _is_hazard_transition(self, message):
+        payload = message.payload
+        if not isinstance(payload, dict) or 'is_hazardous' not in payload:
+            return False
+        hazardous = bool(payload['is_hazardous'])
+        previous = self._hazardous.get(message.device_id, hazardous)
+        self._hazardous[message.device_id] = hazardous
+        return hazardous != previous
+
+    def admit(self, message, now):
+        """
+        Returns:
+            (send_now, newly_held): send_now if the message goes out now;
+            newly_held if it opened a held slot (the consumer must wake up
+            to schedule the end of that window)
+        """
+        key = self._key(message)
+        if self._is_hazard_transition(message) or now - self._last_sent.get(key, float('-inf')) >= self.interval:
+            self._held.pop(key, None)  # Superseded by this newer message
+            self._last_sent[key] = now
+            return True, False
+        newly_held = key not in self._held
+        if not newly_held:
+            self.coalesced += 1
+        self._held[key] = message
+        return False, newly_held
+
+    def due(self, now):
+        """Remove and return held messages whose window has closed."""
+        ready = [key for key in self._held if now - self._last_sent[key] >= self.interval]
+        for key in ready:
+            self._last_sent[key] = now
+        return [self._held.pop(key) for key in ready]
+
+    def oldest_held(self):
+        """Held message with the lowest seq (None if nothing is held)."""
+        return min(self._held.values(), key=lambda m: m.seq, default=None)
+
+    def next_due(self, now):
+        """Seconds until the next held message is due (None if nothing is held)."""
+        if not self._held:
+            return None
+        return max(0.0, min(self._last_sent[key] for key in self._held) + self.interval - now)
+
+
+def parse_max_hz(value):
+    """
+    Parse a ?max_hz= query value.
+
+    Returns:
+        float | None: None when not given (unlimited)
+
+    Raises:
+        ValueError: If the value is not a positive number
+    """
+    if value in (None, ''):
+        return None
+    try:
+        max_hz = float(value)
+    except (TypeError, ValueError):
+        max_hz = 0.0
+    if not 0 < max_hz < float('inf'):
+        raise ValueError('max_hz must be a positive number')
+    return max_hz
+
+
+class Subscription:
+    """
+    A subscriber's bounded message queue.
+
+    When the queue is full the oldest message is dropped (slow clients lose
+    stale readings, never block the publisher). With a StreamThrottle,
+    messages inside a rate-limit window are held (newest wins) and released
+    by drain() once the window closes. While a message is held, the event
+    ids sent never move past it, so a client resuming with Last-Event-ID
+    gets it replayed (along with some events it already saw) instead of
+    losing it.
+    """
+
+    def __init__(self, hub, device_ids, max_queue, throttle=None):
+        self.hub = hub
+        self.device_ids = frozenset(device_ids)
+        self.max_queue = max_queue
+        self.throttle = throttle
+        self.dropped = 0
+        self.last_seq = 0  # Highest seq returned to the consumer
+        self.last_epoch = None  # Epoch of last_seq (seq restarts when the publisher restarts)
+        self._queue = deque()
+        self._replay = []  # Missed messages for a resume, unbounded and ahead of the queue
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+
+    def deliver(self, message):
+        """Called by the hub from the publisher's thread."""
+        with self._lock:
+            if self.throttle is not None:
+                send_now, newly_held = self.throttle.admit(message, time.monotonic())
+                if not send_now:
+                    if newly_held:
+                        self._wake()
+                    return
+            if len(self._queue) >= self.max_queue:
+                self._queue.popleft()
+                self.dropped += 1
+            self._queue.append(message)
+        self._wake()
+
+    def replay(self, messages):
+        """
+        Queue missed messages ahead of live ones, bypassing the queue bound
+        and the throttle so a resume never loses part of what it asked for.
+        """
+        with self._lock:
+            self._replay.extend(messages)
+        self._wake()
+
+    def _wake(self):
+        self._event.set()
+
+    def _wait_timeout(self, timeout):
+        """Shorten a wait so held (rate-limited) messages go out when their window closes."""
+        if self.throttle is None:
+            return timeout
+        with self._lock:
+            next_due = self.throttle.next_due(time.monotonic())
+        if next_due is None:
+            return timeout
+        return next_due if timeout is None else min(timeout, next_due)
+
+    def drain(self):
+        """Return and remove every queued message not seen before (non-blocking)."""
+        with self._lock:
+            messages = self._replay + list(self._queue)
+            self._replay = []
+            self._queue.clear()
+            self._event.clear()
+            released = self.throttle.due(time.monotonic()) if self.throttle is not None else []
+            held = self.throttle.oldest_held() if self.throttle is not None else None
+        # De-duplicate by sequence number instead of comparing payloads
+        fresh = []
+        for message in messages:
+            if message.epoch != self.last_epoch:
+                self.last_epoch, self.last_seq = message.epoch, 0
+            if message.seq > self.last_seq or message.device_id is None:  # Control messages always pass
+                self.last_seq = max(self.last_seq, message.seq)
+                fresh.append(message)
+        if self.throttle is None:
+            return fresh
+        if released:
+            for message in released:
+                if message.epoch == self.last_epoch:
+                    self.last_seq = max(self.last_seq, message.seq)
+            # Held messages are older than the window's last send; keep publish order
+            fresh = sorted(fresh + released, key=lambda m: m.seq)
+        # Newer messages must not carry the client's resume point past one still held
+        if held is not None and held.epoch == self.last_epoch:
+            fresh = [m.with_resume_seq(held.seq - 1) if m.epoch == held.epoch and m.seq >= held.seq else m
+                     for m in fresh]
+        return fresh
+
+    def get(self, timeout=None):
+        """
+        Wait up to `timeout` seconds for messages.
+
+        Returns:
+            list[StreamMessage]: Queued messages, oldest first (empty on timeout)
+        """
+        self._event.wait(self._wait_timeout(timeout))
+        return self.drain()
+
+    def close(self):
+        """Unsubscribe from the hub."""
+        self.hub.unsubscribe(self)
+
+
+class StreamHub:
+    """
+    Fan-out of messages to subscribers by device topic.
+
+    Topics map to immutable tuples of subscribers that are rebuilt on
+    (un)subscribe, so publish() only touches the subscribers of that device
+    and never waits on (un)subscribers.
+
+    Each device also keeps a ring buffer of its last `replay_size` messages,
+    so a reconnecting client (SSE Last-Event-ID) gets exactly the messages it
+    missed from memory. When some of them are no longer buffered the client
+    gets a reset message instead.
+    """
+
+    def __init__(self, max_queue=100, replay_size=50, max_replay_devices=20000):
+        """
+        Args:
+            max_queue: Default per-subscriber queue bound
+            replay_size: Messages kept per device for Last-Event-ID replay (0 disables)
+            max_replay_devices: Max devices with a replay buffer (least recently published evicted)
+        """
+        self.max_queue = max_queue
+        self.replay_size = replay_size
+        self.max_replay_devices = max_replay_devices
+        self.epoch = format(int(time.time() * 1000), 'x')
+        self._topics = {}  # device_id -> tuple(Subscription)
+        self._history = OrderedDict()  # device_id -> deque(StreamMessage), LRU order
+        self._evicted = {}  # device_id -> newest seq pushed out of its ring buffer
+        self._forgotten = 0  # Newest seq of a message not buffered for any device (buffer dropped, replay off)
+        self._last_seq = 0  # Newest seq published
+        self._lock = threading.Lock()
+        self._publish_lock = threading.Lock()  # Keeps seq order == delivery order across publisher threads
+        self._seq = itertools.count(1)
+        self.published = 0
+        self.replayed = 0
+        self.resets = 0
+
+    def parse_event_id(self, event_id):
+        """
+        Sequence number of an event id issued by this hub.
+
+        Returns:
+            int | None: None if the id is malformed or from another epoch (e.g. before a restart)
+        """
+        epoch, _, seq = (event_id or '').strip().rpartition('-')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def subscribe(self, device_ids, max_queue=None, subscription_class=Subscription, last_event_id=None,
+                  max_hz=None):
+        """
+        Subscribe to the given devices.
+
+        Args:
+            device_ids: Devices whose readings this subscriber may receive
+            max_queue: Per-subscriber queue bound (defaults to the hub's)
+            subscription_class: Subscription type (e.g. an asyncio-aware subclass)
+            last_event_id: Last event id the client saw; buffered messages after
+                           it are queued on the subscription before live ones,
+                           or a reset message if some were already evicted
+            max_hz: Max messages per second per device and kind (None = unlimited)
+        """
+        throttle = StreamThrottle(max_hz) if max_hz else None
+        subscription = subscription_class(self, device_ids, max_queue or self.max_queue, throttle)
+        after_seq = self.parse_event_id(last_event_id) if last_event_id else None
+
+        # Holding the publish lock while registering makes replay + live gapless
+        with self._publish_lock:
+            with self._lock:
+                for device_id in subscription.device_ids:
+                    self._topics[device_id] = self._topics.get(device_id, ()) + (subscription,)
+            if last_event_id and (after_seq is None or self._has_gap(subscription.device_ids, after_seq)):
+                reason = 'unknown_event_id' if after_seq is None else 'replay_evicted'
+                subscription.replay([StreamMessage.reset(self._last_seq, self.epoch, reason)])
+                self.resets += 1
+            elif after_seq is not None:
+                missed = sorted(
+                    (m for device_id in subscription.device_ids
+                     for m in self._history.get(device_id, ()) if m.seq > after_seq),
+                    key=lambda m: m.seq
+                )
+                subscription.replay(missed)
+                self.replayed += len(missed)
+        return subscription
+
+    def _has_gap(self, device_ids, after_seq):
+        """True if a message after `after_seq` may be missing from the buffers (caller holds the publish lock)."""
+        for device_id in device_ids:
+            if device_id in self._history:
+                if self._evicted.get(device_id, 0) > after_seq:
+                    return True
+            elif self._forgotten > after_seq:
+                return True
+        return False
+
+    def unsubscribe(self, subscription):
+        """Remove a subscription from all of its topics."""
+        with self._lock:
+            for device_id in subscription.device_ids:
+                remaining = tuple(s for s in self._topics.get(device_id, ()) if s is not subscription)
+                if remaining:
+                    self._topics[device_id] = remaining
+                else:
+                    self._topics.pop(device_id, None)
+
+    def publish(self, device_id, payload, seq=None, epoch=None):
+        """
+        Serialize a payload once and deliver it to every subscriber of device_id.
+
+        Args:
+            device_id: Topic to publish on
+            payload: JSON-serializable message
+            seq: Publisher-assigned sequence number (messages relayed from
+                 another process keep the ingest process's ids)
+            epoch: Publisher's epoch, required with seq
+
+        Returns:
+            StreamMessage: The published message
+        """
+        encoded = json.dumps(payload).encode('utf-8')
+        with self._publish_lock:
+            if seq is None:
+                seq = next(self._seq)
+            elif epoch != self.epoch:
+                # Mirror the remote publisher; buffered ids from its previous epoch are meaningless
+                self.epoch = epoch
+                self._history.clear()
+                self._evicted.clear()
+                self._forgotten = 0
+            message = StreamMessage(seq, device_id, payload, encoded, self.epoch)
+            self.published += 1
+            self._last_seq = seq
+            if self.replay_size:
+                self._remember(message)
+            else:
+                self._forgotten = seq
+            for subscription in self._topics.get(device_id, ()):
+                subscription.deliver(message)
+        return message
+
+    def _remember(self, message):
+        """Append to the device's ring buffer (caller holds the publish lock)."""
+        history = self._history.get(message.device_id)
+        if history is None:
+            history = self._history[message.device_id] = deque(maxlen=self.replay_size)
+            while len(self._history) > self.max_replay_devices:
+                device_id, dropped = self._history.popitem(last=False)
+                self._evicted.pop(device_id, None)
+                self._forgotten = max(self._forgotten, dropped[-1].seq)
+        else:
+            self._history.move_to_end(message.device_id)
+            if len(history) == history.maxlen:
+                self._evicted[message.device_id] = history[0].seq
+        history.append(message)
+
+    def subscriber_count(self, device_id=None):
+        """Subscribers of one device, or distinct subscribers overall."""
+        if device_id is not None:
+            return len(self._topics.get(device_id, ()))
+        return len({id(s) for subs in list(self._topics.values()) for s in subs})
+
+    def stats(self):
+        """Topic and subscriber counts."""
+        return {
+            'topics': len(self._topics),
+            'subscribers': self.subscriber_count(),
+            'published': self.published,
+            'replay_devices': len(self._history),
+            'replayed': self.replayed,
+            'resets': self.resets
+        }
+
+
+# Global stream hub instance
+stream_hub = None
+
+def get_stream_hub():
+    """Get or create the global stream hub."""
+    global stream_hub
+    if stream_hub is None:
+        stream_hub = StreamHub(
+            max_queue=Config.STREAM_SUBSCRIBER_QUEUE_SIZE,
+            replay_size=Config.STREAM_REPLAY_BUFFER_SIZE,
+            max_replay_devices=Config.INGEST_MAX_DEVICES
+        )
+    return stream_hub
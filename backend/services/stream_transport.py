@@ -0,0 +1,259 @@
+"""
+Fan-out transports between the ingest process and the web processes.
+
+The MQTT handler publishes every stream message through a transport instead
+of straight into the local StreamHub:
+
+    local:    deliver to this process's hub (single-process deployments)
+    postgres: NOTIFY on a channel; every process (the ingest process
+              included) LISTENs and feeds its own hub, so any number of web
+              workers can serve /stream
+
+Select one with STREAM_TRANSPORT; new backends register in TRANSPORTS.
+"""
+
+import itertools
+import json
+import os
+import queue
+import select
+import threading
+import time
+from config import Config
+from services.stream_hub import get_stream_hub
+
+
+class LocalTransport:
+    """In-process transport: publish() goes straight to the hub."""
+
+    name = 'local'
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    def publish(self, device_id, payload):
+        self.hub.publish(device_id, payload)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def stats(self):
+        return {'transport': self.name}
+
+
+class PostgresTransport:
+    """
+    Cross-process fan-out over Postgres LISTEN/NOTIFY.
+
+    publish() assigns the sequence number (so every process hands out the
+    same SSE event ids) and queues the message; a sender thread packs queued
+    messages into as few NOTIFY payloads as fit Postgres' 8000-byte limit.
+    A listener thread LISTENs on the channel and publishes what it receives
+    into the local hub, reconnecting with backoff if the connection drops.
+    """
+
+    name = 'postgres'
+
+    # NOTIFY payloads must be shorter than 8000 bytes
+    MAX_PAYLOAD_BYTES = 7900
+
+    def __init__(self, hub, dsn, channel='ecs_stream', max_pending=10000):
+        """
+        Args:
+            hub: Local StreamHub fed by the listener
+            dsn: libpq connection string / URL of the Postgres database
+            channel: NOTIFY channel name
+            max_pending: Max messages waiting to be sent; new ones are dropped when full
+        """
+        self.hub = hub
+        self.dsn = dsn
+        self.channel = channel
+        self.epoch = format(int(time.time() * 1000), 'x')
+        self._seq = itertools.count(1)
+        self._seq_lock = threading.Lock()
+        self._outbox = queue.Queue(maxsize=max_pending)
+        self._stopping = threading.Event()
+        self._threads = []
+        self._pid = None  # Process that started the threads (they do not survive a fork)
+        self._start_lock = threading.Lock()
+
+        # Counters (exposed through stats())
+        self.sent = 0
+        self.notifies = 0
+        self.dropped = 0
+        self.received = 0
+        self.reconnects = 0
+
+    def publish(self, device_id, payload):
+        """Queue a message for NOTIFY. Never blocks on the database."""
+        with self._seq_lock:
+            # Sequence order == outbox order, so ids stay monotonic on the wire
+            envelope = json.dumps({'d': device_id, 's': next(self._seq), 'p': payload})
+            try:
+                self._outbox.put_nowait(envelope)
+            except queue.Full:
+                self.dropped += 1
+
+    def _connect(self):
+        import psycopg2
+        conn = psycopg2.connect(self.dsn)
+        conn.autocommit = True
+        return conn
+
+    @classmethod
+    def pack(cls, envelopes, epoch):
+        """
+        Group JSON envelopes into NOTIFY payloads under MAX_PAYLOAD_BYTES.
+
+        Payload format: {"e": epoch, "m": [envelope, ...]}
+        """
+        prefix = '{"e": %s, "m": [' % json.dumps(epoch)
+        payloads, current, size = [], [], len(prefix) + 2
+        for envelope in envelopes:
+            length = len(envelope.encode('utf-8')) + 2
+            if len(prefix) + 2 + length > cls.MAX_PAYLOAD_BYTES:
+                print(f"⚠️  Stream message too large for NOTIFY ({length} bytes), dropped")
+                continue
+            if current and size + length > cls.MAX_PAYLOAD_BYTES:
+                payloads.append(prefix + ', '.join(current) + ']}')
+                current, size = [], len(prefix) + 2
+            current.append(envelope)
+            size += length
+        if current:
+            payloads.append(prefix + ', '.join(current) + ']}')
+        return payloads
+
+    def _send_loop(self):
+        conn = None
+        while not self._stopping.is_set():
+            try:
+                envelopes = [self._outbox.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            while True:
+                try:
+                    envelopes.append(self._outbox.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                if conn is None or conn.closed:
+                    conn = self._connect()
+                with conn.cursor() as cursor:
+                    for payload in self.pack(envelopes, self.epoch):
+                        cursor.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+                        self.notifies += 1
+                self.sent += len(envelopes)
+            except Exception as e:
+                print(f"✗ Error sending {len(envelopes)} stream messages over NOTIFY: {e}")
+                self.dropped += len(envelopes)
+                conn = None
+                self._stopping.wait(1.0)
+
+    def handle_notification(self, payload):
+        """Publish the messages of one NOTIFY payload into the local hub."""
+        data = json.loads(payload)
+        epoch = data['e']
+        for envelope in data['m']:
+            self.hub.publish(envelope['d'], envelope['p'], seq=envelope['s'], epoch=epoch)
+            self.received += 1
+
+    def _listen_loop(self):
+        backoff = 1.0
+        while not self._stopping.is_set():
+            try:
+                conn = self._connect()
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{self.channel}"')
+                print(f"✓ Listening for stream messages on Postgres channel '{self.channel}'")
+                backoff = 1.0
+                while not self._stopping.is_set():
+                    if select.select([conn], [], [], 5.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        try:
+                            self.handle_notification(notify.payload)
+                        except (ValueError, KeyError) as e:
+                            print(f"⚠️  Ignoring malformed stream notification: {e}")
+                conn.close()
+            except Exception as e:
+                print(f"✗ Stream listener error: {e}. Reconnecting in {backoff:.0f}s")
+                self.reconnects += 1
+                self._stopping.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    def start(self):
+        """
+        Start the sender and listener threads in this process. Cheap to call
+        repeatedly; a forked worker starts its own threads on first use.
+        """
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # Forked after start(): the parent's threads and queued messages stay behind
+                self._outbox = queue.Queue(maxsize=self._outbox.maxsize)
+                self._threads = []
+            self._stopping.clear()
+            for target, name in ((self._send_loop, 'stream-notify'), (self._listen_loop, 'stream-listen')):
+                thread = threading.Thread(target=target, name=name, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._pid = os.getpid()
+
+    def stop(self):
+        """Stop both threads. Unsent messages are discarded."""
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout=6)
+        self._threads = []
+        self._pid = None
+
+    def stats(self):
+        """Send/receive counters."""
+        return {
+            'transport': self.name,
+            'channel': self.channel,
+            'pending': self._outbox.qsize(),
+            'sent': self.sent,
+            'notifies': self.notifies,
+            'dropped': self.dropped,
+            'received': self.received,
+            'reconnects': self.reconnects,
+        }
+
+
+TRANSPORTS = {
+    LocalTransport.name: lambda hub: LocalTransport(hub),
+    PostgresTransport.name: lambda hub: PostgresTransport(
+        hub, _libpq_dsn(Config.DATABASE_URL), channel=Config.STREAM_PG_CHANNEL
+    ),
+}
+
+
+def _libpq_dsn(database_url):
+    """Strip the SQLAlchemy driver suffix (postgresql+psycopg2:// -> postgresql://)."""
+    scheme, sep, rest = database_url.partition('://')
+    return scheme.split('+')[0] + sep + rest
+
+
+# Global stream transport instance
+stream_transport = None
+
+def get_stream_transport():
+    """Get or create the global stream transport (STREAM_TRANSPORT)."""
+    global stream_transport
+    if stream_transport is None:
+        factory = TRANSPORTS.get(Config.STREAM_TRANSPORT)
+        if factory is None:
+            print(f"⚠️  Unknown STREAM_TRANSPORT '{Config.STREAM_TRANSPORT}', using 'local'")
+            factory = TRANSPORTS[LocalTransport.name]
+        stream_transport = factory(get_stream_hub())
+    return stream_transport
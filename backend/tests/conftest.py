@@ -1,13 +1,18 @@
 import pytest
 import sys
 import os
+import uuid
 from unittest.mock import MagicMock
 
 # Add backend directory to path so we can import from app, models, etc.
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from flask import Flask
 from app import create_app
 from config import Config
+from models.database import db
+
+TEST_USER_ID = uuid.UUID('5f0c7a52-8f0e-4d55-9a43-0f6f0d3c8f11')
 
 @pytest.fixture
 def app():
@@ -30,6 +35,36 @@ def runner(app):
     """A test runner for the app's CLI commands."""
     return app.test_cli_runner()
 
+@pytest.fixture
+def make_sqlite_app():
+    """
+    Factory of minimal Flask apps backed by in-memory SQLite (schema created,
+    dropped again after the test). Call it with the blueprints to register;
+    seed rows inside `with app.app_context():` through `db.session`.
+    """
+    apps = []
+    
+    def make(*blueprints):
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(app)
+        for blueprint in blueprints:
+            app.register_blueprint(blueprint)
+        with app.app_context():
+            db.create_all()
+        apps.append(app)
+        return app
+    
+    yield make
+    for app in apps:
+        with app.app_context():
+            db.drop_all()
+
+@pytest.fixture
+def sqlite_app(make_sqlite_app):
+    """Minimal Flask app backed by in-memory SQLite."""
+    return make_sqlite_app()
+
 @pytest.fixture
 def mock_db_session(mocker):
     """Mock the database session."""
@@ -54,7 +89,7 @@ def mock_db_session(mocker):
     
     # Patch get_db in the modules where it's used
     mocker.patch('api.sensor_routes.get_db', return_value=mock_session)
-    mocker.patch('mqtt.client.get_db', return_value=mock_session)
+    mocker.patch('mqtt.ingest_queue.get_db', return_value=mock_session)
     
     return mock_session
 
@@ -75,12 +110,11 @@ def mock_ai_service(mocker):
 
 @pytest.fixture(autouse=True)
 def mock_supabase(mocker):
-    """Mock Supabase client for all tests."""
+    """Mock the Supabase Auth client for all tests (any bearer token is valid)."""
     mock_client = MagicMock()
-    mock_user = MagicMock()
-    mock_client.auth.get_user.return_value = mock_user
+    mock_client.verify.return_value = {'id': TEST_USER_ID, 'email': 'test@example.com'}
     
-    # Patch get_supabase_client in middleware
-    mocker.patch('api.middleware.get_supabase_client', return_value=mock_client)
+    # Patch the remote verifier used by middleware (no JWKS/secret configured in tests)
+    mocker.patch('api.middleware.get_remote_verifier', return_value=mock_client)
     
     return mock_client
@@ -1,8 +1,10 @@
+import uuid
 import pytest
 from tests.schemas import AIResponse, ErrorResponse
 
 # Auth header for tests
 AUTH_HEADER = {'Authorization': 'Bearer test_token'}
+USER_ID = uuid.UUID('5f0c7a52-8f0e-4d55-9a43-0f6f0d3c8f11')
 
 def test_predict_success(client, mock_ai_service):
     """Test AI prediction endpoint success."""
@@ -32,3 +34,33 @@ def test_predict_no_data(client):
     response = client.post('/ai/predict', json={}, headers=AUTH_HEADER)
     assert response.status_code == 400
     ErrorResponse(**response.json)
+
+def test_predict_batch_success(client, mocker):
+    """Test batch prediction returns one result per sample in input order."""
+    mocker.patch('api.middleware.verify_token', return_value={'id': USER_ID})
+    predict_batch = mocker.patch(
+        'api.ai_routes.AIPredictionService.predict_batch',
+        return_value=[{'status': 'success', 'recommended_action': 'normal'}] * 2
+    )
+    sample = {'temperature_C': 30, 'humidity_%': 60, 'CO_ppm': 10, 'action': 'normal'}
+    
+    response = client.post('/ai/predict/batch', json={'samples': [sample, sample]}, headers=AUTH_HEADER)
+    
+    assert response.status_code == 200
+    assert response.json['count'] == 2
+    predict_batch.assert_called_once_with([sample, sample])
+
+def test_predict_batch_missing_fields(client, mocker):
+    """Test batch prediction with a sample missing required fields."""
+    mocker.patch('api.middleware.verify_token', return_value={'id': USER_ID})
+    response = client.post('/ai/predict/batch', json={'samples': [{'temperature_C': 30}]}, headers=AUTH_HEADER)
+    assert response.status_code == 400
+    ErrorResponse(**response.json)
+
+def test_predict_batch_rejects_scalar_columns(client, mocker):
+    """Test batch prediction with a column that is not an array."""
+    mocker.patch('api.middleware.verify_token', return_value={'id': USER_ID})
+    columns = {'temperature_C': 30, 'humidity_%': [60], 'CO_ppm': [10], 'action': ['normal']}
+    response = client.post('/ai/predict/batch', json={'columns': columns}, headers=AUTH_HEADER)
+    assert response.status_code == 400
+    ErrorResponse(**response.json)
@@ -0,0 +1,156 @@
+import random
+import numpy as np
+import pytest
+from services.ai_prediction_service import AIPredictionService
+from services.numpy_inference import NumpyInferenceEngine, SklearnInferenceEngine
+from services.prediction_cache import PredictionCache
+
+
+@pytest.fixture(scope='module')
+def samples():
+    AIPredictionService._load_models()
+    rng = random.Random(0)
+    actions = list(AIPredictionService._engine.classes_)
+    return [{
+        'temperature_C': rng.uniform(15, 40),
+        'humidity_%': rng.uniform(20, 90),
+        'CO_ppm': rng.uniform(0, 120),
+        'action': rng.choice(actions)
+    } for _ in range(50)]
+
+
+def test_predict_batch_matches_single_predictions(samples):
+    """Batch results are identical to per-sample predictions, in input order."""
+    batch = AIPredictionService.predict_batch(samples)
+
+    assert len(batch) == len(samples)
+    for sample, result in zip(samples, batch):
+        assert result == AIPredictionService.prediction(sample)
+
+
+def test_predict_batch_accepts_columnar_input(samples):
+    """Dict-of-columns and (N, 4) array inputs give the same results as a list of dicts."""
+    expected = AIPredictionService.predict_batch(samples)
+    columns = {field: [s[field] for s in samples] for field in samples[0]}
+    rows = [[s['temperature_C'], s['humidity_%'], s['CO_ppm'], s['action']] for s in samples]
+
+    assert AIPredictionService.predict_batch(columns) == expected
+    assert AIPredictionService.predict_batch(rows) == expected
+
+
+def test_predict_batch_unknown_action_only_fails_that_sample(samples):
+    """An unrecognized action yields an error for that sample only."""
+    bad = dict(samples[0], action='dance')
+    results = AIPredictionService.predict_batch([samples[1], bad, samples[2]])
+
+    assert results[0]['status'] == 'success'
+    assert results[1]['status'] == 'error'
+    assert results[2]['status'] == 'success'
+
+
+def test_predict_batch_rejects_malformed_input():
+    """Missing fields, scalar or ragged columns raise ValueError from the batch API."""
+    with pytest.raises(ValueError):
+        AIPredictionService.predict_batch([{'temperature_C': 20}])
+    with pytest.raises(ValueError):
+        AIPredictionService.predict_batch({'temperature_C': 20, 'humidity_%': [60], 'CO_ppm': [1], 'action': ['normal']})
+    with pytest.raises(ValueError):
+        AIPredictionService.predict_batch({'temperature_C': [20, 21], 'humidity_%': [60], 'CO_ppm': [1],
+                                           'action': ['normal']})
+
+
+def test_numpy_engine_matches_sklearn_pickles():
+    """The folded NumPy bundle reproduces the original sklearn pipeline."""
+    numpy_engine = NumpyInferenceEngine.load()
+    sklearn_engine = SklearnInferenceEngine()
+    rng = np.random.default_rng(42)
+    features = np.column_stack([
+        rng.uniform(10, 45, 2000),
+        rng.uniform(10, 95, 2000),
+        rng.uniform(0, 500, 2000),
+        rng.integers(0, len(sklearn_engine.classes_), 2000),
+    ])
+
+    env_numpy, actions_numpy = numpy_engine.predict(features)
+    env_sklearn, actions_sklearn = sklearn_engine.predict(features)
+
+    np.testing.assert_allclose(env_numpy, env_sklearn, rtol=0, atol=1e-9)
+    np.testing.assert_array_equal(actions_numpy, actions_sklearn)
+    np.testing.assert_array_equal(numpy_engine.classes_, sklearn_engine.classes_)
+    np.testing.assert_array_equal(
+        numpy_engine.encode_actions(sklearn_engine.classes_),
+        sklearn_engine.encode_actions(sklearn_engine.classes_)
+    )
+
+
+def test_numpy_engine_mmap_matches_in_memory(tmp_path):
+    """Memory-mapped weights are read-only and give the same predictions."""
+    bundle = tmp_path / 'bundle.npz'
+    bundle.write_bytes(open(AIPredictionService.bundle_path, 'rb').read())
+    features = np.array([[25.0, 60.0, 10.0, 0], [35.0, 80.0, 300.0, 2]])
+
+    in_memory = NumpyInferenceEngine.load(str(bundle))
+    mapped = NumpyInferenceEngine.load(str(bundle), mmap=True)
+
+    assert isinstance(mapped._reg_layers[0][0].base, np.memmap)
+    assert not mapped._reg_layers[0][0].flags.writeable
+    np.testing.assert_array_equal(mapped.predict(features)[0], in_memory.predict(features)[0])
+    np.testing.assert_array_equal(mapped.predict(features)[1], in_memory.predict(features)[1])
+
+
+def test_load_models_is_thread_safe(mocker):
+    """Concurrent first predictions load the models exactly once."""
+    import threading
+    import time
+
+    def slow_load(*args, **kwargs):
+        time.sleep(0.05)  # Keep the other threads waiting on the lock
+        return mocker.Mock(name='engine')
+
+    for attribute in ('_engine', '_engine_name', '_load_seconds', '_load_error', '_cache'):
+        mocker.patch.object(AIPredictionService, attribute, None)
+    mocker.patch.object(AIPredictionService, 'bundle_path', __file__)
+    mocker.patch('services.ai_prediction_service.Config.AI_ENGINE', 'numpy')
+    load = mocker.patch('services.ai_prediction_service.NumpyInferenceEngine.load', side_effect=slow_load)
+
+    threads = [threading.Thread(target=AIPredictionService._load_models) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert load.call_count == 1
+    assert AIPredictionService.status()['models_loaded'] is True
+
+
+def test_prediction_cache_quantizes_inputs(samples, mocker):
+    """Inputs within the same bucket reuse the cached result; model reload clears it."""
+    cache = PredictionCache(resolution=(0.1, 0.5, 1.0), max_entries=100)
+    mocker.patch.object(AIPredictionService, '_cache', cache)
+    predict = mocker.spy(AIPredictionService._engine, 'predict')
+    sample = dict(samples[0], temperature_C=25.01, **{'humidity_%': 60.02, 'CO_ppm': 10.2})
+    nearby = dict(sample, temperature_C=25.03, **{'humidity_%': 60.1, 'CO_ppm': 10.4})
+
+    first = AIPredictionService.prediction(sample)
+    second = AIPredictionService.prediction(nearby)
+    AIPredictionService.prediction(dict(nearby, action='normal' if sample['action'] != 'normal' else 'high_temp_turn_on_AC'))
+
+    assert first == second
+    assert predict.call_count == 2  # Different action is a separate entry
+    assert cache.stats()['hits'] == 1
+
+    AIPredictionService.reload_models()
+    assert cache.stats()['size'] == 0
+
+
+def test_prediction_cache_is_bounded():
+    """The cache evicts the least recently used entries."""
+    cache = PredictionCache(resolution=(1, 1, 1), max_entries=2)
+    keys = cache.make_keys(np.array([[1, 1, 1], [2, 2, 2], [3, 3, 3]]), np.array(['normal'] * 3))
+    result = {'status': 'success', 'future_environment': {}}
+
+    cache.put_many(keys[:2], [result, result])
+    cache.get_many([keys[0]])
+    cache.put_many(keys[2:], [result])
+
+    assert cache.get_many(keys) == [result, None, result]
@@ -1,3 +1,4 @@
+from datetime import datetime
 import pytest
 from tests.schemas import HealthResponse, HistoryResponse, CurrentReadingResponse, ControlResponse, ErrorResponse
 
@@ -16,28 +17,23 @@ def test_health_check(client):
 
 def test_get_history_success(client, mock_db_session):
     """Test retrieving history successfully."""
-    # Mock database response
-    mock_record = MagicMock()
-    mock_record.to_dict.return_value = {
-        'id': 1,
-        'user_id': None,
-        'recorded_at': '2023-01-01T12:00:00',
-        'temperature': 25.0,
-        'humidity': 50.0,
-        'co_level': 5
-    }
-    
-    # Configure mock session to return list of records
-    mock_db_session.query.return_value.order_by.return_value.limit.return_value.all.return_value = [mock_record]
+    # Mock database response: Core rows in READ_COLUMNS order
+    mock_db_session.execute.return_value = [
+        (1, None, datetime(2023, 1, 1, 12, 0), 25.0, 50.0, 5)
+    ]
     
     response = client.get('/history?limit=10', headers=AUTH_HEADER)
     assert response.status_code == 200
     
     # Validate schema
     HistoryResponse(**response.json)
+    assert response.json['count'] == 1
+    assert response.json['data'][0]['recorded_at'] == '2023-01-01T12:00:00'
     
     # Verify DB was queried correctly
-    mock_db_session.query.assert_called()
+    mock_db_session.execute.assert_called_once()
+    statement = mock_db_session.execute.call_args[0][0]
+    assert statement.compile().params['param_1'] == 10
 
 def test_get_history_unauthorized(client):
     """Test retrieving history without token."""
@@ -0,0 +1,164 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+import pytest
+from api import sensor_bp
+from models import SensorData, SensorRollup1d
+from models.database import db
+from services.archive import ReadingArchive, archive_readings, merge_readings
+from services.response_cache import get_response_cache
+from services.rollups import rebuild_rollups
+
+pytest.importorskip('pyarrow')
+
+USER_ID = uuid.UUID('5f0c7a52-8f0e-4d55-9a43-0f6f0d3c8f11')
+OTHER_ID = uuid.UUID('9b1e2c3d-4f5a-4b6c-8d7e-0f1a2b3c4d5e')
+AUTH_HEADER = {'Authorization': 'Bearer test_token'}
+# 48 hourly readings from Jan 31 to Feb 1: the first 24 are in January
+BASE_TIME = datetime(2025, 1, 31, tzinfo=timezone.utc)
+NOW = datetime(2025, 2, 10, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return ReadingArchive(str(tmp_path / 'archive'), row_group_size=5)
+
+
+@pytest.fixture
+def app(mocker, make_sqlite_app, archive):
+    """Sensor routes on in-memory SQLite; January readings moved to the archive."""
+    mocker.patch('api.middleware.verify_token', return_value={'id': USER_ID})
+    mocker.patch('api.sensor_routes.get_archive', return_value=archive)
+    app = make_sqlite_app(sensor_bp)
+    with app.app_context():
+        for i in range(48):
+            db.session.add(SensorData(
+                user_id=USER_ID, temperature=20 + i, humidity=50, co_level=i,
+                recorded_at=BASE_TIME + timedelta(hours=i)
+            ))
+        db.session.add(SensorData(user_id=OTHER_ID, temperature=99, humidity=1, co_level=1, recorded_at=BASE_TIME))
+        db.session.commit()
+        archive_readings(db.session, archive, older_than_days=5, now=NOW)
+    get_response_cache().clear()
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def test_archive_moves_whole_months_per_user(app, archive, tmp_path):
+    with app.app_context():
+        live = db.session.query(SensorData.co_level).filter(SensorData.user_id == USER_ID).all()
+
+    assert sorted(co for co, in live) == list(range(24, 48))
+    assert (tmp_path / 'archive' / str(USER_ID) / '2025-01.parquet').exists()
+    assert (tmp_path / 'archive' / str(OTHER_ID) / '2025-01.parquet').exists()
+    assert archive.count(USER_ID) == 24
+    assert [row[4] for row in archive.read(USER_ID, newest_first=False)] == list(range(24))
+
+
+def test_rerun_archives_nothing_new(app, archive):
+    with app.app_context():
+        _, total = archive_readings(db.session, archive, older_than_days=5, now=NOW)
+
+    assert total == 0
+    assert archive.count(USER_ID) == 24
+
+
+def test_late_readings_merge_into_existing_month(app, archive):
+    with app.app_context():
+        db.session.add(SensorData(user_id=USER_ID, temperature=1, humidity=1, co_level=100,
+                                  recorded_at=BASE_TIME + timedelta(minutes=30)))
+        db.session.commit()
+        archive_readings(db.session, archive, older_than_days=5, now=NOW)
+
+    co_levels = [row[4] for row in archive.read(USER_ID, newest_first=False)]
+    assert co_levels == [0, 100] + list(range(1, 24))
+
+
+def test_read_filters_range_columns_and_cursor(archive, app):
+    start, end = BASE_TIME + timedelta(hours=6), BASE_TIME + timedelta(hours=12)
+
+    rows = list(archive.read(USER_ID, start, end, columns=('recorded_at', 'co_level')))
+    assert [co for _, co in rows] == list(range(12, 5, -1))
+    assert archive.count(USER_ID, start, end) == 7
+
+    before = (BASE_TIME + timedelta(hours=3), 10**9)
+    assert [row[4] for row in archive.read(USER_ID, before=before)] == [3, 2, 1, 0]
+
+
+def test_merge_readings_orders_and_drops_duplicates():
+    live = [(3, BASE_TIME + timedelta(hours=2)), (2, BASE_TIME + timedelta(hours=1))]
+    archived = [(2, BASE_TIME + timedelta(hours=1)), (1, BASE_TIME)]
+
+    assert [row[0] for row in merge_readings(live, archived)] == [3, 2, 1]
+
+
+def test_history_limit_mode_crosses_archive_boundary(client):
+    response = client.get('/history', query_string={'limit': 30}, headers=AUTH_HEADER)
+
+    co_levels = [row['co_level'] for row in response.json['data']]
+    assert co_levels == list(range(47, 17, -1))
+
+
+def test_history_skips_archive_when_live_rows_fill_the_page(client, archive, mocker):
+    read = mocker.spy(archive, 'read')
+
+    for query in ({'limit': 24}, {'limit': 24, 'format': 'columnar'}, {'after': '', 'per_page': 10}):
+        response = client.get('/history', query_string=query, headers=AUTH_HEADER)
+        assert response.status_code == 200
+    assert read.call_count == 0
+
+    client.get('/history', query_string={'limit': 25}, headers=AUTH_HEADER)
+    assert read.call_count == 1
+
+
+def test_rebuild_rollups_includes_archived_readings(app, archive):
+    with app.app_context():
+        assert rebuild_rollups(db.session, archive=archive) == 49
+        days = db.session.query(SensorRollup1d).filter_by(user_id=USER_ID).all()
+
+    assert sum(day.count for day in days) == 48
+    assert sum(day.co_level_sum for day in days) == sum(range(48))
+
+
+def test_history_cursor_pages_span_both_tiers(client):
+    seen, cursor = [], ''
+    while cursor is not None:
+        body = client.get('/history', query_string={'after': cursor, 'per_page': 10, 'count': 'exact'},
+                          headers=AUTH_HEADER).json
+        seen.extend(row['co_level'] for row in body['data'])
+        cursor = body['pagination']['next_cursor']
+        assert body['pagination']['total'] == 48
+
+    assert seen == list(range(47, -1, -1))
+
+
+def test_history_page_mode_spans_both_tiers(client):
+    body = client.get('/history', query_string={'page': 3, 'per_page': 20}, headers=AUTH_HEADER).json
+
+    assert [row['co_level'] for row in body['data']] == list(range(7, -1, -1))
+    assert body['pagination']['total'] == 48
+
+
+def test_series_merges_archive(client):
+    query = {'start': BASE_TIME.isoformat(), 'end': (BASE_TIME + timedelta(hours=47)).isoformat()}
+    lttb = client.get('/history/series', query_string={**query, 'method': 'lttb', 'points': 10},
+                      headers=AUTH_HEADER).json
+    assert lttb['readings'] == 48
+    assert lttb['data']['co_level']['value'][0] == 0
+
+    # 36 s buckets over raw readings: 23:00 is archived, 00:00 is live
+    boundary = {'start': (BASE_TIME + timedelta(hours=23)).isoformat(),
+                'end': (BASE_TIME + timedelta(hours=24)).isoformat(), 'points': 100}
+    buckets = client.get('/history/series', query_string=boundary, headers=AUTH_HEADER).json
+    assert buckets['source'] == 'sensor_data'
+    assert [item['co_level']['avg'] for item in buckets['data']] == [23.0, 24.0]
+
+
+def test_export_merges_archive_oldest_first(client):
+    lines = client.get('/history/export', headers=AUTH_HEADER).get_data(as_text=True).splitlines()
+
+    assert len(lines) == 48
+    assert '"co_level": 0' in lines[0] and '"co_level": 47' in lines[-1]
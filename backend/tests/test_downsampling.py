@@ -0,0 +1,26 @@
+import numpy as np
+from services.downsampling import lttb_indices, parse_timestamp
+
+
+def test_lttb_returns_all_points_below_threshold():
+    x = np.arange(10.0)
+    assert lttb_indices(x, x, 20).tolist() == list(range(10))
+
+
+def test_lttb_keeps_endpoints_and_spikes():
+    """A single spike in flat data must survive decimation."""
+    x = np.arange(1000.0)
+    y = np.zeros(1000)
+    y[437] = 50.0
+
+    keep = lttb_indices(x, y, 20)
+
+    assert len(keep) == 20
+    assert keep[0] == 0 and keep[-1] == 999
+    assert 437 in keep
+    assert np.all(np.diff(keep) > 0)
+
+
+def test_parse_timestamp_defaults_to_utc():
+    assert parse_timestamp('2025-01-01T00:00:00').utcoffset().total_seconds() == 0
+    assert parse_timestamp('2025-01-01T07:00:00 07:00') == parse_timestamp('2025-01-01T00:00:00Z')
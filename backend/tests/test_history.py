@@ -0,0 +1,313 @@
+import gzip
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pytest
+from api import sensor_bp
+from models import SensorData
+from models.database import db
+from services.columnar import pack_binary, unpack_binary
+from services.response_cache import get_data_versions, get_response_cache
+from services.rollups import rebuild_rollups
+
+USER_ID = uuid.UUID('5f0c7a52-8f0e-4d55-9a43-0f6f0d3c8f11')
+AUTH_HEADER = {'Authorization': 'Bearer test_token'}
+BASE_TIME = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def client(mocker, make_sqlite_app):
+    """Sensor routes on in-memory SQLite with 25 readings (two share a timestamp)."""
+    mocker.patch('api.middleware.verify_token', return_value={'id': USER_ID})
+    app = make_sqlite_app(sensor_bp)
+    with app.app_context():
+        for i in range(25):
+            db.session.add(SensorData(
+                user_id=USER_ID, temperature=20 + i, humidity=50, co_level=i,
+                recorded_at=BASE_TIME + timedelta(minutes=min(i, 23))
+            ))
+        db.session.add(SensorData(user_id=uuid.uuid4(), temperature=99, humidity=1, co_level=1, recorded_at=BASE_TIME))
+        db.session.commit()
+        rebuild_rollups(db.session)
+    get_response_cache().clear()
+    return app.test_client()
+
+
+def test_cursor_pages_cover_all_rows_once(client):
+    seen = []
+    cursor = ''
+    while cursor is not None:
+        response = client.get('/history', query_string={'after': cursor, 'per_page': 10}, headers=AUTH_HEADER)
+        assert response.status_code == 200
+        body = response.json
+        seen.extend(row['id'] for row in body['data'])
+        cursor = body['pagination']['next_cursor']
+        assert body['pagination']['total'] is None
+
+    assert len(seen) == len(set(seen)) == 25
+    rows = sorted(seen, reverse=True)
+    assert seen[:2] == rows[:2]  # Same timestamp: newest id first
+
+
+def test_cursor_mode_optional_count(client):
+    response = client.get('/history', query_string={'after': '', 'per_page': 5, 'count': 'estimate'},
+                          headers=AUTH_HEADER)
+
+    assert response.json['pagination']['total'] == 25
+    assert len(response.json['data']) == 5
+
+
+def test_invalid_cursor_is_rejected(client):
+    response = client.get('/history', query_string={'after': 'yesterday'}, headers=AUTH_HEADER)
+    assert response.status_code == 400
+
+
+def test_cursor_mode_rejects_non_positive_per_page(client):
+    for per_page in (0, -5):
+        response = client.get('/history', query_string={'after': '', 'per_page': per_page}, headers=AUTH_HEADER)
+        assert response.status_code == 400
+
+
+def test_page_mode_can_skip_count(client):
+    exact = client.get('/history', query_string={'page': 2, 'per_page': 10}, headers=AUTH_HEADER).json
+    skipped = client.get('/history', query_string={'page': 2, 'per_page': 10, 'count': 'none'},
+                         headers=AUTH_HEADER).json
+
+    assert exact['pagination']['total'] == 25
+    assert exact['pagination']['pages'] == 3
+    assert skipped['pagination']['total'] is None
+    assert skipped['data'] == exact['data']
+
+
+def test_series_buckets_aggregate_in_sql(client):
+    """24 minutes of readings in 4 buckets of 6 minutes, read from the minute rollups."""
+    response = client.get('/history/series', query_string={
+        'start': BASE_TIME.isoformat(), 'end': (BASE_TIME + timedelta(minutes=24)).isoformat(), 'points': 4
+    }, headers=AUTH_HEADER)
+
+    body = response.json
+    assert response.status_code == 200
+    assert body['bucket_seconds'] == 360
+    assert body['source'] == 'sensor_rollup_1m'
+    assert [b['count'] for b in body['data']] == [6, 6, 6, 7]
+    first = body['data'][0]
+    assert first['t'] == BASE_TIME.isoformat()
+    assert first['co_level'] == {'min': 0.0, 'avg': 2.5, 'max': 5.0}
+    assert first['temperature']['max'] == 25.0
+
+
+def test_series_rollup_edges_are_exact(client):
+    """Day buckets start at local midnight (17:00 UTC); a UTC-aligned week still counts every reading once."""
+    week = datetime(2025, 2, 1, tzinfo=timezone.utc)
+    with client.application.app_context():
+        for i in range(168):
+            db.session.add(SensorData(user_id=USER_ID, temperature=20, humidity=50, co_level=i,
+                                      recorded_at=week + timedelta(hours=i, minutes=30, seconds=15)))
+        db.session.commit()
+        rebuild_rollups(db.session)
+
+    response = client.get('/history/series', query_string={
+        'start': week.isoformat(), 'end': (week + timedelta(days=7)).isoformat(), 'points': 6
+    }, headers=AUTH_HEADER)
+
+    body = response.json
+    assert body['source'] == 'sensor_rollup_1d'
+    assert sum(b['count'] for b in body['data']) == 168
+    assert body['data'][0]['co_level']['min'] == 0.0
+    assert body['data'][-1]['co_level']['max'] == 167.0
+
+
+def test_series_lttb_keeps_endpoints(client):
+    response = client.get('/history/series', query_string={
+        'start': BASE_TIME.isoformat(), 'points': 5, 'method': 'lttb'
+    }, headers=AUTH_HEADER)
+
+    body = response.json
+    assert body['readings'] == 25
+    co = body['data']['co_level']
+    assert len(co['t']) == len(co['value']) == 5
+    assert co['value'][0] == 0 and co['value'][-1] in (23, 24)
+
+
+def test_series_lttb_prebuckets_long_ranges(client, mocker):
+    """Past HISTORY_LTTB_MAX_ROWS readings, LTTB runs on SQL min/max buckets."""
+    mocker.patch('services.downsampling.Config.HISTORY_LTTB_MAX_ROWS', 10)
+    response = client.get('/history/series', query_string={
+        'start': BASE_TIME.isoformat(), 'end': (BASE_TIME + timedelta(minutes=24)).isoformat(),
+        'points': 5, 'method': 'lttb'
+    }, headers=AUTH_HEADER)
+
+    body = response.json
+    assert body['readings'] == 25
+    co = body['data']['co_level']
+    assert len(co['t']) == len(co['value']) == 5
+    assert co['value'][0] == 0 and co['value'][-1] == 24
+
+
+def test_series_requires_valid_range(client):
+    missing = client.get('/history/series', headers=AUTH_HEADER)
+    reversed_range = client.get('/history/series', query_string={
+        'start': '2025-01-02T00:00:00', 'end': '2025-01-01T00:00:00'
+    }, headers=AUTH_HEADER)
+
+    assert missing.status_code == 400
+    assert reversed_range.status_code == 400
+
+
+def test_series_reading_at_end_joins_last_bucket(client):
+    response = client.get('/history/series', query_string={
+        'start': BASE_TIME.isoformat(), 'end': (BASE_TIME + timedelta(minutes=23)).isoformat(), 'points': 23
+    }, headers=AUTH_HEADER)
+
+    counts = [b['count'] for b in response.json['data']]
+    assert len(counts) == 23
+    assert counts[-1] == 3
+
+
+def test_series_sub_minute_buckets_read_raw_rows(client):
+    response = client.get('/history/series', query_string={
+        'start': BASE_TIME.isoformat(), 'end': (BASE_TIME + timedelta(minutes=10)).isoformat(), 'points': 20
+    }, headers=AUTH_HEADER)
+
+    body = response.json
+    assert body['source'] == 'sensor_data'
+    assert body['bucket_seconds'] == 30
+    assert sum(b['count'] for b in body['data']) == 11
+
+
+def test_export_streams_ndjson_oldest_first(client):
+    response = client.get('/history/export', query_string={
+        'start': (BASE_TIME + timedelta(minutes=20)).isoformat()
+    }, headers=AUTH_HEADER)
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    rows = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [row['co_level'] for row in rows] == [20, 21, 22, 23, 24]
+    assert set(rows[0]) == {'id', 'recorded_at', 'temperature', 'humidity', 'co_level'}
+
+
+def test_export_csv_gzip(client):
+    response = client.get('/history/export', query_string={'format': 'csv'},
+                          headers={**AUTH_HEADER, 'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    lines = gzip.decompress(response.data).decode().splitlines()
+    assert lines[0] == 'id,recorded_at,temperature,humidity,co_level'
+    assert len(lines) == 26
+
+
+def test_export_honours_refused_gzip(client):
+    response = client.get('/history/export', query_string={'format': 'csv'},
+                          headers={**AUTH_HEADER, 'Accept-Encoding': 'gzip;q=0, identity'})
+
+    assert 'Content-Encoding' not in response.headers
+    assert response.data.decode().splitlines()[0] == 'id,recorded_at,temperature,humidity,co_level'
+
+
+def test_export_rejects_unknown_format(client):
+    response = client.get('/history/export', query_string={'format': 'xml'}, headers=AUTH_HEADER)
+    assert response.status_code == 400
+
+
+def test_columnar_format_matches_rows(client):
+    rows = client.get('/history', query_string={'limit': 10}, headers=AUTH_HEADER).json['data']
+    body = client.get('/history', query_string={'limit': 10, 'format': 'columnar'}, headers=AUTH_HEADER).json
+
+    columns = body['data']
+    assert body['count'] == 10
+    assert body['user_id'] == str(USER_ID)
+    assert columns['id'] == [row['id'] for row in rows]
+    assert columns['co_level'] == [row['co_level'] for row in rows]
+    assert columns['temperature'] == [row['temperature'] for row in rows]
+    assert columns['t'][-1] == int((BASE_TIME + timedelta(minutes=15)).timestamp() * 1000)
+
+
+def test_binary_format_round_trips(client):
+    columnar = client.get('/history', query_string={'limit': 7, 'format': 'columnar'}, headers=AUTH_HEADER).json
+    response = client.get('/history', query_string={'limit': 7, 'format': 'binary'}, headers=AUTH_HEADER)
+
+    assert response.mimetype == 'application/octet-stream'
+    assert len(response.data) % 8 == 0
+    columns = unpack_binary(response.data)
+    assert columns['id'].tolist() == columnar['data']['id']
+    assert columns['t'].tolist() == columnar['data']['t']
+    assert columns['humidity'].tolist() == columnar['data']['humidity']
+    assert columns['temperature'].tolist() == columnar['data']['temperature']
+
+
+def test_binary_format_is_aligned_and_lossless():
+    columns = {
+        'id': np.array([3, 2, 1], dtype=np.int64),
+        't': np.array([3000, 2000, 1000], dtype=np.int64),
+        'temperature': np.array([24.53, 24.5, 19.99]),
+        'humidity': np.array([60.1, 60.0, 59.97]),
+        'co_level': np.array([8, 8, 7], dtype=np.int32),
+    }
+    data = pack_binary(columns)
+
+    # 8-byte header, four 8-byte arrays, co_level, then padding for odd n
+    assert len(data) == 8 + 4 * 8 * 3 + 4 * 3 + 4
+    unpacked = unpack_binary(data)
+    assert unpacked['temperature'].tolist() == [24.53, 24.5, 19.99]
+    assert unpacked['co_level'].tolist() == [8, 8, 7]
+
+
+def test_arrow_format(client):
+    pa = pytest.importorskip('pyarrow')
+    response = client.get('/history', query_string={'limit': 5, 'format': 'arrow'}, headers=AUTH_HEADER)
+
+    table = pa.ipc.open_stream(response.data).read_all()
+    assert table.num_rows == 5
+
+
+def test_columnar_format_requires_limit_mode(client):
+    response = client.get('/history', query_string={'page': 1, 'format': 'columnar'}, headers=AUTH_HEADER)
+    assert response.status_code == 400
+
+
+def test_settled_range_served_from_cache_and_revalidated(client):
+    query = {'start': BASE_TIME.isoformat(), 'end': (BASE_TIME + timedelta(minutes=10)).isoformat(), 'limit': 5}
+    first = client.get('/history', query_string=query, headers=AUTH_HEADER)
+    second = client.get('/history', query_string=query, headers=AUTH_HEADER)
+    revalidated = client.get('/history', query_string=query,
+                             headers={**AUTH_HEADER, 'If-None-Match': first.headers['ETag']})
+
+    assert first.headers['X-Cache'] == 'MISS'
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.data == first.data
+    assert second.headers['ETag'] == first.headers['ETag']
+    assert 'max-age' in first.headers['Cache-Control']
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+
+
+def test_recently_settled_range_gets_short_max_age(client):
+    end = datetime.now(timezone.utc) - timedelta(seconds=120)
+    query = {'start': BASE_TIME.isoformat(), 'end': end.isoformat(), 'limit': 5}
+    first = client.get('/history', query_string=query, headers=AUTH_HEADER)
+    get_data_versions().bump({USER_ID}, late_user_ids={USER_ID})  # Batch retried through an outage
+    refreshed = client.get('/history', query_string=query, headers=AUTH_HEADER)
+
+    assert first.headers['Cache-Control'] == 'private, max-age=12'
+    assert refreshed.headers['X-Cache'] == 'MISS'
+
+
+def test_live_range_invalidated_by_new_readings(client):
+    first = client.get('/history', query_string={'limit': 5}, headers=AUTH_HEADER)
+    cached = client.get('/history', query_string={'limit': 5}, headers=AUTH_HEADER)
+    get_data_versions().bump({USER_ID})
+    refreshed = client.get('/history', query_string={'limit': 5}, headers=AUTH_HEADER)
+
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+    assert cached.headers['X-Cache'] == 'HIT'
+    assert refreshed.headers['X-Cache'] == 'MISS'
+
+
+def test_errors_are_not_cached(client):
+    client.get('/history', query_string={'after': 'bad'}, headers=AUTH_HEADER)
+    response = client.get('/history', query_string={'after': 'bad'}, headers=AUTH_HEADER)
+
+    assert response.status_code == 400
+    assert 'X-Cache' not in response.headers
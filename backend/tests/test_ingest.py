@@ -0,0 +1,277 @@
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+import pytest
+from models.database import db
+from models import SensorData, DeviceState
+from mqtt.ingest_queue import SensorWriteQueue
+from mqtt.ingest_state import DeviceStateTable
+from mqtt.ownership_cache import DeviceOwnershipCache
+from mqtt.client import MQTTHandler
+from services.prediction_dispatcher import PredictionDispatcher
+from services.response_cache import get_data_versions
+
+
+def make_reading(device_id='AA:BB', co=10):
+    return {
+        'device_id': device_id,
+        'temperature': 25.5,
+        'humidity': 60.0,
+        'co_level': co,
+        'recorded_at': datetime.now(timezone.utc)
+    }
+
+
+def test_write_queue_bulk_flush(sqlite_app):
+    """Buffered readings are written in one flush and tagged with their owner."""
+    owner = uuid.uuid4()
+    with sqlite_app.app_context():
+        db.session.add(DeviceState(device_id='AA:BB', user_id=owner, is_active=True))
+        db.session.commit()
+
+    queue = SensorWriteQueue(lambda: sqlite_app, DeviceOwnershipCache(), batch_size=2)
+    for _ in range(3):
+        queue.enqueue(make_reading())
+    queue.enqueue(make_reading(device_id='UNKNOWN'))
+    version, late = get_data_versions().get(owner), get_data_versions().late(owner)
+
+    assert queue.depth() == 4
+    assert queue.flush() is True
+    assert get_data_versions().get(owner) > version  # cached /history responses are stale now
+    assert get_data_versions().late(owner) == late  # settled ones are not
+
+    stats = queue.stats()
+    assert stats['queue_depth'] == 0
+    assert stats['flushed_rows'] == 4
+    assert stats['flush_count'] == 2
+
+    with sqlite_app.app_context():
+        rows = db.session.query(SensorData).all()
+        assert len(rows) == 4
+        assert sum(1 for r in rows if r.user_id == owner) == 3
+
+
+def test_late_rows_invalidate_settled_history(sqlite_app):
+    """Rows older than the settle horizon (e.g. retried through an outage) bump the late version."""
+    owner = uuid.uuid4()
+    with sqlite_app.app_context():
+        db.session.add(DeviceState(device_id='AA:BB', user_id=owner, is_active=True))
+        db.session.commit()
+
+    queue = SensorWriteQueue(lambda: sqlite_app, DeviceOwnershipCache())
+    late = get_data_versions().late(owner)
+    delayed = make_reading()
+    delayed['recorded_at'] -= timedelta(hours=1)
+    queue.enqueue(delayed)
+
+    assert queue.flush() is True
+    assert get_data_versions().late(owner) == late + 1
+
+
+def test_write_queue_keeps_rows_without_app():
+    """Readings stay buffered until an app is attached."""
+    queue = SensorWriteQueue(lambda: None, DeviceOwnershipCache())
+    queue.enqueue(make_reading())
+
+    assert queue.flush() is False
+    assert queue.depth() == 1
+
+
+def test_write_queue_drops_oldest_when_full():
+    """A full buffer drops the oldest readings and counts them."""
+    queue = SensorWriteQueue(lambda: None, DeviceOwnershipCache(), max_size=2)
+    for co in (1, 2, 3):
+        queue.enqueue(make_reading(co=co))
+
+    assert queue.depth() == 2
+    assert queue.stats()['dropped_rows'] == 1
+    assert [r['co_level'] for r in queue._buffer] == [2, 3]
+
+
+def test_write_queue_dead_letters_rows_that_keep_failing(sqlite_app):
+    """A bad row stops blocking ingestion once its batch is split up."""
+    queue = SensorWriteQueue(lambda: sqlite_app, DeviceOwnershipCache(), max_batch_attempts=2)
+    queue.enqueue(make_reading(co=1))
+    queue.enqueue(make_reading(co=None))  # violates NOT NULL
+    queue.enqueue(make_reading(co=3))
+
+    assert queue.flush() is False  # first attempt: whole batch put back
+    assert queue.depth() == 3
+    assert queue.flush() is True   # second attempt: written row by row
+
+    stats = queue.stats()
+    assert stats['queue_depth'] == 0
+    assert stats['rejected_rows'] == 1
+    assert stats['dead_letters'] == 1
+    assert queue.dead_letters[0][0]['co_level'] is None
+    with sqlite_app.app_context():
+        assert sorted(co for co, in db.session.query(SensorData.co_level)) == [1, 3]
+
+
+def test_write_queue_never_dead_letters_on_connection_errors():
+    """An unreachable database keeps every reading buffered."""
+    from sqlalchemy.exc import OperationalError
+
+    queue = SensorWriteQueue(lambda: None, DeviceOwnershipCache(), max_batch_attempts=1)
+
+    def failing_write(batch):
+        queue._last_error = OperationalError('INSERT', {}, Exception('connection refused'))
+        return False
+
+    queue._write_batch = failing_write
+    queue.enqueue(make_reading())
+    for _ in range(3):
+        assert queue.flush() is False
+
+    assert queue.depth() == 1
+    assert queue.stats()['rejected_rows'] == 0
+
+
+def test_device_state_table_lru_eviction():
+    """The table never holds more than max_devices and evicts the least recently used."""
+    table = DeviceStateTable(max_devices=2, idle_timeout=100)
+    table.touch('a', now=0)
+    table.touch('b', now=1)
+    table.touch('a', now=2)
+    table.touch('c', now=3)
+
+    assert len(table) == 2
+    assert table.get('b') is None
+    assert table.get('a') is not None
+
+
+def test_device_state_table_idle_eviction():
+    """Devices idle longer than idle_timeout are dropped on the next touch."""
+    table = DeviceStateTable(max_devices=10, idle_timeout=60)
+    table.touch('idle', now=0)
+    table.touch('active', now=100)
+
+    assert table.get('idle') is None
+    assert table.evicted == 1
+
+
+def test_throttling_is_per_device(mocker):
+    """A hazardous device saving every second does not reset another device's heartbeat."""
+    clock = mocker.patch('mqtt.client.time.monotonic')
+    handler = MQTTHandler()
+
+    def upload(device_id, co):
+        handler.handle_sensor_upload(json.dumps({
+            'device_id': device_id, 'temperature': 25, 'humidity': 50, 'co_level': co
+        }))
+
+    clock.return_value = 0
+    upload('normal', 5)
+    upload('hazard', 80)
+    assert handler.write_queue.depth() == 2
+
+    # Hazard device keeps saving every second, normal device waits for its heartbeat
+    for t in (1, 2, 3):
+        clock.return_value = t
+        upload('hazard', 80)
+        upload('normal', 5)
+    assert handler.write_queue.depth() == 5
+
+    clock.return_value = 60
+    upload('normal', 5)
+    assert handler.write_queue.depth() == 6
+
+
+def test_actuator_state_is_per_device(mocker):
+    """Control commands only change the AI action of the targeted device."""
+    handler = MQTTHandler()
+    mocker.patch.object(handler.client, 'publish')
+
+    handler.publish_control_command('FAN_ON', 'dev-1')
+
+    assert handler.device_states.get('dev-1').current_action() == 'high_temp_turn_on_AC'
+    assert handler.device_states.touch('dev-2').current_action() == 'normal'
+
+
+def test_ownership_cache_warm_and_resolve(sqlite_app, mocker):
+    """Warmed devices resolve from memory; unknown devices hit the DB once."""
+    owner = uuid.uuid4()
+    with sqlite_app.app_context():
+        db.session.add(DeviceState(device_id='AA:BB', user_id=owner, is_active=True))
+        db.session.commit()
+
+    cache = DeviceOwnershipCache()
+    cache.warm(sqlite_app)
+
+    with sqlite_app.app_context():
+        query = mocker.spy(db.session, 'query')
+        assert cache.resolve(db.session, {'AA:BB'}) == {'AA:BB': owner}
+        assert query.call_count == 0
+
+        assert cache.resolve(db.session, {'NEW'}) == {'NEW': None}
+        assert cache.resolve(db.session, {'NEW'}) == {'NEW': None}
+        assert query.call_count == 1
+
+    cache.set('NEW', str(owner))
+    with sqlite_app.app_context():
+        assert cache.resolve(db.session, {'NEW'}) == {'NEW': owner}
+
+
+def test_ownership_cache_entries_expire(sqlite_app, mocker):
+    """Expired entries are re-read so changes made outside the app are seen."""
+    cache = DeviceOwnershipCache(ttl=10)
+    clock = mocker.patch('mqtt.ownership_cache.time.monotonic', return_value=0)
+    cache.set('AA:BB', uuid.uuid4())
+
+    clock.return_value = 11
+    with sqlite_app.app_context():
+        assert cache.resolve(db.session, {'AA:BB'}) == {'AA:BB': None}
+
+
+def test_ownership_cache_is_bounded(sqlite_app):
+    """Unknown device ids cannot grow the cache past max_size."""
+    cache = DeviceOwnershipCache(max_size=2)
+    cache.set('AA:BB', uuid.uuid4())
+    with sqlite_app.app_context():
+        cache.resolve(db.session, {'NEW-1'})
+        cache.resolve(db.session, {'AA:BB'})  # Most recently used again
+        cache.resolve(db.session, {'NEW-2'})
+
+    assert cache.stats()['size'] == 2
+    assert cache.stats()['evicted'] == 1
+    assert 'NEW-1' not in cache._entries
+    assert 'AA:BB' in cache._entries
+
+
+def test_prediction_dispatcher_batches_requests(mocker):
+    """Queued samples are predicted in one vectorized call and delivered in order."""
+    predict_batch = mocker.patch(
+        'services.prediction_dispatcher.AIPredictionService.predict_batch',
+        side_effect=lambda samples: [{'status': 'success', 'co': s['CO_ppm']} for s in samples]
+    )
+    dispatcher = PredictionDispatcher(max_batch=10, max_wait=0.01)
+    delivered = []
+    for co in (1, 2, 3):
+        dispatcher.submit({'CO_ppm': co}, delivered.append)
+
+    dispatcher.run_batch(dispatcher._collect_batch())
+
+    predict_batch.assert_called_once()
+    assert [r['co'] for r in delivered] == [1, 2, 3]
+    assert dispatcher.stats()['avg_batch_size'] == 3
+
+
+def test_reading_streams_before_prediction():
+    """The raw reading is streamed immediately; the prediction follows as its own message."""
+    handler = MQTTHandler()
+    subscription = handler.stream_hub.subscribe({'dev-1'})
+    handler.handle_sensor_upload(json.dumps({
+        'device_id': 'dev-1', 'temperature': 25, 'humidity': 50, 'co_level': 5
+    }))
+
+    [reading] = [m.payload for m in subscription.drain()]
+    assert reading['ai_prediction'] is None
+    assert handler.prediction_dispatcher.stats()['pending'] == 1
+
+    handler.prediction_dispatcher.run_batch(handler.prediction_dispatcher._collect_batch())
+
+    [prediction] = [m.payload for m in subscription.drain()]
+    subscription.close()
+    assert prediction['type'] == 'prediction'
+    assert prediction['timestamp'] == reading['timestamp']
+    assert prediction['ai_prediction']['status'] == 'success'
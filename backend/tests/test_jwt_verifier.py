@@ -0,0 +1,115 @@
+import time
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from api import middleware
+from api.jwt_verifier import JWTVerifier, TokenUnverifiable
+
+ISSUER = 'https://project.supabase.co/auth/v1'
+USER_ID = '5f0c7a52-8f0e-4d55-9a43-0f6f0d3c8f11'
+
+
+@pytest.fixture(scope='module')
+def rsa_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+@pytest.fixture
+def verifier(rsa_key, mocker):
+    jwk = jwt.algorithms.RSAAlgorithm.to_jwk(rsa_key.public_key(), as_dict=True)
+    jwk.update({'kid': 'key-1', 'alg': 'RS256', 'use': 'sig'})
+    verifier = JWTVerifier(jwks_url='https://project.supabase.co/jwks', secret='hs256-secret-at-least-32-bytes-long', issuer=ISSUER)
+    mocker.patch.object(verifier, '_fetch_jwks', return_value={'keys': [jwk]})
+    return verifier
+
+
+def make_token(key, kid='key-1', algorithm='RS256', **overrides):
+    claims = {'sub': USER_ID, 'aud': 'authenticated', 'iss': ISSUER, 'role': 'authenticated',
+              'email': 'user@example.com', 'exp': int(time.time()) + 3600}
+    claims.update(overrides)
+    return jwt.encode(claims, key, algorithm=algorithm, headers={'kid': kid} if kid else None)
+
+
+def test_valid_token_is_verified_locally(verifier, rsa_key):
+    claims = verifier.verify(make_token(rsa_key))
+
+    user = JWTVerifier.user_from_claims(claims)
+    assert user['id'] == USER_ID
+    assert user['email'] == 'user@example.com'
+    assert verifier.stats()['keys'] == 1
+
+
+@pytest.mark.parametrize('overrides, error', [
+    ({'exp': int(time.time()) - 120}, jwt.ExpiredSignatureError),
+    ({'aud': 'anon'}, jwt.InvalidAudienceError),
+    ({'iss': 'https://evil.example.com'}, jwt.InvalidIssuerError),
+])
+def test_invalid_claims_are_rejected(verifier, rsa_key, overrides, error):
+    with pytest.raises(error):
+        verifier.verify(make_token(rsa_key, **overrides))
+
+
+def test_wrong_signature_is_rejected(verifier):
+    other_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    with pytest.raises(jwt.InvalidSignatureError):
+        verifier.verify(make_token(other_key))
+
+
+def test_hs256_token_uses_jwt_secret(verifier):
+    assert verifier.verify(make_token('hs256-secret-at-least-32-bytes-long', kid=None, algorithm='HS256'))['sub'] == USER_ID
+
+
+def test_unsigned_token_is_rejected(verifier):
+    token = jwt.encode({'sub': USER_ID, 'aud': 'authenticated', 'exp': int(time.time()) + 60}, None, algorithm='none')
+
+    with pytest.raises(jwt.InvalidAlgorithmError):
+        verifier.verify(token)
+
+
+def test_unknown_kid_refreshes_once_then_is_unverifiable(verifier, rsa_key):
+    verifier.verify(make_token(rsa_key))
+
+    with pytest.raises(TokenUnverifiable):
+        verifier.verify(make_token(rsa_key, kid='rotated'))
+    with pytest.raises(TokenUnverifiable):
+        verifier.verify(make_token(rsa_key, kid='rotated'))
+
+    assert verifier._fetch_jwks.call_count == 1
+
+
+def test_unverifiable_kid_is_logged_once(verifier, rsa_key, capsys):
+    for _ in range(3):
+        with pytest.raises(TokenUnverifiable):
+            verifier.verify(make_token(rsa_key, kid='rotated'))
+
+    assert capsys.readouterr().out.count("kid 'rotated'") == 1
+    assert verifier.stats()['unverifiable'] == 3
+
+
+def test_require_auth_falls_back_to_remote_when_unverifiable(verifier, rsa_key, mocker):
+    mocker.patch('api.middleware.get_jwt_verifier', return_value=verifier)
+    mocker.patch.object(middleware.Config, 'AUTH_VERIFY_MODE', 'local')
+    mocker.patch.object(middleware.Config, 'AUTH_REMOTE_FALLBACK', True)
+    remote = mocker.patch('api.middleware.verify_token_with_supabase', return_value={'id': USER_ID})
+
+    assert middleware.verify_token(make_token(rsa_key))['id'] == USER_ID
+    remote.assert_not_called()
+
+    assert middleware.verify_token(make_token(rsa_key, kid='unknown'))['id'] == USER_ID
+    remote.assert_called_once()
+
+    assert middleware.verify_token(make_token(rsa_key, exp=int(time.time()) - 120)) is None
+    remote.assert_called_once()
+
+
+def test_refresh_thread_starts_once_per_process(verifier, mocker):
+    thread = mocker.patch('api.jwt_verifier.threading.Thread')
+
+    verifier.start()
+    verifier.start()
+    assert thread.call_count == 2  # Initial fetch + refresh loop
+
+    verifier._pid = -1  # As seen from a child forked after start()
+    verifier.start()
+    assert thread.call_count == 4
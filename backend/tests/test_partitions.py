@@ -0,0 +1,119 @@
+from datetime import datetime, timezone
+import pytest
+from models.database import db
+from services.partitions import interval_start, next_interval, partition_name, plan_maintenance, run_maintenance
+
+NOW = datetime(2025, 3, 14, 9, 30, tzinfo=timezone.utc)
+
+
+def month(year, month_):
+    return datetime(year, month_, 1, tzinfo=timezone.utc)
+
+
+def monthly(*starts):
+    return [(partition_name(lower), lower, next_interval(lower, 'month')) for lower in starts]
+
+
+def test_interval_start_and_next():
+    assert interval_start(NOW, 'month') == month(2025, 3)
+    assert interval_start(NOW, 'week') == datetime(2025, 3, 10, tzinfo=timezone.utc)  # Monday
+    assert interval_start(NOW, 'day') == datetime(2025, 3, 14, tzinfo=timezone.utc)
+    assert next_interval(month(2024, 12), 'month') == month(2025, 1)
+    assert next_interval(month(2024, 1), 'month') == month(2024, 2)
+    with pytest.raises(ValueError):
+        interval_start(NOW, 'year')
+
+
+def test_plan_creates_current_and_premade_months():
+    to_create, to_expire = plan_maintenance([], NOW, 'month', premake=2)
+
+    assert [(lower, upper) for _, lower, upper in to_create] == [
+        (month(2025, 3), month(2025, 4)),
+        (month(2025, 4), month(2025, 5)),
+        (month(2025, 5), month(2025, 6)),
+    ]
+    assert to_create[0][0] == 'sensor_data_p20250301'
+    assert to_expire == []
+
+
+def test_plan_continues_from_existing_partitions():
+    existing = monthly(month(2025, 2), month(2025, 3), month(2025, 4))
+
+    to_create, _ = plan_maintenance(existing, NOW, 'month', premake=3)
+
+    assert [name for name, _, _ in to_create] == ['sensor_data_p20250501', 'sensor_data_p20250601']
+    assert plan_maintenance(existing + to_create, NOW, 'month', premake=3)[0] == []
+
+
+def test_plan_switching_interval_never_overlaps():
+    existing = monthly(month(2025, 3))
+
+    to_create, _ = plan_maintenance(existing, NOW, 'week', premake=4)
+
+    # April 1 is a Tuesday: the first range only fills the rest of that week
+    assert to_create[0][1] == month(2025, 4)
+    assert to_create[0][2] == datetime(2025, 4, 7, tzinfo=timezone.utc)
+    assert len(to_create) == 2
+    for (_, _, upper), (_, lower, _) in zip(to_create, to_create[1:]):
+        assert upper == lower
+
+
+def test_plan_expires_only_fully_elapsed_partitions():
+    existing = monthly(month(2024, 12), month(2025, 1), month(2025, 2), month(2025, 3))
+
+    # Cutoff 2025-01-13: December ended before it, January did not
+    _, to_expire = plan_maintenance(existing, NOW, 'month', premake=0, retention_days=60)
+    assert to_expire == ['sensor_data_p20241201']
+
+    assert plan_maintenance(existing, NOW, 'month', premake=0, retention_days=0)[1] == []
+
+
+def test_run_maintenance_skips_sqlite(sqlite_app):
+    with sqlite_app.app_context():
+        assert run_maintenance(db.session, retention_days=30) == ([], [])
+
+
+class RecordingSession:
+    """Stands in for a Postgres session: records SQL, answers the probes."""
+
+    def __init__(self, partitions, stranded=True):
+        self.partitions = partitions
+        self.stranded = stranded
+        self.statements = []
+        self.committed = False
+
+    def get_bind(self):
+        return type('Bind', (), {'dialect': type('Dialect', (), {'name': 'postgresql'})})()
+
+    def execute(self, statement, params=None):
+        sql = ' '.join(str(statement).split())
+        self.statements.append(sql)
+        result = type('Result', (), {})()
+        result.all = lambda: [(name, f"FOR VALUES FROM ('{lo}') TO ('{hi}')") for name, lo, hi in self.partitions]
+        result.scalar = lambda: self.stranded
+        result.rowcount = 2
+        return result
+
+    def commit(self):
+        self.committed = True
+
+
+def test_run_maintenance_moves_rows_out_of_default_partition_first():
+    session = RecordingSession(monthly(month(2025, 2)))
+
+    created, _ = run_maintenance(session, premake=0, now=NOW)
+
+    assert created == ['sensor_data_p20250301']
+    order = [next(i for i, sql in enumerate(session.statements) if sql.startswith(prefix))
+             for prefix in ('WITH moved AS (DELETE FROM sensor_data_default', 'CREATE TABLE IF NOT EXISTS',
+                            'INSERT INTO sensor_data SELECT')]
+    assert order == sorted(order)
+    assert session.committed
+
+
+def test_run_maintenance_expires_default_partition_rows():
+    session = RecordingSession(monthly(month(2025, 3)), stranded=True)
+
+    run_maintenance(session, premake=0, retention_days=30, now=NOW)
+
+    assert any(sql.startswith('DELETE FROM sensor_data_default WHERE recorded_at < ') for sql in session.statements)
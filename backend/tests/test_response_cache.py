@@ -0,0 +1,58 @@
+from services.response_cache import DataVersions, ResponseCache
+
+
+def test_live_entries_expire_and_follow_versions(mocker):
+    versions = DataVersions()
+    cache = ResponseCache(versions, live_ttl=5)
+    clock = mocker.patch('services.response_cache.time.monotonic', return_value=100.0)
+
+    cache.put('live', 'u1', b'{}', 'application/json', immutable=False)
+    cache.put('past', 'u1', b'[]', 'application/json', immutable=True)
+    assert cache.get('live', 'u1').body == b'{}'
+
+    versions.bump({'u1'})
+    assert cache.get('live', 'u1') is None
+    cache.put('live', 'u1', b'{}', 'application/json', immutable=False)
+    clock.return_value = 106.0
+    assert cache.get('live', 'u1') is None
+    assert cache.get('past', 'u1').body == b'[]'
+
+
+def test_bounded_by_entries_and_bytes():
+    cache = ResponseCache(DataVersions(), max_entries=2, max_bytes=100)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, 'u1', b'x' * 10, 'text/plain', immutable=True)
+    assert cache.get('a', 'u1') is None
+    assert cache.stats()['entries'] == 2
+
+    cache.put('big', 'u1', b'x' * 60, 'text/plain', immutable=True)  # more than a quarter of max_bytes
+    assert cache.get('big', 'u1') is None
+    assert cache.stats()['bytes'] == 20
+
+
+def test_stale_version_read_before_query():
+    """A reading committed while the response was built makes it stale at once."""
+    versions = DataVersions()
+    cache = ResponseCache(versions)
+    version = versions.get('u1')
+    versions.bump({'u1'})
+    cache.put('live', 'u1', b'{}', 'application/json', immutable=False, version=version)
+
+    assert cache.get('live', 'u1') is None
+
+
+def test_settled_entries_expire_and_follow_late_versions(mocker):
+    versions = DataVersions()
+    cache = ResponseCache(versions)
+    clock = mocker.patch('services.response_cache.time.monotonic', return_value=100.0)
+
+    cache.put('past', 'u1', b'[]', 'application/json', immutable=True, ttl=60)
+    versions.bump({'u1'})  # Only recent readings: settled ranges are unaffected
+    assert cache.get('past', 'u1').body == b'[]'
+
+    versions.bump({'u1'}, late_user_ids={'u1'})
+    assert cache.get('past', 'u1') is None
+
+    cache.put('past', 'u1', b'[]', 'application/json', immutable=True, ttl=60)
+    clock.return_value = 161.0
+    assert cache.get('past', 'u1') is None
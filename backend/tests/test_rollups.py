@@ -0,0 +1,121 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+import pytest
+from models.database import db
+from models import DeviceState, SensorRollup1m, SensorRollup1h, SensorRollup1d
+from mqtt.ingest_queue import SensorWriteQueue
+from mqtt.ownership_cache import DeviceOwnershipCache
+from services.rollups import NIL_USER_ID, bucket_start, rebuild_rollups, rollups_cover
+
+OWNER = uuid.UUID('0b3f1c2e-6a4d-4f5e-8c7b-9d0e1f2a3b4c')
+# 16:59:30 UTC = 23:59:30 in Ho Chi Minh City, 60s before the local day ends
+BASE_TIME = datetime(2025, 3, 1, 16, 59, 30, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def sqlite_app(make_sqlite_app):
+    app = make_sqlite_app()
+    with app.app_context():
+        db.session.add(DeviceState(device_id='AA:BB', user_id=OWNER, is_active=True))
+        db.session.commit()
+    return app
+
+
+def reading(seconds, co, device_id='AA:BB', temperature=25.5):
+    return {
+        'device_id': device_id,
+        'temperature': temperature,
+        'humidity': 60.0,
+        'co_level': co,
+        'recorded_at': BASE_TIME + timedelta(seconds=seconds)
+    }
+
+
+def snapshot(model):
+    # Owner rows only: SQLite reads the nil UUID back as the integer 0
+    return sorted(
+        (r.bucket_start.replace(tzinfo=None), r.count, r.temperature_sum,
+         r.temperature_min, r.temperature_max, r.co_level_sum, r.co_level_min, r.co_level_max)
+        for r in db.session.query(model).filter_by(user_id=OWNER).all()
+    )
+
+
+def test_day_bucket_uses_local_calendar_day():
+    assert bucket_start(BASE_TIME, 86400) == datetime(2025, 2, 28, 17, 0, tzinfo=timezone.utc)
+    assert bucket_start(BASE_TIME + timedelta(seconds=30), 86400) == datetime(2025, 3, 1, 17, 0, tzinfo=timezone.utc)
+    assert bucket_start(BASE_TIME, 3600) == datetime(2025, 3, 1, 16, 0, tzinfo=timezone.utc)
+
+
+def test_flushes_merge_into_rollups(sqlite_app):
+    """Rollups built batch by batch by the writer match a rebuild from raw rows."""
+    queue = SensorWriteQueue(lambda: sqlite_app, DeviceOwnershipCache(), batch_size=2)
+    for seconds, co in ((0, 4), (10, 8), (20, 2), (40, 6)):
+        queue.enqueue(reading(seconds, co, temperature=20 + co))
+        assert queue.flush() is True
+    queue.enqueue(reading(45, 1, device_id='UNKNOWN'))
+    assert queue.flush() is True
+
+    with sqlite_app.app_context():
+        minutes = db.session.query(SensorRollup1m).filter_by(user_id=OWNER).order_by(SensorRollup1m.bucket_start).all()
+        assert [m.count for m in minutes] == [3, 1]
+        assert (minutes[0].co_level_min, minutes[0].co_level_max, minutes[0].co_level_sum) == (2, 8, 14)
+        assert float(minutes[0].temperature_sum) == 74.0
+
+        days = db.session.query(SensorRollup1d).filter_by(user_id=OWNER).all()
+        assert sorted(d.count for d in days) == [1, 3]
+        assert db.session.query(SensorRollup1h.count).filter_by(user_id=NIL_USER_ID).scalar() == 1
+
+        incremental = {model: snapshot(model) for model in (SensorRollup1m, SensorRollup1h, SensorRollup1d)}
+        assert rebuild_rollups(db.session, batch_size=2) == 5
+        for model, rows in incremental.items():
+            assert snapshot(model) == rows
+
+
+def test_rebuild_since_keeps_earlier_days(sqlite_app):
+    queue = SensorWriteQueue(lambda: sqlite_app, DeviceOwnershipCache())
+    queue.enqueue(reading(-86400, 3))
+    queue.enqueue(reading(60, 5))
+    queue.flush()
+
+    with sqlite_app.app_context():
+        assert rebuild_rollups(db.session, since=BASE_TIME + timedelta(seconds=60)) == 1
+        assert db.session.query(SensorRollup1d).count() == 2
+
+
+def test_rollups_trusted_only_after_a_rebuild(sqlite_app):
+    """Incremental rollups alone may miss older readings; a rebuild records coverage."""
+    queue = SensorWriteQueue(lambda: sqlite_app, DeviceOwnershipCache())
+    queue.enqueue(reading(0, co=1))
+    queue.flush()
+
+    with sqlite_app.app_context():
+        assert not rollups_cover(db.session, BASE_TIME)
+
+        rebuild_rollups(db.session, since=BASE_TIME + timedelta(days=2))
+        assert not rollups_cover(db.session, BASE_TIME)
+        assert rollups_cover(db.session, BASE_TIME + timedelta(days=3))
+
+        rebuild_rollups(db.session)
+        assert rollups_cover(db.session, BASE_TIME - timedelta(days=365))
+        # A later partial rebuild does not shrink the covered range
+        rebuild_rollups(db.session, since=BASE_TIME + timedelta(days=2))
+        assert rollups_cover(db.session, BASE_TIME)
+
+
+
+def test_rebuild_refuses_to_start_below_retention_floor(sqlite_app):
+    """Rollups of readings retention may have dropped are all that is left of them."""
+    queue = SensorWriteQueue(lambda: sqlite_app, DeviceOwnershipCache())
+    queue.enqueue(reading(60, co=1))
+    queue.flush()
+    floor = datetime(2025, 3, 1, tzinfo=timezone.utc)
+
+    with sqlite_app.app_context():
+        with pytest.raises(ValueError):
+            rebuild_rollups(db.session, floor=floor)
+        # The local day containing the floor starts before it
+        with pytest.raises(ValueError):
+            rebuild_rollups(db.session, since=floor, floor=floor)
+        assert db.session.query(SensorRollup1d).count() == 1
+
+        assert rebuild_rollups(db.session, since=floor + timedelta(hours=17), floor=floor) == 1
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+from api.stream_asgi import StreamApp
+from services.stream_hub import StreamHub
+
+AUTH_HEADERS = [(b'authorization', b'Bearer test_token')]
+
+
+def run_stream(app, scope, on_start=None, max_chunks=1):
+    """
+    Drive the ASGI app until it has sent `max_chunks` body chunks, then
+    disconnect. Returns the list of sent ASGI messages.
+    """
+    sent = []
+
+    async def main():
+        disconnected = asyncio.Event()
+
+        async def receive():
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+            if message['type'] == 'http.response.start' and on_start:
+                on_start()
+            chunks = [m for m in sent if m.get('more_body')]
+            if len(chunks) >= max_chunks:
+                disconnected.set()
+
+        await asyncio.wait_for(app(scope, receive, send), timeout=5)
+
+    asyncio.run(main())
+    return sent
+
+
+def http_scope(path='/stream', method='GET', headers=AUTH_HEADERS):
+    return {'type': 'http', 'path': path, 'method': method, 'headers': headers}
+
+
+def test_missing_token_is_rejected():
+    """Same 401 as the Flask route when no Authorization header is sent."""
+    app = StreamApp(flask_app=None, hub=StreamHub())
+
+    sent = run_stream(app, http_scope(headers=[]))
+
+    assert sent[0]['status'] == 401
+    assert b'Missing Authorization header' in sent[1]['body']
+
+
+def test_streams_user_devices_and_unsubscribes_on_disconnect(mocker):
+    """A reading published from another thread reaches the coroutine as its SSE frame."""
+    mocker.patch('api.stream_asgi.verify_token', return_value={'id': 'user-1'})
+    hub = StreamHub()
+    app = StreamApp(flask_app=None, hub=hub, keepalive=5)
+    mocker.patch.object(app, '_user_device_ids', return_value={'dev-1'})
+
+    def publish():
+        threading.Thread(target=hub.publish, args=('dev-1', {'co_level': 5})).start()
+
+    sent = run_stream(app, http_scope(), on_start=publish)
+
+    assert sent[0]['status'] == 200
+    assert sent[1]['body'].endswith(b'\ndata: {"co_level": 5}\n\n')
+    assert hub.subscriber_count() == 0
+    assert app.open_connections == 0
+
+
+def test_idle_connection_gets_keepalive(mocker):
+    """Idle connections receive a keep-alive comment instead of holding a thread."""
+    mocker.patch('api.stream_asgi.verify_token', return_value={'id': 'user-1'})
+    app = StreamApp(flask_app=None, hub=StreamHub(), keepalive=0.01)
+    mocker.patch.object(app, '_user_device_ids', return_value={'dev-1'})
+
+    sent = run_stream(app, http_scope())
+
+    assert sent[1]['body'] == b': keep-alive\n\n'
+
+
+def test_unknown_path_is_404():
+    app = StreamApp(flask_app=None, hub=StreamHub())
+
+    sent = run_stream(app, http_scope(path='/history'))
+
+    assert sent[0]['status'] == 404
+
+
+def test_last_event_id_query_parameter_replays(mocker):
+    """Clients that cannot set headers resume with ?last_event_id=."""
+    mocker.patch('api.stream_asgi.verify_token', return_value={'id': 'user-1'})
+    hub = StreamHub()
+    app = StreamApp(flask_app=None, hub=hub, keepalive=5)
+    mocker.patch.object(app, '_user_device_ids', return_value={'dev-1'})
+    seen = hub.publish('dev-1', {'co_level': 1})
+    missed = hub.publish('dev-1', {'co_level': 2})
+
+    scope = dict(http_scope(), query_string=f'last_event_id={seen.event_id}'.encode())
+    sent = run_stream(app, scope)
+
+    assert sent[1]['body'] == missed.frame
+
+
+def test_invalid_max_hz_is_rejected(mocker):
+    mocker.patch('api.stream_asgi.verify_token', return_value={'id': 'user-1'})
+    app = StreamApp(flask_app=None, hub=StreamHub())
+
+    sent = run_stream(app, dict(http_scope(), query_string=b'max_hz=0'))
+
+    assert sent[0]['status'] == 400
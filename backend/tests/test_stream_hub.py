@@ -0,0 +1,235 @@
+import threading
+import pytest
+from services.stream_hub import StreamHub, StreamMessage, StreamThrottle, parse_max_hz
+
+
+def test_subscribers_only_receive_their_devices():
+    """Readings are delivered only to subscribers of that device's topic."""
+    hub = StreamHub()
+    mine = hub.subscribe({'dev-1'})
+    other = hub.subscribe({'dev-2'})
+
+    hub.publish('dev-1', {'co_level': 5})
+
+    assert [m.payload for m in mine.get(timeout=0)] == [{'co_level': 5}]
+    assert other.get(timeout=0) == []
+
+
+def test_close_readings_are_not_lost():
+    """Two devices publishing back to back both reach a subscriber of both."""
+    hub = StreamHub()
+    subscription = hub.subscribe({'dev-1', 'dev-2'})
+
+    hub.publish('dev-1', 'a')
+    hub.publish('dev-2', 'b')
+
+    assert [m.payload for m in subscription.get(timeout=0)] == ['a', 'b']
+
+
+def test_slow_subscriber_drops_oldest():
+    """A full subscriber queue keeps the newest messages."""
+    hub = StreamHub(max_queue=2)
+    subscription = hub.subscribe({'dev-1'})
+
+    for i in range(5):
+        hub.publish('dev-1', i)
+
+    assert [m.payload for m in subscription.get(timeout=0)] == [3, 4]
+    assert subscription.dropped == 3
+
+
+def test_unsubscribe_removes_topic():
+    """Closing a subscription stops delivery and frees empty topics."""
+    hub = StreamHub()
+    subscription = hub.subscribe({'dev-1'})
+    subscription.close()
+
+    hub.publish('dev-1', 'x')
+
+    assert subscription.get(timeout=0) == []
+    assert hub.stats()['topics'] == 0
+
+
+def test_get_wakes_on_publish():
+    """A waiting subscriber is woken by a publish from another thread."""
+    hub = StreamHub()
+    subscription = hub.subscribe({'dev-1'})
+    threading.Timer(0.05, hub.publish, args=('dev-1', 'late')).start()
+
+    assert [m.payload for m in subscription.get(timeout=2)] == ['late']
+
+
+def test_message_is_serialized_once():
+    """All subscribers share the same pre-encoded frame and a monotonic seq."""
+    hub = StreamHub()
+    first = hub.subscribe({'dev-1'})
+    second = hub.subscribe({'dev-1'})
+
+    hub.publish('dev-1', {'co_level': 5})
+    hub.publish('dev-1', {'co_level': 6})
+
+    [a1, a2] = first.get(timeout=0)
+    [b1, b2] = second.get(timeout=0)
+    assert a1.frame is b1.frame
+    assert a1.frame == f'id: {a1.event_id}\ndata: {{"co_level": 5}}\n\n'.encode()
+    assert a1.seq < a2.seq
+
+
+def test_duplicate_sequence_numbers_are_skipped():
+    """A subscriber never yields a message it has already returned."""
+    hub = StreamHub()
+    subscription = hub.subscribe({'dev-1'})
+    message = hub.publish('dev-1', 'x')
+    subscription.get(timeout=0)
+
+    subscription.deliver(message)
+
+    assert subscription.get(timeout=0) == []
+
+
+def test_reconnect_replays_only_missed_events():
+    """Last-Event-ID replays the events after it, across the user's devices, in order."""
+    hub = StreamHub(replay_size=10)
+    first = hub.publish('dev-1', 'a')
+    hub.publish('dev-2', 'b')
+    hub.publish('dev-3', 'other user')
+    hub.publish('dev-1', 'c')
+
+    subscription = hub.subscribe({'dev-1', 'dev-2'}, last_event_id=first.event_id)
+    hub.publish('dev-2', 'live')
+
+    assert [m.payload for m in subscription.get(timeout=0)] == ['b', 'c', 'live']
+
+
+def test_replay_buffer_is_bounded_per_device():
+    """A resume from an id whose successors were evicted gets a reset, not a partial replay."""
+    hub = StreamHub(replay_size=2, max_replay_devices=1)
+    first = hub.publish('dev-1', 1)
+    second = hub.publish('dev-1', 2)
+    for value in (3, 4):
+        hub.publish('dev-1', value)
+
+    subscription = hub.subscribe({'dev-1'}, last_event_id=second.event_id)
+    assert [m.payload for m in subscription.get(timeout=0)] == [3, 4]
+
+    subscription = hub.subscribe({'dev-1'}, last_event_id=first.event_id)
+    hub.publish('dev-1', 5)
+    reset, live = subscription.get(timeout=0)
+    assert reset.payload == {'type': 'reset', 'reason': 'replay_evicted'}
+    assert reset.seq == live.seq - 1
+    assert live.payload == 5
+
+    hub.publish('dev-2', 6)
+    assert hub.stats()['replay_devices'] == 1
+    # dev-1's buffer is gone: any id before it can no longer be replayed
+    subscription = hub.subscribe({'dev-1'}, last_event_id=second.event_id)
+    assert subscription.get(timeout=0)[0].payload['type'] == 'reset'
+
+
+def test_replay_bypasses_queue_bound():
+    hub = StreamHub(max_queue=2, replay_size=10)
+    first = hub.publish('dev-1', 0)
+    for value in range(1, 6):
+        hub.publish('dev-1', value)
+
+    subscription = hub.subscribe({'dev-1'}, last_event_id=first.event_id)
+
+    assert [m.payload for m in subscription.get(timeout=0)] == [1, 2, 3, 4, 5]
+    assert subscription.dropped == 0
+
+
+def test_event_id_from_another_epoch_gets_a_reset():
+    """Ids issued before a restart (different epoch) tell the client to refetch history."""
+    hub = StreamHub()
+    hub.publish('dev-1', 'a')
+
+    subscription = hub.subscribe({'dev-1'}, last_event_id='0-0')
+
+    assert hub.parse_event_id('0-0') is None
+    [reset] = subscription.get(timeout=0)
+    assert reset.payload == {'type': 'reset', 'reason': 'unknown_event_id'}
+    assert reset.event_id == f"{hub.epoch}-1"
+    assert hub.stats()['resets'] == 1
+
+
+def reading(seq, co_level, is_hazardous=False):
+    return StreamMessage(seq, 'dev-1', {'co_level': co_level, 'is_hazardous': is_hazardous})
+
+
+def test_throttle_coalesces_to_newest_reading_per_window():
+    throttle = StreamThrottle(max_hz=0.5)
+
+    assert throttle.admit(reading(1, 1), now=0.0) == (True, False)
+    assert throttle.admit(reading(2, 2), now=0.5) == (False, True)
+    assert throttle.admit(reading(3, 3), now=1.0) == (False, False)
+    assert throttle.next_due(now=1.0) == 1.0
+    assert throttle.due(now=1.5) == []
+
+    [released] = throttle.due(now=2.0)
+    assert released.payload['co_level'] == 3
+    assert throttle.coalesced == 1
+
+
+def test_throttle_passes_hazard_transitions_immediately():
+    throttle = StreamThrottle(max_hz=0.1)
+    throttle.admit(reading(1, 5), now=0.0)
+    throttle.admit(reading(2, 6), now=0.1)
+
+    assert throttle.admit(reading(3, 90, is_hazardous=True), now=0.2) == (True, False)
+    assert throttle.admit(reading(4, 95, is_hazardous=True), now=0.3)[0] is False
+    assert throttle.admit(reading(5, 10, is_hazardous=False), now=0.4) == (True, False)
+    # The held readings were superseded by the transition
+    assert throttle.due(now=100) == []
+
+
+def test_rate_limited_subscription_releases_newest_after_window():
+    """Readings and predictions are limited separately; the held reading goes out when the window closes."""
+    hub = StreamHub()
+    subscription = hub.subscribe({'dev-1'}, max_hz=20)
+
+    hub.publish('dev-1', {'co_level': 1})
+    hub.publish('dev-1', {'co_level': 2})
+    hub.publish('dev-1', {'type': 'prediction'})
+    hub.publish('dev-1', {'co_level': 3})
+
+    assert [m.payload for m in subscription.get(timeout=0)] == [{'co_level': 1}, {'type': 'prediction'}]
+    released = []
+    while not released:
+        released = subscription.get(timeout=1)
+    assert [m.payload for m in released] == [{'co_level': 3}]
+    assert subscription.last_seq == released[0].seq
+
+
+def test_held_message_is_replayed_on_resume():
+    """Event ids sent while a reading is held never resume past it."""
+    hub = StreamHub(replay_size=10)
+    subscription = hub.subscribe({'dev-1', 'dev-2'}, max_hz=20)
+
+    first = hub.publish('dev-1', 'a')
+    held = hub.publish('dev-1', 'b')  # Held for the rest of the window
+    hub.publish('dev-2', 'c')
+    sent = subscription.get(timeout=0)
+    assert [m.payload for m in sent] == ['a', 'c']
+    assert sent[1].event_id == first.event_id
+
+    # Client drops before 'b' is released: the resume still gets it
+    resumed = hub.subscribe({'dev-1', 'dev-2'}, last_event_id=sent[1].event_id)
+    assert [m.payload for m in resumed.get(timeout=0)] == ['b', 'c']
+
+    released = []
+    while not released:
+        released = subscription.get(timeout=1)
+    assert released[0].payload == 'b'
+    assert released[0].event_id == held.event_id
+    assert subscription.last_seq == held.seq + 1
+
+    hub.publish('dev-2', 'd')
+    assert [m.event_id for m in subscription.get(timeout=0)] == [f'{hub.epoch}-{held.seq + 2}']
+
+
+def test_parse_max_hz():
+    assert parse_max_hz(None) is None
+    assert parse_max_hz('0.5') == 0.5
+    for value in ('0', '-1', 'fast', 'inf', 'nan'):
+        with pytest.raises(ValueError):
+            parse_max_hz(value)
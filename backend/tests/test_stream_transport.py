@@ -0,0 +1,85 @@
+import json
+from services.stream_hub import StreamHub
+from services.stream_transport import LocalTransport, PostgresTransport, _libpq_dsn
+
+
+def make_transport(hub=None):
+    return PostgresTransport(hub or StreamHub(), 'postgresql://localhost/ecs_db')
+
+
+def test_local_transport_publishes_to_hub():
+    hub = StreamHub()
+    subscription = hub.subscribe({'dev-1'})
+
+    LocalTransport(hub).publish('dev-1', {'co_level': 5})
+
+    assert [m.payload for m in subscription.get(timeout=0)] == [{'co_level': 5}]
+
+
+def test_notify_payloads_stay_under_limit():
+    """Queued messages are packed into as few NOTIFY payloads as fit 8000 bytes."""
+    transport = make_transport()
+    for i in range(200):
+        transport.publish('dev-1', {'temperature': 25.0, 'humidity': 50.0, 'co_level': i})
+    envelopes = [transport._outbox.get_nowait() for _ in range(200)]
+
+    payloads = PostgresTransport.pack(envelopes, transport.epoch)
+
+    assert 1 < len(payloads) < 10
+    assert all(len(p.encode('utf-8')) <= PostgresTransport.MAX_PAYLOAD_BYTES for p in payloads)
+    seqs = [m['s'] for p in payloads for m in json.loads(p)['m']]
+    assert seqs == list(range(1, 201))
+
+
+def test_received_messages_keep_publisher_event_ids():
+    """Every web process hands out the ingest process's ids, so Last-Event-ID works on any worker."""
+    publisher = make_transport()
+    hub = StreamHub()
+    subscription = hub.subscribe({'dev-1'})
+    publisher.publish('dev-1', 'a')
+    publisher.publish('dev-1', 'b')
+    envelopes = [publisher._outbox.get_nowait() for _ in range(2)]
+
+    for payload in PostgresTransport.pack(envelopes, publisher.epoch):
+        make_transport(hub).handle_notification(payload)
+
+    messages = subscription.get(timeout=0)
+    assert [m.payload for m in messages] == ['a', 'b']
+    assert [m.event_id for m in messages] == [f'{publisher.epoch}-1', f'{publisher.epoch}-2']
+    assert hub.parse_event_id(messages[0].event_id) == 1
+
+
+def test_publisher_restart_does_not_stall_subscribers():
+    """A new publisher epoch restarts seq at 1; existing subscribers still receive it."""
+    hub = StreamHub()
+    subscription = hub.subscribe({'dev-1'})
+    hub.publish('dev-1', 'old', seq=100, epoch='a')
+    subscription.get(timeout=0)
+
+    hub.publish('dev-1', 'new', seq=1, epoch='b')
+
+    assert [m.payload for m in subscription.get(timeout=0)] == ['new']
+
+
+def test_sqlalchemy_url_is_converted_for_libpq():
+    assert _libpq_dsn('postgresql+psycopg2://u:p@db/ecs') == 'postgresql://u:p@db/ecs'
+    assert _libpq_dsn('postgresql://u:p@db/ecs') == 'postgresql://u:p@db/ecs'
+
+
+def test_threads_start_once_per_process(mocker):
+    """start() is idempotent in a process; a forked worker starts its own threads."""
+    mocker.patch.object(PostgresTransport, '_send_loop', lambda self: None)
+    mocker.patch.object(PostgresTransport, '_listen_loop', lambda self: None)
+    transport = make_transport()
+    transport.start()
+    first = list(transport._threads)
+
+    transport.start()
+    assert transport._threads == first
+
+    transport._pid = -1  # As seen from a child forked after start()
+    transport.publish('dev-1', 'queued in the parent')
+    transport.start()
+    assert len(transport._threads) == 2 and transport._threads[0] is not first[0]
+    assert transport._outbox.empty()
+    transport.stop()
@@ -0,0 +1,125 @@
+import http.client
+import threading
+import time
+import jwt
+from api.supabase_auth import RemoteTokenVerifier
+
+USER = {'id': '5f0c7a52-8f0e-4d55-9a43-0f6f0d3c8f11'}
+
+
+def make_token(expires_in=3600):
+    return jwt.encode({'sub': USER['id'], 'exp': int(time.time()) + expires_in},
+                      'remote-test-secret-at-least-32-bytes', algorithm='HS256')
+
+
+class FakeResponse:
+    def __init__(self, status=200, will_close=False):
+        self.status = status
+        self.will_close = will_close
+
+    def read(self):
+        return b'{"id": "5f0c7a52-8f0e-4d55-9a43-0f6f0d3c8f11"}'
+
+
+class FakeConnection:
+    """Records requests; the first `stale` requests fail like a server-closed keep-alive socket."""
+    opened = []
+
+    def __init__(self, host, port, timeout):
+        self.requests = 0
+        self.stale = False
+        FakeConnection.opened.append(self)
+
+    def request(self, method, path, headers):
+        if self.stale:
+            raise http.client.RemoteDisconnected('closed')
+        self.requests += 1
+
+    def getresponse(self):
+        return FakeResponse()
+
+    def close(self):
+        pass
+
+
+def make_verifier(**kwargs):
+    FakeConnection.opened = []
+    return RemoteTokenVerifier('https://project.supabase.co', 'anon', connection_factory=FakeConnection, **kwargs)
+
+
+def test_verified_token_is_cached(mocker):
+    verifier = make_verifier()
+    fetch = mocker.patch.object(verifier, '_fetch_user', return_value=USER)
+    token = make_token()
+
+    assert verifier.verify(token) == USER
+    assert verifier.verify(token) == USER
+
+    fetch.assert_called_once()
+    assert verifier.stats()['hits'] == 1
+
+
+def test_cache_entry_never_outlives_token_exp(mocker):
+    verifier = make_verifier(ttl=3600)
+    fetch = mocker.patch.object(verifier, '_fetch_user', return_value=USER)
+    token = make_token(expires_in=30)
+    verifier.verify(token)
+
+    mocker.patch('api.supabase_auth.time.monotonic', return_value=time.monotonic() + 31)
+    verifier.verify(token)
+
+    assert fetch.call_count == 2
+
+
+def test_rejected_token_is_not_cached(mocker):
+    verifier = make_verifier()
+    fetch = mocker.patch.object(verifier, '_fetch_user', return_value=None)
+    token = make_token()
+
+    assert verifier.verify(token) is None
+    assert verifier.verify(token) is None
+    assert fetch.call_count == 2
+
+
+def test_concurrent_requests_share_one_verification(mocker):
+    """A dashboard's burst of requests with the same token makes one remote call."""
+    verifier = make_verifier()
+    release = threading.Event()
+
+    def slow_fetch(token):
+        release.wait(2)
+        return USER
+    fetch = mocker.patch.object(verifier, '_fetch_user', side_effect=slow_fetch)
+
+    token = make_token()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(verifier.verify(token))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    while verifier.coalesced < 7:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == [USER] * 8
+    fetch.assert_called_once()
+
+
+def test_requests_reuse_keep_alive_connection():
+    verifier = make_verifier()
+
+    verifier.verify(make_token(expires_in=100))
+    verifier.verify(make_token(expires_in=200))
+
+    assert len(FakeConnection.opened) == 1
+    assert FakeConnection.opened[0].requests == 2
+
+
+def test_stale_pooled_connection_is_retried_once():
+    verifier = make_verifier()
+    verifier.verify(make_token(expires_in=100))
+    FakeConnection.opened[0].stale = True
+
+    assert verifier.verify(make_token(expires_in=200)) == USER
+    assert len(FakeConnection.opened) == 2
@@ -16,6 +16,9 @@ import { createSensorStream, parseSSEBuffer } from '../services/hardware.service
 //   - Raw data transport
 // ============================================================================
 
+// Delay before reconnecting a dropped stream
+const RECONNECT_DELAY_MS = 2000;
+
 /**
  * Hook to stream real-time sensor data from the backend via SSE.
  * Uses the hardware service for API communication.
@@ -25,7 +28,8 @@ import { createSensorStream, parseSSEBuffer } from '../services/hardware.service
  * 2. Receives a ReadableStream reader
  * 3. Continuously reads chunks and parses SSE messages
  * 4. Updates React state with processed data
- * 5. Cleans up on unmount by aborting the connection
+ * 5. Reconnects after a drop, resuming from the last event id received
+ * 6. Cleans up on unmount by aborting the connection
  * 
  * @returns {Object} { sensors, history, aiStatus, aiPrediction, connectionStatus }
  */
@@ -56,10 +60,40 @@ export const useSensorStream = () => {
     // Ref to store abort controller (survives re-renders)
     const abortControllerRef = useRef(null);
 
+    // Id of the last SSE event received (sent as Last-Event-ID on reconnect)
+    const lastEventIdRef = useRef(null);
+
     // ========================================================================
     // DATA PROCESSING LOGIC
     // ========================================================================
 
+    /**
+     * Processes an AI prediction from the stream.
+     * Predictions arrive as separate messages ({ type: 'prediction', ai_prediction })
+     * shortly after the reading they belong to.
+     * 
+     * @param {Object} ai - ai_prediction object from the backend
+     */
+    const processPrediction = (ai) => {
+        if (!ai || ai.status !== 'success') return;
+        setAiPrediction(ai);
+
+        const recAction = ai.recommended_action;
+        const futureEnv = ai.future_environment;
+
+        // Determine if there's an anomaly based on recommended action
+        let isAnomaly = false;
+        let msg = "SYSTEM NORMAL";
+        let detail = `Predicted: ${futureEnv.temperature_C}°C, ${futureEnv.CO_ppm} PPM`;
+
+        if (recAction !== 'normal') {
+            isAnomaly = true;
+            msg = "AI ALERT: " + recAction.replace(/_/g, ' ').toUpperCase();
+            detail = `Recommended: ${recAction}`;
+        }
+        setAiStatus({ isAnomaly, message: msg, detail });
+    };
+
     /**
      * Processes raw sensor data from the stream.
      * 
@@ -73,6 +107,18 @@ export const useSensorStream = () => {
      * @param {Object} data - Raw data object from SSE stream
      */
     const processData = (data) => {
+        // Prediction messages only update the AI panel, not the readings
+        if (data.type === 'prediction') {
+            processPrediction(data.ai_prediction);
+            return;
+        }
+
+        // Readings missed while disconnected could not be replayed: start the chart over
+        if (data.type === 'reset') {
+            setHistory([]);
+            return;
+        }
+
         // Step 1: Map backend keys to frontend keys
         // Backend uses: temperature, co_level, humidity
         // Frontend uses: temp, co, humidity
@@ -89,27 +135,8 @@ export const useSensorStream = () => {
             device_id: deviceId
         });
 
-        // Step 3: Process AI prediction (if available in stream)
-        // AI predictions are attached to sensor data by backend
-        if (data.ai_prediction && data.ai_prediction.status === 'success') {
-            const ai = data.ai_prediction;
-            setAiPrediction(ai);
-
-            const recAction = ai.recommended_action;
-            const futureEnv = ai.future_environment;
-
-            // Determine if there's an anomaly based on recommended action
-            let isAnomaly = false;
-            let msg = "SYSTEM NORMAL";
-            let detail = `Predicted: ${futureEnv.temperature_C}°C, ${futureEnv.CO_ppm} PPM`;
-
-            if (recAction !== 'normal') {
-                isAnomaly = true;
-                msg = "AI ALERT: " + recAction.replace(/_/g, ' ').toUpperCase();
-                detail = `Recommended: ${recAction}`;
-            }
-            setAiStatus({ isAnomaly, message: msg, detail });
-        }
+        // Step 3: Process AI prediction (if attached to the reading)
+        processPrediction(data.ai_prediction);
 
         // Step 4: Calculate status based on sensor thresholds
         // CO > 50 ppm = DANGER, Temp > 35°C = WARN, otherwise OK
@@ -151,14 +178,24 @@ export const useSensorStream = () => {
          * 3. Handle connection errors (auth, network, etc.)
          * 4. Enter read loop to continuously consume stream
          * 5. Parse and process each chunk of data
+         * 6. On a dropped connection, reconnect and resume from the last event id
          */
+        let reconnectTimer = null;
+        let unmounted = false;
+
+        const scheduleReconnect = () => {
+            if (!unmounted) {
+                reconnectTimer = setTimeout(connectStream, RECONNECT_DELAY_MS);
+            }
+        };
+
         const connectStream = async () => {
             // Create new abort controller for this connection
             abortControllerRef.current = new AbortController();
 
             // Step 1: Call API layer to establish SSE connection
             // This separates network concerns from business logic
-            const result = await createSensorStream(abortControllerRef.current);
+            const result = await createSensorStream(abortControllerRef.current, lastEventIdRef.current);
 
             // Step 2: Handle connection failures
             if (!result.success) {
@@ -171,6 +208,8 @@ export const useSensorStream = () => {
                         message: 'NOT AUTHENTICATED',
                         detail: 'Please log in to view sensor data'
                     });
+                } else if (result.status === 'error') {
+                    scheduleReconnect();
                 }
                 return;
             }
@@ -192,6 +231,7 @@ export const useSensorStream = () => {
                     // Stream ended (server closed connection)
                     if (done) {
                         setConnectionStatus('disconnected');
+                        scheduleReconnect();
                         break;
                     }
 
@@ -200,8 +240,11 @@ export const useSensorStream = () => {
 
                     // Step 5: Parse complete SSE messages from buffer
                     // The service function handles SSE format parsing
-                    const { messages, remainingBuffer } = parseSSEBuffer(buffer);
+                    const { messages, remainingBuffer, lastEventId } = parseSSEBuffer(buffer);
                     buffer = remainingBuffer;
+                    if (lastEventId) {
+                        lastEventIdRef.current = lastEventId;
+                    }
 
                     // Step 6: Process each received message
                     // This is where business logic happens
@@ -214,6 +257,7 @@ export const useSensorStream = () => {
                 if (error.name !== 'AbortError') {
                     console.error('[useSensorStream] Stream read error:', error);
                     setConnectionStatus('error');
+                    scheduleReconnect();
                 }
             }
         };
@@ -223,6 +267,8 @@ export const useSensorStream = () => {
 
         // Cleanup function: abort connection on unmount
         return () => {
+            unmounted = true;
+            clearTimeout(reconnectTimer);
             if (abortControllerRef.current) {
                 abortControllerRef.current.abort();
             }
@@ -33,6 +33,8 @@ import { supabase } from '../lib/supabaseClient';
  * 4. The caller (hook) is responsible for reading and processing the stream
  * 
  * @param {AbortController} abortController - Controller to abort the connection
+ * @param {string|null} lastEventId - Id of the last event received; on reconnect the
+ *   backend replays only the events published since then
  * @returns {Promise<{success: boolean, reader?: ReadableStreamDefaultReader, error?: string, status?: string}>}
  * 
  * @example
@@ -45,8 +47,10 @@ import { supabase } from '../lib/supabaseClient';
  *   // Handle result.error
  * }
  */
-export const createSensorStream = async (abortController) => {
+export const createSensorStream = async (abortController, lastEventId = null) => {
     const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:5000';
+    // Optional async stream server (STREAM_ASYNC_ENABLED on the backend)
+    const STREAM_URL = import.meta.env.VITE_STREAM_URL || API_URL;
 
     try {
         // Step 1: Get authentication token from Supabase session
@@ -65,12 +69,16 @@ export const createSensorStream = async (abortController) => {
         // Step 3: Make fetch request to SSE endpoint with auth header
         // Note: We use fetch instead of EventSource because EventSource
         // doesn't support custom headers (like Authorization)
-        const response = await fetch(`${API_URL}/stream`, {
+        const headers = {
+            'Authorization': `Bearer ${session.access_token}`,
+            'Accept': 'text/event-stream',
+        };
+        if (lastEventId) {
+            headers['Last-Event-ID'] = lastEventId;
+        }
+        const response = await fetch(`${STREAM_URL}/stream`, {
             method: 'GET',
-            headers: {
-                'Authorization': `Bearer ${session.access_token}`,
-                'Accept': 'text/event-stream',
-            },
+            headers,
             signal: abortController.signal, // Allows cleanup/cancellation
         });
 
@@ -124,17 +132,22 @@ export const createSensorStream = async (abortController) => {
  * 
  * HOW IT WORKS:
  * 1. Takes raw text buffer from stream
- * 2. Splits by newlines and looks for "data: " prefix (SSE format)
- * 3. Parses JSON data from each complete message
+ * 2. Splits it into events at blank lines ("\n\n") - an event is only
+ *    complete once its blank-line terminator has arrived
+ * 3. Parses the "id: " and "data: " lines of each complete event
  * 4. Returns array of parsed data objects and remaining buffer
  * 
  * SSE FORMAT:
- * - Each message starts with "data: " followed by JSON
- * - Messages are separated by newlines
+ * - Each message has an "id: " line (used to resume after a reconnect)
+ *   followed by "data: " and the JSON
+ * - Messages are terminated by a blank line
  * - Comments start with ":" (used for keep-alive)
  * 
+ * lastEventId only advances for complete events, so a disconnect in the
+ * middle of an event resumes before it instead of skipping it.
+ * 
  * @param {string} buffer - Accumulated text from stream
- * @returns {{messages: Array<Object>, remainingBuffer: string}}
+ * @returns {{messages: Array<Object>, remainingBuffer: string, lastEventId: string|null}}
  * 
  * @example
  * const { messages, remainingBuffer } = parseSSEBuffer(buffer);
@@ -143,26 +156,36 @@ export const createSensorStream = async (abortController) => {
  */
 export const parseSSEBuffer = (buffer) => {
     const messages = [];
-    const lines = buffer.split('\n');
-
-    // Keep the last line in buffer (might be incomplete)
-    const remainingBuffer = lines.pop() || '';
-
-    for (const line of lines) {
-        // SSE data lines start with "data: "
-        if (line.startsWith('data: ')) {
-            const jsonStr = line.slice(6); // Remove 'data: ' prefix
-            try {
-                const data = JSON.parse(jsonStr);
-                messages.push(data);
-            } catch (parseError) {
-                console.error('[HardwareService] Error parsing SSE data:', parseError);
+    let lastEventId = null;
+    const events = buffer.split('\n\n');
+
+    // Keep the last event in buffer (not terminated yet)
+    const remainingBuffer = events.pop() || '';
+
+    for (const event of events) {
+        const dataLines = [];
+        for (const line of event.split('\n')) {
+            // SSE id lines start with "id: "
+            if (line.startsWith('id: ')) {
+                lastEventId = line.slice(4);
             }
+            // SSE data lines start with "data: "
+            else if (line.startsWith('data: ')) {
+                dataLines.push(line.slice(6)); // Remove 'data: ' prefix
+            }
+            // Lines starting with ':' are SSE comments (keep-alive) - ignore them
+        }
+        if (dataLines.length === 0) {
+            continue;
+        }
+        try {
+            messages.push(JSON.parse(dataLines.join('\n')));
+        } catch (parseError) {
+            console.error('[HardwareService] Error parsing SSE data:', parseError);
         }
-        // Lines starting with ':' are SSE comments (keep-alive) - ignore them
     }
 
-    return { messages, remainingBuffer };
+    return { messages, remainingBuffer, lastEventId };
 };
 
 /**